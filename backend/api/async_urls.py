@@ -0,0 +1,17 @@
+from django.conf import settings
+from django.urls import path
+
+from . import async_views
+
+urlpatterns = [
+    path("nation", async_views.get_national),
+    path("region", async_views.get_regional),
+    path("state", async_views.get_state),
+    path("state/all", async_views.get_all_states),
+    path("county", async_views.get_county),
+    path("predictions", async_views.get_predictions),
+    path("force_email", async_views.force_email),
+]
+
+if settings.DEBUG:
+    urlpatterns.append(path("io_wait", async_views.io_wait))
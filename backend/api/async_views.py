@@ -0,0 +1,80 @@
+"""
+Async versions of the read endpoints, routed under /api/async/ (see
+async_urls.py) and meant to be served through lahacks_backend.asgi.
+
+They run the same endpoints as views.py (api/endpoints.py), so they return
+the same payloads, but evaluate their queries through Django's async ORM
+interface, so a slow query or email send parks a coroutine instead of tying
+up a worker thread.
+"""
+
+import asyncio
+
+from asgiref.sync import sync_to_async
+from django.http import JsonResponse
+
+from .data_version import data_versioned
+from .endpoints import (
+    all_states_response,
+    county_response,
+    io_wait_seconds,
+    national_response,
+    predictions_response,
+    regional_response,
+    run_async,
+    state_response,
+)
+from .response_cache import cached_response
+from .tasks import send_email
+
+
+@data_versioned
+@cached_response
+async def get_county(request):
+    return await run_async(county_response(request))
+
+
+@data_versioned
+@cached_response
+async def get_state(request):
+    return await run_async(state_response(request))
+
+
+@data_versioned
+@cached_response
+async def get_all_states(request):
+    return await run_async(all_states_response(request))
+
+
+@data_versioned
+@cached_response
+async def get_regional(request):
+    return await run_async(regional_response(request))
+
+
+@data_versioned
+@cached_response
+async def get_national(request):
+    return await run_async(national_response(request))
+
+
+@data_versioned
+@cached_response
+async def get_predictions(request):
+    return await run_async(predictions_response(request))
+
+
+async def force_email(request):
+    if request.method == "GET":
+        # SMTP is blocking; run it off the event loop in its own thread
+        await sync_to_async(send_email, thread_sensitive=False)()
+        return JsonResponse({"response": "Emails on the way"}, status=200)
+    else:
+        return JsonResponse({"error": "GET request required"}, status=405)
+
+
+async def io_wait(request):
+    """views.io_wait(), waiting on the event loop instead of a worker thread."""
+    seconds = io_wait_seconds(request)
+    await asyncio.sleep(seconds)
+    return JsonResponse({"waited_ms": seconds * 1000}, status=200)
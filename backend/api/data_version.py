@@ -0,0 +1,115 @@
+"""
+HTTP validators derived from the currently loaded data.
+
+populate_db.py (and the prediction pipeline) record an ingest_run row every
+time they write, so the latest run id plus the newest Ending_Date identify the
+data a response was built from. Views wrapped in @data_versioned answer
+conditional GETs with 304 until the next ingest changes that token.
+"""
+
+from datetime import datetime, time, timezone
+from functools import wraps
+from inspect import iscoroutinefunction
+
+from django.conf import settings
+from django.db.models import Max
+from django.utils.cache import patch_cache_control
+from django.views.decorators.http import condition
+
+from .models import IngestRun, StateTimeseries
+
+
+def version_from_run(latest_run):
+    return (
+        f"{latest_run.id}-{latest_run.max_ending_date}",
+        latest_run.finished_at,
+    )
+
+
+def version_from_max_ending_date(max_ending_date):
+    # Tables loaded before ingest runs were recorded
+    return (
+        f"0-{max_ending_date}",
+        (
+            datetime.combine(max_ending_date, time.min, tzinfo=timezone.utc)
+            if max_ending_date
+            else None
+        ),
+    )
+
+
+def get_data_version(request=None):
+    """Returns (token, last_modified) for the data currently in the database."""
+    if request is not None and hasattr(request, "_data_version"):
+        return request._data_version
+
+    latest_run = IngestRun.objects.order_by("-id").first()
+
+    if latest_run:
+        version = version_from_run(latest_run)
+    else:
+        version = version_from_max_ending_date(
+            StateTimeseries.objects.aggregate(latest=Max("ending_date"))["latest"]
+        )
+
+    if request is not None:
+        request._data_version = version
+    return version
+
+
+async def aget_data_version(request=None):
+    """Async variant of get_data_version() using the async ORM interface."""
+    if request is not None and hasattr(request, "_data_version"):
+        return request._data_version
+
+    latest_run = await IngestRun.objects.order_by("-id").afirst()
+
+    if latest_run:
+        version = version_from_run(latest_run)
+    else:
+        aggregate = await StateTimeseries.objects.aaggregate(latest=Max("ending_date"))
+        version = version_from_max_ending_date(aggregate["latest"])
+
+    if request is not None:
+        request._data_version = version
+    return version
+
+
+def data_version_etag(request, *args, **kwargs):
+    return get_data_version(request)[0]
+
+
+def data_version_last_modified(request, *args, **kwargs):
+    return get_data_version(request)[1]
+
+
+def data_versioned(view):
+    """Adds ETag/Last-Modified/Cache-Control and 304 handling to a read view."""
+    conditional_view = condition(
+        etag_func=data_version_etag, last_modified_func=data_version_last_modified
+    )(view)
+
+    def add_cache_control(response):
+        if response.status_code in (200, 304):
+            patch_cache_control(
+                response, public=True, max_age=settings.API_CACHE_MAX_AGE
+            )
+        return response
+
+    if iscoroutinefunction(view):
+
+        @wraps(view)
+        async def async_wrapper(request, *args, **kwargs):
+            # condition() calls the validator functions synchronously, so load
+            # the version up front; they then only read the per-request memo
+            await aget_data_version(request)
+            response = await conditional_view(request, *args, **kwargs)
+            return add_cache_control(response)
+
+        return async_wrapper
+
+    @wraps(view)
+    def wrapper(request, *args, **kwargs):
+        return add_cache_control(conditional_view(request, *args, **kwargs))
+
+    return wrapper
@@ -0,0 +1,444 @@
+"""
+Read endpoints shared by the sync views (views.py) and the async views
+(async_views.py), so both routes return identical payloads.
+
+Each endpoint is written once, as a generator over the request: it yields
+every queryset it needs evaluated, is sent back the rows as a list, and
+returns the response. run_sync() evaluates the querysets with the sync ORM
+and run_async() with the async one. A query error is thrown back into the
+generator, so an endpoint's own try/except handles it on both routes.
+Streamed bodies are returned as a Streamed pair of producers, one per route.
+"""
+
+import json
+from collections import namedtuple
+from itertools import groupby
+from operator import itemgetter
+
+from django.db.models import F, Window
+from django.db.models.functions import RowNumber
+from django.forms.models import model_to_dict
+from django.http import JsonResponse, StreamingHttpResponse
+
+from .history import paginate_history_steps, parse_history_params, with_next_cursor
+from .models import (
+    CountyAggregate,
+    FuturePrediction,
+    NationalSeries,
+    RegionSeries,
+    StateTimeseries,
+)
+from .regions import REGION_STATES
+
+# Columns a state history request may select with ?fields= (ending_date is
+# always included)
+STATE_HISTORY_FIELDS = [
+    "state_territory",
+    "data_collection_period",
+    "state_territory_wval",
+    "national_wval",
+    "regional_wval",
+    "wval_category",
+    "coverage",
+]
+
+# Per-date values sent by the columnar history format; state and date are
+# carried by the object key and the shared "dates" axis instead
+HISTORY_COLUMNS = [
+    "state_territory_wval",
+    "national_wval",
+    "regional_wval",
+    "wval_category",
+    "coverage",
+]
+
+# Longest wait /io_wait will simulate, in milliseconds
+MAX_IO_WAIT_MS = 5000
+
+# A streamed JSON body: a generator function for each route
+Streamed = namedtuple("Streamed", ["sync", "async_"])
+
+
+def streamed_response(body):
+    return StreamingHttpResponse(body, content_type="application/json")
+
+
+def run_sync(steps):
+    """Runs an endpoint generator with the sync ORM; returns its response."""
+    try:
+        query = next(steps)
+        while True:
+            try:
+                rows = list(query)
+            except Exception as e:
+                query = steps.throw(e)
+            else:
+                query = steps.send(rows)
+    except StopIteration as stop:
+        result = stop.value
+    if isinstance(result, Streamed):
+        return streamed_response(result.sync())
+    return result
+
+
+async def run_async(steps):
+    """Runs an endpoint generator with the async ORM; returns its response."""
+    try:
+        query = next(steps)
+        while True:
+            try:
+                rows = [row async for row in query]
+            except Exception as e:
+                query = steps.throw(e)
+            else:
+                query = steps.send(rows)
+    except StopIteration as stop:
+        result = stop.value
+    if isinstance(result, Streamed):
+        return streamed_response(result.async_())
+    return result
+
+
+def io_wait_seconds(request):
+    """The ?ms= wait asked of /io_wait, clamped to MAX_IO_WAIT_MS, in seconds."""
+    try:
+        milliseconds = int(request.GET.get("ms", 100))
+    except ValueError:
+        milliseconds = 100
+    return min(max(milliseconds, 0), MAX_IO_WAIT_MS) / 1000
+
+
+def first(rows):
+    return rows[0] if rows else None
+
+
+def method_not_allowed():
+    return JsonResponse({"error": "GET request required"}, status=405)
+
+
+def series_to_columns(series, value_field):
+    # [(date, value), ...] -> {"dates": [...], value_field: [...]}
+    dates, values = zip(*series) if series else ((), ())
+    return {"dates": list(dates), value_field: list(values)}
+
+
+def latest_state_records(states=None):
+    # One row per state, picked with a window function so the snapshot costs a
+    # single query no matter how many states/territories are in the table
+    records = StateTimeseries.objects.all()
+    if states is not None:
+        records = records.filter(state_territory__in=states)
+
+    return (
+        records.annotate(
+            row_number=Window(
+                RowNumber(),
+                partition_by=F("state_territory"),
+                order_by=F("ending_date").desc(),
+            )
+        )
+        .filter(row_number=1)
+        .order_by("state_territory")
+    )
+
+
+def columnar_history_dates():
+    return (
+        StateTimeseries.objects.values_list("ending_date", flat=True)
+        .distinct()
+        .order_by("ending_date")
+    )
+
+
+def columnar_history_rows():
+    return StateTimeseries.objects.values_list(
+        "state_territory", "ending_date", *HISTORY_COLUMNS
+    ).order_by("state_territory", "ending_date")
+
+
+def columnar_state_chunk(i, state, rows, date_index):
+    # Serializes one state's rows as "state": {field: [...]} aligned to dates
+    columns = {field: [None] * len(date_index) for field in HISTORY_COLUMNS}
+    for row in rows:
+        position = date_index[row[1]]
+        for field, value in zip(HISTORY_COLUMNS, row[2:]):
+            columns[field][position] = value
+    return ("," if i else "") + json.dumps(state) + ":" + json.dumps(columns)
+
+
+def columnar_header(dates):
+    return '{"dates":' + json.dumps([d.isoformat() for d in dates]) + ',"states":{'
+
+
+def stream_columnar_history():
+    # {"dates": [...], "states": {state: {field: [...]}}}, one state at a time.
+    # Every field array is aligned with "dates", so each date is sent once and
+    # only a single state's columns are held in memory while streaming
+    dates = list(columnar_history_dates())
+    date_index = {ending_date: i for i, ending_date in enumerate(dates)}
+    records = columnar_history_rows().iterator(chunk_size=2000)
+
+    yield columnar_header(dates)
+    for i, (state, rows) in enumerate(groupby(records, key=itemgetter(0))):
+        yield columnar_state_chunk(i, state, rows, date_index)
+    yield "}}"
+
+
+async def astream_columnar_history():
+    dates = [ending_date async for ending_date in columnar_history_dates()]
+    date_index = {ending_date: i for i, ending_date in enumerate(dates)}
+
+    yield columnar_header(dates)
+    i, state, rows = 0, None, []
+    async for row in columnar_history_rows():
+        if rows and row[0] != state:
+            yield columnar_state_chunk(i, state, rows, date_index)
+            i, rows = i + 1, []
+        state = row[0]
+        rows.append(row)
+    if rows:
+        yield columnar_state_chunk(i, state, rows, date_index)
+    yield "}}"
+
+
+def county_response(request):
+    if request.method != "GET":
+        return method_not_allowed()
+
+    state = request.GET.get("state")
+    county = request.GET.get("county")
+    historical = request.GET.get("history", "false").lower() == "true"
+    weighted = request.GET.get("weighted", "false").lower() == "true"
+
+    if historical:
+        return JsonResponse(
+            {"error": "Historical data not available on a per-county basis"},
+            status=400,
+        )
+
+    if not state:
+        return JsonResponse({"error": "Missing 'state' parameter"}, status=400)
+
+    # Categories are averaged over each county's sewersheds at ingest
+    # (populate_db.process_county_aggregates), so this is one indexed read
+    category_field = "weighted_wval_category" if weighted else "wval_category"
+
+    try:
+        records = CountyAggregate.objects.filter(state_territory=state)
+
+        if county:
+            record = first((yield records.filter(county=county)[:1]))
+
+            if not record:
+                return JsonResponse({"error": "No matching counties found"}, status=404)
+
+            averaged_category = getattr(record, category_field)
+            if not averaged_category:
+                return JsonResponse(
+                    {"error": "Could not average wval_category"}, status=500
+                )
+
+            return JsonResponse(
+                {
+                    "state_territory": record.state_territory,
+                    "counties_served": record.county,
+                    "wval_category": averaged_category,
+                    "reporting_week": record.reporting_week,
+                }
+            )
+
+        response = [
+            {
+                "state_territory": record.state_territory,
+                "counties_served": record.county,
+                "wval_category": getattr(record, category_field),
+                "reporting week": record.reporting_week,
+            }
+            for record in (yield records.order_by("county"))
+        ]
+
+        if not response:
+            return JsonResponse({"error": "No matching counties found"}, status=404)
+
+        return JsonResponse(response, safe=False)
+
+    except Exception as e:
+        return JsonResponse({"error": str(e)}, status=500)
+
+
+def state_response(request):
+    if request.method != "GET":
+        return method_not_allowed()
+
+    state = request.GET.get("state")
+    historical = request.GET.get("history", "false").lower() == "true"
+
+    if not state:
+        return JsonResponse({"error": "Missing 'state' parameter"}, status=400)
+
+    if historical:
+        try:
+            params = parse_history_params(request, STATE_HISTORY_FIELDS)
+        except ValueError as e:
+            return JsonResponse({"error": str(e)}, status=400)
+
+        records, next_cursor = yield from paginate_history_steps(
+            StateTimeseries.objects.filter(state_territory=state), params
+        )
+
+        result = yield records.values("ending_date", *params["fields"])
+        if not result:
+            return JsonResponse({"error": "No matching states found"}, status=404)
+
+        return with_next_cursor(JsonResponse(result, safe=False), next_cursor)
+
+    record = first(
+        (
+            yield StateTimeseries.objects.filter(state_territory=state).order_by(
+                "-ending_date"
+            )[:1]
+        )
+    )
+
+    if not record:
+        return JsonResponse({"error": "No matching states found"}, status=404)
+
+    return JsonResponse(model_to_dict(record), safe=False)
+
+
+def all_states_response(request):
+    if request.method != "GET":
+        return method_not_allowed()
+
+    try:
+        history = request.GET.get("history") == "true"
+        columnar = request.GET.get("format") == "columnar"
+
+        if history and columnar:
+            if not (yield StateTimeseries.objects.values_list("ending_date")[:1]):
+                return JsonResponse({"error": "No state data found"}, status=404)
+
+            return Streamed(stream_columnar_history, astream_columnar_history)
+
+        if history:
+            records = yield StateTimeseries.objects.order_by(
+                "state_territory", "ending_date"
+            )
+            all_state_data = {
+                state: [model_to_dict(record) for record in state_history]
+                for state, state_history in groupby(
+                    records, key=lambda record: record.state_territory
+                )
+            }
+        else:
+            all_state_data = {
+                record.state_territory: model_to_dict(record)
+                for record in (yield latest_state_records())
+            }
+
+        if not all_state_data:
+            return JsonResponse({"error": "No state data found"}, status=404)
+
+        return JsonResponse(all_state_data, safe=False)
+
+    except Exception as e:
+        return JsonResponse({"error": str(e)}, status=500)
+
+
+def regional_response(request):
+    # Served from region_series, which populate_db.py builds with one row per
+    # region and week
+    if request.method != "GET":
+        return method_not_allowed()
+
+    region = request.GET.get("region", "").upper()
+    historical = request.GET.get("history", "false").lower() == "true"
+
+    if region not in REGION_STATES:
+        return JsonResponse(
+            {"error": "Missing or unknown 'region' parameter (S, W, MW, NE)"},
+            status=400,
+        )
+
+    records = RegionSeries.objects.filter(region=region)
+
+    if historical:
+        try:
+            params = parse_history_params(request)
+        except ValueError as e:
+            return JsonResponse({"error": str(e)}, status=400)
+
+        records, next_cursor = yield from paginate_history_steps(records, params)
+        series = yield records.values_list("ending_date", "regional_wval")
+
+        if not series:
+            return JsonResponse({"error": "No matching regions found"}, status=404)
+
+        return with_next_cursor(
+            JsonResponse(
+                {"region": region, **series_to_columns(series, "regional_wval")}
+            ),
+            next_cursor,
+        )
+
+    record = first((yield records.order_by("-ending_date")[:1]))
+
+    if not record:
+        return JsonResponse({"error": "No matching regions found"}, status=404)
+
+    return JsonResponse(
+        {
+            "region": region,
+            "ending_date": record.ending_date,
+            "regional_wval": record.regional_wval,
+        }
+    )
+
+
+def national_response(request):
+    # Served from national_series, which populate_db.py builds with one row
+    # per week
+    if request.method != "GET":
+        return method_not_allowed()
+
+    historical = request.GET.get("history", "false").lower() == "true"
+
+    if historical:
+        try:
+            params = parse_history_params(request)
+        except ValueError as e:
+            return JsonResponse({"error": str(e)}, status=400)
+
+        records, next_cursor = yield from paginate_history_steps(
+            NationalSeries.objects.all(), params
+        )
+        series = yield records.values_list("ending_date", "national_wval")
+
+        if not series:
+            return JsonResponse({"error": "No national data found"}, status=404)
+
+        return with_next_cursor(
+            JsonResponse(series_to_columns(series, "national_wval")), next_cursor
+        )
+
+    record = first((yield NationalSeries.objects.order_by("-ending_date")[:1]))
+
+    if not record:
+        return JsonResponse({"error": "No national data found"}, status=404)
+
+    return JsonResponse(
+        {
+            "ending_date": record.ending_date,
+            "national_wval": record.national_wval,
+        }
+    )
+
+
+def predictions_response(request):
+    if request.method != "GET":
+        return method_not_allowed()
+
+    predictions_list = [
+        prediction.to_dict() for prediction in (yield FuturePrediction.objects.all())
+    ]
+    return JsonResponse({"predictions": predictions_list}, status=200)
@@ -0,0 +1,177 @@
+"""
+On-demand forecasts. Per-state models are served through a process-wide
+ModelRegistry so only recently requested states stay in memory. With
+FORECAST_MODEL_KIND = "numpy" the registry holds the NumPy exports of those
+models instead, so serving never imports TensorFlow; with "global" the single
+multi-state model is used.
+
+States without a usable model fall back to the statistical baseline named by
+FORECAST_FALLBACK_BASELINE (see forecasting/baselines.py).
+"""
+
+import os
+from functools import lru_cache
+
+import numpy as np
+from django.conf import settings
+from django.db.models import Max, Min
+
+from forecasting import N_FEATURES, PREDICT_STEPS, SEQUENCE_LENGTH, numpy_engine
+from forecasting.baselines import BASELINES
+from forecasting.dataset import last_sequence_scaled, scaler_for_range
+from forecasting.global_model import (
+    GLOBAL_MODEL_FILE,
+    GLOBAL_SCALER_RANGES_FILE,
+    GLOBAL_STATES_FILE,
+    GlobalForecaster,
+)
+from forecasting.inference import predict_future
+from forecasting.registry import ModelRegistry, file_version
+
+from .models import StateTimeseries
+
+
+@lru_cache(maxsize=None)
+def get_model_registry():
+    if settings.FORECAST_MODEL_KIND == "numpy":
+        return ModelRegistry(
+            os.path.join(settings.FORECAST_MODEL_DIR, "numpy"),
+            max_models=settings.FORECAST_REGISTRY_MAX_MODELS,
+            max_bytes=settings.FORECAST_REGISTRY_MAX_BYTES,
+            loader=numpy_engine.ExportedModel.load,
+            sizer=lambda model: model.nbytes,
+            suffix=numpy_engine.EXPORT_SUFFIX,
+        )
+    return ModelRegistry(
+        settings.FORECAST_MODEL_DIR,
+        max_models=settings.FORECAST_REGISTRY_MAX_MODELS,
+        max_bytes=settings.FORECAST_REGISTRY_MAX_BYTES,
+    )
+
+
+def get_global_forecaster():
+    """The global model, reloaded whenever retraining rewrites its files."""
+    return load_global_forecaster(
+        tuple(
+            file_version(os.path.join(settings.FORECAST_MODEL_DIR, filename))
+            for filename in (
+                GLOBAL_MODEL_FILE,
+                GLOBAL_STATES_FILE,
+                GLOBAL_SCALER_RANGES_FILE,
+            )
+        )
+    )
+
+
+@lru_cache(maxsize=1)
+def load_global_forecaster(files_version):
+    return GlobalForecaster.load(settings.FORECAST_MODEL_DIR)
+
+
+def has_model(state):
+    if settings.FORECAST_MODEL_KIND == "global":
+        return state in get_global_forecaster()
+    return state in get_model_registry()
+
+
+def load_model(state):
+    """
+    (model, scaler range) for `state`: the range its series was scaled by at
+    training time, or None for models saved before ranges were recorded.
+    """
+    if settings.FORECAST_MODEL_KIND == "global":
+        forecaster = get_global_forecaster()
+        return forecaster, forecaster.scaler_ranges.get(state)
+    return get_model_registry().get_with_scaler_range(state)
+
+
+def predict(state, model, scaler, sequence, steps):
+    """Unscaled predictions for `steps` weeks from the scaled last sequence."""
+    if settings.FORECAST_MODEL_KIND == "global":
+        predictions_scaled = model.predict_scaled([state], [sequence], steps)
+        return scaler.inverse_transform(predictions_scaled.reshape(-1, 1)).flatten()
+    if settings.FORECAST_MODEL_KIND == "numpy":
+        return numpy_engine.predict_future(
+            model, scaler, sequence, steps, SEQUENCE_LENGTH, N_FEATURES
+        )
+    return predict_future(model, scaler, sequence, steps, SEQUENCE_LENGTH, N_FEATURES)
+
+
+def recent_state_values(state, count=None):
+    """
+    The last `count` (default: all) weekly State_WVAL values, oldest first.
+    state_timeseries repeats each week once per collection period, so dates
+    are deduplicated.
+    """
+    rows = (
+        StateTimeseries.objects.filter(state_territory=state)
+        .order_by("-ending_date")
+        .values_list("ending_date", "state_territory_wval")
+    )
+    values = {}
+    for ending_date, value in rows.iterator():
+        values.setdefault(ending_date, value)
+        if len(values) == count:
+            break
+    return [values[date] for date in sorted(values)]
+
+
+def forecast_baseline(state, steps, last_date):
+    name = settings.FORECAST_FALLBACK_BASELINE
+    values = recent_state_values(state)
+    if not name or not values:
+        return None
+    history = np.array([values], dtype=float)
+    predictions = BASELINES[name].predict(history, steps)[0]
+    if np.isnan(predictions).any():
+        return None
+    return last_date, [float(value) for value in predictions], name
+
+
+def forecast_state(state, steps=PREDICT_STEPS):
+    """
+    Predicts the next `steps` weekly values for `state`, scaling its recent
+    weeks with the range the model was trained on. New weeks outside that
+    range are scaled beyond [0, 1], as they would be by the fitted scaler.
+
+    Returns (last_ending_date, predictions, model), where model is
+    FORECAST_MODEL_KIND or the name of the fallback baseline, or None when
+    there is no data to forecast from.
+    """
+    last_date = StateTimeseries.objects.filter(state_territory=state).aggregate(
+        last_date=Max("ending_date")
+    )["last_date"]
+    if last_date is None:
+        return None
+    if not has_model(state):
+        return forecast_baseline(state, steps, last_date)
+
+    values = recent_state_values(state, SEQUENCE_LENGTH)
+    if len(values) < SEQUENCE_LENGTH or any(value is None for value in values):
+        return forecast_baseline(state, steps, last_date)
+
+    model, trained_range = load_model(state)
+    if trained_range is None:
+        # Models saved before ranges were recorded: the series' current range
+        # matches training until new weeks move its min or max
+        bounds = StateTimeseries.objects.filter(state_territory=state).aggregate(
+            minimum=Min("state_territory_wval"),
+            maximum=Max("state_territory_wval"),
+        )
+        trained_range = (bounds["minimum"], bounds["maximum"])
+
+    scaler = scaler_for_range(*trained_range)
+    predictions = predict(
+        state,
+        model,
+        scaler,
+        last_sequence_scaled(values, scaler, SEQUENCE_LENGTH),
+        steps,
+    )
+    if np.isnan(predictions).any():
+        return forecast_baseline(state, steps, last_date)
+    return (
+        last_date,
+        [float(value) for value in predictions],
+        settings.FORECAST_MODEL_KIND,
+    )
@@ -0,0 +1,108 @@
+"""
+Query parameters shared by the history endpoints.
+
+    since / until   inclusive ISO date bounds on ending_date
+    after           keyset cursor: only weeks strictly after this date
+    limit           page size in weeks; the next cursor is returned in the
+                    X-Next-Cursor response header when more weeks remain
+    fields          comma-separated subset of columns to return
+
+Without limit the whole (date-filtered) series is returned, as before.
+"""
+
+from datetime import date
+
+MAX_HISTORY_LIMIT = 1000
+
+
+def parse_date_param(request, name):
+    value = request.GET.get(name)
+    if not value:
+        return None
+    try:
+        return date.fromisoformat(value)
+    except ValueError:
+        raise ValueError(f"'{name}' must be an ISO date (YYYY-MM-DD)")
+
+
+def parse_history_params(request, allowed_fields=()):
+    """Validates the history parameters; raises ValueError with a client message."""
+    limit = request.GET.get("limit")
+    if limit is not None:
+        try:
+            limit = int(limit)
+        except ValueError:
+            raise ValueError("'limit' must be an integer")
+        if not 1 <= limit <= MAX_HISTORY_LIMIT:
+            raise ValueError(f"'limit' must be between 1 and {MAX_HISTORY_LIMIT}")
+
+    fields = list(allowed_fields)
+    if request.GET.get("fields") and allowed_fields:
+        fields = [name.strip() for name in request.GET["fields"].split(",")]
+        unknown = [name for name in fields if name not in allowed_fields]
+        if unknown:
+            raise ValueError(f"Unknown fields: {', '.join(unknown)}")
+
+    return {
+        "since": parse_date_param(request, "since"),
+        "until": parse_date_param(request, "until"),
+        "after": parse_date_param(request, "after"),
+        "limit": limit,
+        "fields": fields,
+    }
+
+
+def filter_history(records, params):
+    if params["since"]:
+        records = records.filter(ending_date__gte=params["since"])
+    if params["until"]:
+        records = records.filter(ending_date__lte=params["until"])
+    if params["after"]:
+        records = records.filter(ending_date__gt=params["after"])
+    return records.order_by("ending_date")
+
+
+def page_dates_query(records, params):
+    return records.values_list("ending_date", flat=True).distinct()[
+        : params["limit"] + 1
+    ]
+
+
+def cut_page(records, params, page_dates):
+    limit = params["limit"]
+    if len(page_dates) <= limit:
+        return records, None
+    last_date = page_dates[limit - 1]
+    return records.filter(ending_date__lte=last_date), last_date.isoformat()
+
+
+def paginate_history(records, params):
+    """
+    Applies the date bounds and keyset cursor to a queryset with an
+    ending_date column. Returns (queryset ordered by ending_date, next cursor).
+
+    Pages are cut on whole weeks so rows sharing an ending_date (one per
+    Data_Collection_Period in state_timeseries) never straddle two pages.
+    """
+    records = filter_history(records, params)
+    if not params["limit"]:
+        return records, None
+    return cut_page(records, params, list(page_dates_query(records, params)))
+
+
+def paginate_history_steps(records, params):
+    """
+    paginate_history() as an api/endpoints.py step: yields the page-dates
+    query for the endpoint's driver to run, sync or async.
+    """
+    records = filter_history(records, params)
+    if not params["limit"]:
+        return records, None
+    page_dates = yield page_dates_query(records, params)
+    return cut_page(records, params, page_dates)
+
+
+def with_next_cursor(response, next_cursor):
+    if next_cursor:
+        response["X-Next-Cursor"] = next_cursor
+    return response
@@ -0,0 +1,41 @@
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.RunSQL(
+            sql=[
+                '''CREATE TABLE IF NOT EXISTS "state_timeseries" (
+                    "State" TEXT,
+                    "Ending_Date" TEXT,
+                    "Data_Collection_Period" TEXT,
+                    "State_WVAL" FLOAT,
+                    "National_WVAL" FLOAT,
+                    "Regional_WVAL" FLOAT,
+                    "WVAL_Category" TEXT,
+                    "Coverage" TEXT
+                )''',
+                '''CREATE TABLE IF NOT EXISTS "county_current" (
+                    "State" TEXT,
+                    "Sewershed_ID" TEXT,
+                    "Counties_Served" TEXT,
+                    "Population_Served" FLOAT,
+                    "WVAL_Category" TEXT,
+                    "Reporting_Week" TEXT
+                )''',
+                '''CREATE INDEX IF NOT EXISTS "state_timeseries_state_date_idx"
+                    ON "state_timeseries" ("State", "Ending_Date")''',
+                '''CREATE INDEX IF NOT EXISTS "county_current_state_sewershed_idx"
+                    ON "county_current" ("State", "Sewershed_ID")''',
+            ],
+            reverse_sql=[
+                'DROP INDEX IF EXISTS "state_timeseries_state_date_idx"',
+                'DROP INDEX IF EXISTS "county_current_state_sewershed_idx"',
+            ],
+        ),
+    ]
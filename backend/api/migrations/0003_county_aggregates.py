@@ -0,0 +1,84 @@
+from django.db import migrations, models
+
+
+def build_county_aggregates(apps, schema_editor):
+    # /api/county only reads county_aggregate, so build it (and its bridge
+    # table) from the county_current rows already loaded, with the ingest's
+    # own builders, rather than serving nothing until the next ingest
+    import populate_db
+
+    conn = schema_editor.connection.connection
+    populate_db.process_county_aggregates(conn)
+    for table in (populate_db.SEWERSHED_COUNTY_TABLE, populate_db.COUNTY_AGGREGATE_TABLE):
+        populate_db.replace_from_staging(conn, table)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0002_state_county_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SewershedCounty',
+            fields=[
+                ('pk', models.CompositePrimaryKey('sewershed_id', 'county', blank=True, editable=False, primary_key=True, serialize=False)),
+                ('state_territory', models.TextField(db_column='State')),
+                ('sewershed_id', models.TextField(db_column='Sewershed_ID')),
+                ('county', models.TextField(db_column='County')),
+                ('population_served', models.FloatField(db_column='Population_Served', null=True)),
+                ('wval_category', models.TextField(db_column='WVAL_Category')),
+            ],
+            options={
+                'db_table': 'sewershed_county',
+                'managed': False,
+            },
+        ),
+        migrations.CreateModel(
+            name='CountyAggregate',
+            fields=[
+                ('pk', models.CompositePrimaryKey('state_territory', 'county', blank=True, editable=False, primary_key=True, serialize=False)),
+                ('state_territory', models.TextField(db_column='State')),
+                ('county', models.TextField(db_column='County')),
+                ('wval_category', models.TextField(db_column='WVAL_Category', null=True)),
+                ('weighted_wval_category', models.TextField(db_column='Weighted_WVAL_Category', null=True)),
+                ('sewershed_count', models.IntegerField(db_column='Sewershed_Count')),
+                ('population_served', models.FloatField(db_column='Population_Served', null=True)),
+                ('reporting_week', models.TextField(db_column='Reporting_Week')),
+            ],
+            options={
+                'db_table': 'county_aggregate',
+                'managed': False,
+            },
+        ),
+        migrations.RunSQL(
+            sql=[
+                '''CREATE TABLE IF NOT EXISTS "sewershed_county" (
+                    "State" TEXT,
+                    "Sewershed_ID" TEXT,
+                    "County" TEXT,
+                    "Population_Served" FLOAT,
+                    "WVAL_Category" TEXT
+                )''',
+                '''CREATE TABLE IF NOT EXISTS "county_aggregate" (
+                    "State" TEXT,
+                    "County" TEXT,
+                    "WVAL_Category" TEXT,
+                    "Weighted_WVAL_Category" TEXT,
+                    "Sewershed_Count" INTEGER,
+                    "Population_Served" FLOAT,
+                    "Reporting_Week" TEXT
+                )''',
+                '''CREATE INDEX IF NOT EXISTS "sewershed_county_state_county_idx"
+                    ON "sewershed_county" ("State", "County")''',
+                '''CREATE UNIQUE INDEX IF NOT EXISTS "county_aggregate_state_county_idx"
+                    ON "county_aggregate" ("State", "County")''',
+            ],
+            reverse_sql=[
+                'DROP TABLE IF EXISTS "county_aggregate"',
+                'DROP TABLE IF EXISTS "sewershed_county"',
+            ],
+        ),
+        migrations.RunPython(build_county_aggregates, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,37 @@
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0003_county_aggregates'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='IngestRun',
+            fields=[
+                ('id', models.AutoField(db_column='Id', primary_key=True, serialize=False)),
+                ('source', models.TextField(db_column='Source')),
+                ('finished_at', models.DateTimeField(db_column='Finished_At')),
+                ('max_ending_date', models.DateField(db_column='Max_Ending_Date', null=True)),
+            ],
+            options={
+                'db_table': 'ingest_run',
+                'managed': False,
+            },
+        ),
+        migrations.RunSQL(
+            sql=[
+                '''CREATE TABLE IF NOT EXISTS "ingest_run" (
+                    "Id" INTEGER PRIMARY KEY AUTOINCREMENT,
+                    "Source" TEXT,
+                    "Finished_At" TEXT,
+                    "Max_Ending_Date" TEXT
+                )''',
+            ],
+            reverse_sql=[
+                'DROP TABLE IF EXISTS "ingest_run"',
+            ],
+        ),
+    ]
@@ -0,0 +1,69 @@
+from django.db import migrations, models
+
+
+def build_series(apps, schema_editor):
+    # /api/region and /api/nation only read these tables, so build them from
+    # the state_timeseries rows already loaded, with the ingest's own
+    # builders, rather than serving nothing until the next ingest
+    import populate_db
+
+    conn = schema_editor.connection.connection
+    populate_db.process_region_national_series(conn)
+    for table in (populate_db.REGION_SERIES_TABLE, populate_db.NATIONAL_SERIES_TABLE):
+        populate_db.replace_from_staging(conn, table)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0004_ingestrun'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RegionSeries',
+            fields=[
+                ('pk', models.CompositePrimaryKey('region', 'ending_date', blank=True, editable=False, primary_key=True, serialize=False)),
+                ('region', models.TextField(db_column='Region')),
+                ('ending_date', models.DateField(db_column='Ending_Date')),
+                ('regional_wval', models.FloatField(db_column='Regional_WVAL', null=True)),
+            ],
+            options={
+                'db_table': 'region_series',
+                'managed': False,
+            },
+        ),
+        migrations.CreateModel(
+            name='NationalSeries',
+            fields=[
+                ('ending_date', models.DateField(db_column='Ending_Date', primary_key=True, serialize=False)),
+                ('national_wval', models.FloatField(db_column='National_WVAL', null=True)),
+            ],
+            options={
+                'db_table': 'national_series',
+                'managed': False,
+            },
+        ),
+        migrations.RunSQL(
+            sql=[
+                '''CREATE TABLE IF NOT EXISTS "region_series" (
+                    "Region" TEXT,
+                    "Ending_Date" TEXT,
+                    "Regional_WVAL" FLOAT
+                )''',
+                '''CREATE TABLE IF NOT EXISTS "national_series" (
+                    "Ending_Date" TEXT,
+                    "National_WVAL" FLOAT
+                )''',
+                '''CREATE UNIQUE INDEX IF NOT EXISTS "region_series_region_date_idx"
+                    ON "region_series" ("Region", "Ending_Date")''',
+                '''CREATE UNIQUE INDEX IF NOT EXISTS "national_series_date_idx"
+                    ON "national_series" ("Ending_Date")''',
+            ],
+            reverse_sql=[
+                'DROP TABLE IF EXISTS "national_series"',
+                'DROP TABLE IF EXISTS "region_series"',
+            ],
+        ),
+        migrations.RunPython(build_series, migrations.RunPython.noop),
+    ]
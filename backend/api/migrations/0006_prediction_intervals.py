@@ -0,0 +1,69 @@
+from django.db import migrations, models
+
+INTERVAL_COLUMNS = [
+    f'Week_{week}_{bound}' for week in range(1, 5) for bound in ('Lower', 'Upper')
+]
+
+
+def add_interval_columns(apps, schema_editor):
+    # future_predictions is created by virus_prediction.py, so it may not exist
+    # yet (ensure_schema then creates it with these columns)
+    with schema_editor.connection.cursor() as cursor:
+        cursor.execute('PRAGMA table_info("future_predictions")')
+        existing = {row[1] for row in cursor.fetchall()}
+        for column in INTERVAL_COLUMNS:
+            if existing and column not in existing:
+                cursor.execute(
+                    f'ALTER TABLE "future_predictions" ADD COLUMN "{column}" REAL'
+                )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0005_region_national_series'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='futureprediction',
+            name='week_1_lower',
+            field=models.FloatField(db_column='Week_1_Lower', null=True),
+        ),
+        migrations.AddField(
+            model_name='futureprediction',
+            name='week_1_upper',
+            field=models.FloatField(db_column='Week_1_Upper', null=True),
+        ),
+        migrations.AddField(
+            model_name='futureprediction',
+            name='week_2_lower',
+            field=models.FloatField(db_column='Week_2_Lower', null=True),
+        ),
+        migrations.AddField(
+            model_name='futureprediction',
+            name='week_2_upper',
+            field=models.FloatField(db_column='Week_2_Upper', null=True),
+        ),
+        migrations.AddField(
+            model_name='futureprediction',
+            name='week_3_lower',
+            field=models.FloatField(db_column='Week_3_Lower', null=True),
+        ),
+        migrations.AddField(
+            model_name='futureprediction',
+            name='week_3_upper',
+            field=models.FloatField(db_column='Week_3_Upper', null=True),
+        ),
+        migrations.AddField(
+            model_name='futureprediction',
+            name='week_4_lower',
+            field=models.FloatField(db_column='Week_4_Lower', null=True),
+        ),
+        migrations.AddField(
+            model_name='futureprediction',
+            name='week_4_upper',
+            field=models.FloatField(db_column='Week_4_Upper', null=True),
+        ),
+        migrations.RunPython(add_interval_columns, migrations.RunPython.noop),
+    ]
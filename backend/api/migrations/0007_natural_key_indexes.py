@@ -0,0 +1,33 @@
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0006_prediction_intervals'),
+    ]
+
+    operations = [
+        # populate_db.py used to append every download, so existing tables can
+        # hold duplicate rows; keep the newest before adding the unique keys
+        migrations.RunSQL(
+            sql=[
+                '''DELETE FROM "state_timeseries" WHERE rowid NOT IN (
+                    SELECT MAX(rowid) FROM "state_timeseries"
+                    GROUP BY "State", "Ending_Date", "Data_Collection_Period"
+                )''',
+                '''DELETE FROM "county_current" WHERE rowid NOT IN (
+                    SELECT MAX(rowid) FROM "county_current"
+                    GROUP BY "Sewershed_ID", "Reporting_Week"
+                )''',
+                '''CREATE UNIQUE INDEX IF NOT EXISTS "state_timeseries_natural_key_idx"
+                    ON "state_timeseries" ("State", "Ending_Date", "Data_Collection_Period")''',
+                '''CREATE UNIQUE INDEX IF NOT EXISTS "county_current_natural_key_idx"
+                    ON "county_current" ("Sewershed_ID", "Reporting_Week")''',
+            ],
+            reverse_sql=[
+                'DROP INDEX IF EXISTS "state_timeseries_natural_key_idx"',
+                'DROP INDEX IF EXISTS "county_current_natural_key_idx"',
+            ],
+        ),
+    ]
@@ -0,0 +1,23 @@
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0007_natural_key_indexes'),
+    ]
+
+    # county_current is unmanaged and already unique on (Sewershed_ID,
+    # Reporting_Week) since 0007, so this only updates the model state
+    operations = [
+        migrations.AlterField(
+            model_name='countycurrent',
+            name='sewershed_id',
+            field=models.TextField(db_column='Sewershed_ID'),
+        ),
+        migrations.AddField(
+            model_name='countycurrent',
+            name='pk',
+            field=models.CompositePrimaryKey('sewershed_id', 'reporting_week', blank=True, editable=False, primary_key=True, serialize=False),
+        ),
+    ]
@@ -0,0 +1,18 @@
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0008_countycurrent_composite_pk'),
+    ]
+
+    # state_timeseries is unmanaged and already unique on (State, Ending_Date,
+    # Data_Collection_Period) since 0007, so this only updates the model state
+    operations = [
+        migrations.AlterField(
+            model_name='statetimeseries',
+            name='pk',
+            field=models.CompositePrimaryKey('state_territory', 'ending_date', 'data_collection_period', blank=True, editable=False, primary_key=True, serialize=False),
+        ),
+    ]
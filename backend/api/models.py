@@ -3,8 +3,11 @@ from django.db.models import CompositePrimaryKey
 
 
 class CountyCurrent(models.Model):
+    """One row per sewershed and Reporting_Week (NATURAL_KEYS in api/schema.py)."""
+
+    pk = CompositePrimaryKey("sewershed_id", "reporting_week")
     state_territory = models.TextField(db_column="State")
-    sewershed_id = models.TextField(db_column="Sewershed_ID", primary_key=True)
+    sewershed_id = models.TextField(db_column="Sewershed_ID")
     counties_served = models.TextField(db_column="Counties_Served")
     population_served = models.FloatField(db_column="Population_Served")
     wval_category = models.TextField(db_column="WVAL_Category")
@@ -15,8 +18,42 @@ class CountyCurrent(models.Model):
         db_table = "county_current"
 
 
+class SewershedCounty(models.Model):
+    """One row per (sewershed, county) pair split out of Counties_Served at ingest."""
+
+    pk = CompositePrimaryKey("sewershed_id", "county")
+    state_territory = models.TextField(db_column="State")
+    sewershed_id = models.TextField(db_column="Sewershed_ID")
+    county = models.TextField(db_column="County")
+    population_served = models.FloatField(db_column="Population_Served", null=True)
+    wval_category = models.TextField(db_column="WVAL_Category")
+
+    class Meta:
+        managed = False
+        db_table = "sewershed_county"
+
+
+class CountyAggregate(models.Model):
+    """Per-county WVAL category averaged over the sewersheds serving it."""
+
+    pk = CompositePrimaryKey("state_territory", "county")
+    state_territory = models.TextField(db_column="State")
+    county = models.TextField(db_column="County")
+    wval_category = models.TextField(db_column="WVAL_Category", null=True)
+    weighted_wval_category = models.TextField(
+        db_column="Weighted_WVAL_Category", null=True
+    )
+    sewershed_count = models.IntegerField(db_column="Sewershed_Count")
+    population_served = models.FloatField(db_column="Population_Served", null=True)
+    reporting_week = models.TextField(db_column="Reporting_Week")
+
+    class Meta:
+        managed = False
+        db_table = "county_aggregate"
+
+
 class StateTimeseries(models.Model):
-    pk = CompositePrimaryKey("state_territory", "ending_date")
+    pk = CompositePrimaryKey("state_territory", "ending_date", "data_collection_period")
     state_territory = models.TextField(db_column="State")
     ending_date = models.DateField(db_column="Ending_Date")
     data_collection_period = models.TextField(db_column="Data_Collection_Period")
@@ -31,12 +68,46 @@ class StateTimeseries(models.Model):
         db_table = "state_timeseries"
 
 
+class RegionSeries(models.Model):
+    """Deduplicated Regional_WVAL series, one row per region and week."""
+
+    pk = CompositePrimaryKey("region", "ending_date")
+    region = models.TextField(db_column="Region")
+    ending_date = models.DateField(db_column="Ending_Date")
+    regional_wval = models.FloatField(db_column="Regional_WVAL", null=True)
+
+    class Meta:
+        managed = False
+        db_table = "region_series"
+
+
+class NationalSeries(models.Model):
+    """Deduplicated National_WVAL series, one row per week."""
+
+    ending_date = models.DateField(db_column="Ending_Date", primary_key=True)
+    national_wval = models.FloatField(db_column="National_WVAL", null=True)
+
+    class Meta:
+        managed = False
+        db_table = "national_series"
+
+
 class FuturePrediction(models.Model):
     state = models.TextField(db_column="state", primary_key=True)
     week_1_prediction = models.FloatField(db_column="Week_1_Prediction")
     week_2_prediction = models.FloatField(db_column="Week_2_Prediction")
     week_3_prediction = models.FloatField(db_column="Week_3_Prediction")
     week_4_prediction = models.FloatField(db_column="Week_4_Prediction")
+    # 10th / 90th percentile of the Monte Carlo dropout forecasts; null for
+    # baseline forecasts
+    week_1_lower = models.FloatField(db_column="Week_1_Lower", null=True)
+    week_1_upper = models.FloatField(db_column="Week_1_Upper", null=True)
+    week_2_lower = models.FloatField(db_column="Week_2_Lower", null=True)
+    week_2_upper = models.FloatField(db_column="Week_2_Upper", null=True)
+    week_3_lower = models.FloatField(db_column="Week_3_Lower", null=True)
+    week_3_upper = models.FloatField(db_column="Week_3_Upper", null=True)
+    week_4_lower = models.FloatField(db_column="Week_4_Lower", null=True)
+    week_4_upper = models.FloatField(db_column="Week_4_Upper", null=True)
 
     class Meta:
         managed = False
@@ -49,9 +120,30 @@ class FuturePrediction(models.Model):
             "week_2_prediction": self.week_2_prediction,
             "week_3_prediction": self.week_3_prediction,
             "week_4_prediction": self.week_4_prediction,
+            "week_1_lower": self.week_1_lower,
+            "week_1_upper": self.week_1_upper,
+            "week_2_lower": self.week_2_lower,
+            "week_2_upper": self.week_2_upper,
+            "week_3_lower": self.week_3_lower,
+            "week_3_upper": self.week_3_upper,
+            "week_4_lower": self.week_4_lower,
+            "week_4_upper": self.week_4_upper,
         }
 
 
+class IngestRun(models.Model):
+    """One row per completed write by populate_db.py or the prediction pipeline."""
+
+    id = models.AutoField(db_column="Id", primary_key=True)
+    source = models.TextField(db_column="Source")
+    finished_at = models.DateTimeField(db_column="Finished_At")
+    max_ending_date = models.DateField(db_column="Max_Ending_Date", null=True)
+
+    class Meta:
+        managed = False
+        db_table = "ingest_run"
+
+
 class EmailList(models.Model):
     email = models.TextField(db_column="Email", primary_key=True)
     location = models.TextField(db_column="Location")
@@ -0,0 +1,68 @@
+# CDC wastewater regions (US Census regions), keyed by the codes /api/region
+# accepts. Every state in a region reports the same Regional_WVAL.
+REGION_STATES = {
+    "NE": [
+        "Connecticut",
+        "Maine",
+        "Massachusetts",
+        "New Hampshire",
+        "New Jersey",
+        "New York",
+        "Pennsylvania",
+        "Rhode Island",
+        "Vermont",
+    ],
+    "MW": [
+        "Illinois",
+        "Indiana",
+        "Iowa",
+        "Kansas",
+        "Michigan",
+        "Minnesota",
+        "Missouri",
+        "Nebraska",
+        "North Dakota",
+        "Ohio",
+        "South Dakota",
+        "Wisconsin",
+    ],
+    "S": [
+        "Alabama",
+        "Arkansas",
+        "Delaware",
+        "District of Columbia",
+        "Florida",
+        "Georgia",
+        "Kentucky",
+        "Louisiana",
+        "Maryland",
+        "Mississippi",
+        "North Carolina",
+        "Oklahoma",
+        "South Carolina",
+        "Tennessee",
+        "Texas",
+        "Virginia",
+        "West Virginia",
+    ],
+    "W": [
+        "Alaska",
+        "Arizona",
+        "California",
+        "Colorado",
+        "Guam",
+        "Hawaii",
+        "Idaho",
+        "Montana",
+        "Nevada",
+        "New Mexico",
+        "Oregon",
+        "Utah",
+        "Washington",
+        "Wyoming",
+    ],
+}
+
+STATE_REGIONS = {
+    state: region for region, states in REGION_STATES.items() for state in states
+}
@@ -0,0 +1,137 @@
+"""
+Shared cache of rendered API responses.
+
+Entries are keyed by view, normalized query string and the current data
+version (api/data_version.py). Every ingest or prediction run records a new
+ingest_run row, which changes the version, so stale entries are never served
+after a write and simply age out of the cache.
+"""
+
+import hashlib
+from functools import wraps
+from inspect import iscoroutinefunction
+
+from django.conf import settings
+from django.core.cache import caches
+from django.http import HttpResponse, StreamingHttpResponse
+
+from .data_version import get_data_version
+
+
+def get_response_cache():
+    return caches[settings.API_RESPONSE_CACHE]
+
+
+def response_cache_key(request, view_name):
+    params = sorted(
+        (key, value) for key in request.GET for value in request.GET.getlist(key)
+    )
+    raw_key = f"{view_name}|{get_data_version(request)[0]}|{params}"
+    return "api-response:" + hashlib.sha256(raw_key.encode()).hexdigest()
+
+
+def cache_streaming_content(cache, key, response):
+    # Stream to the client as usual and store the body once it is complete
+    chunks = []
+    for chunk in response.streaming_content:
+        chunks.append(chunk)
+        yield chunk
+    cache.set(
+        key,
+        (b"".join(chunks), dict(response.headers)),
+        settings.API_RESPONSE_CACHE_TIMEOUT,
+    )
+
+
+async def acache_streaming_content(cache, key, response):
+    chunks = []
+    async for chunk in response.streaming_content:
+        chunks.append(chunk)
+        yield chunk
+    await cache.aset(
+        key,
+        (b"".join(chunks), dict(response.headers)),
+        settings.API_RESPONSE_CACHE_TIMEOUT,
+    )
+
+
+def cached_response(view):
+    """Serves successful GET responses from the shared response cache."""
+    if iscoroutinefunction(view):
+        return async_cached_response(view)
+
+    @wraps(view)
+    def wrapper(request, *args, **kwargs):
+        if request.method != "GET":
+            return view(request, *args, **kwargs)
+
+        cache = get_response_cache()
+        key = response_cache_key(request, view.__name__)
+
+        cached = cache.get(key)
+        if cached is not None:
+            content, headers = cached
+            response = HttpResponse(content, headers=headers)
+            response["X-Cache"] = "HIT"
+            return response
+
+        response = view(request, *args, **kwargs)
+        if response.status_code != 200:
+            return response
+
+        if response.streaming:
+            response = StreamingHttpResponse(
+                cache_streaming_content(cache, key, response),
+                headers=dict(response.headers),
+            )
+        else:
+            cache.set(
+                key,
+                (response.content, dict(response.headers)),
+                settings.API_RESPONSE_CACHE_TIMEOUT,
+            )
+        response["X-Cache"] = "MISS"
+        return response
+
+    return wrapper
+
+
+def async_cached_response(view):
+    # Same behaviour as cached_response() for async views, using the cache
+    # framework's async methods. Place it under @data_versioned so the data
+    # version is already loaded when the key is built.
+
+    @wraps(view)
+    async def wrapper(request, *args, **kwargs):
+        if request.method != "GET":
+            return await view(request, *args, **kwargs)
+
+        cache = get_response_cache()
+        key = response_cache_key(request, view.__name__)
+
+        cached = await cache.aget(key)
+        if cached is not None:
+            content, headers = cached
+            response = HttpResponse(content, headers=headers)
+            response["X-Cache"] = "HIT"
+            return response
+
+        response = await view(request, *args, **kwargs)
+        if response.status_code != 200:
+            return response
+
+        if response.streaming:
+            response = StreamingHttpResponse(
+                acache_streaming_content(cache, key, response),
+                headers=dict(response.headers),
+            )
+        else:
+            await cache.aset(
+                key,
+                (response.content, dict(response.headers)),
+                settings.API_RESPONSE_CACHE_TIMEOUT,
+            )
+        response["X-Cache"] = "MISS"
+        return response
+
+    return wrapper
@@ -0,0 +1,178 @@
+"""
+DDL for the tables that populate_db.py and virus_prediction.py load and the
+API reads.
+
+These tables are unmanaged by the Django ORM, so their layout and indexes live
+here. populate_db.py applies the statements directly through sqlite3 and the
+api migrations apply the same SQL when running `python manage.py migrate`.
+"""
+
+TABLES = [
+    """CREATE TABLE IF NOT EXISTS "state_timeseries" (
+        "State" TEXT,
+        "Ending_Date" TEXT,
+        "Data_Collection_Period" TEXT,
+        "State_WVAL" FLOAT,
+        "National_WVAL" FLOAT,
+        "Regional_WVAL" FLOAT,
+        "WVAL_Category" TEXT,
+        "Coverage" TEXT
+    )""",
+    """CREATE TABLE IF NOT EXISTS "county_current" (
+        "State" TEXT,
+        "Sewershed_ID" TEXT,
+        "Counties_Served" TEXT,
+        "Population_Served" FLOAT,
+        "WVAL_Category" TEXT,
+        "Reporting_Week" TEXT
+    )""",
+    """CREATE TABLE IF NOT EXISTS "sewershed_county" (
+        "State" TEXT,
+        "Sewershed_ID" TEXT,
+        "County" TEXT,
+        "Population_Served" FLOAT,
+        "WVAL_Category" TEXT
+    )""",
+    """CREATE TABLE IF NOT EXISTS "county_aggregate" (
+        "State" TEXT,
+        "County" TEXT,
+        "WVAL_Category" TEXT,
+        "Weighted_WVAL_Category" TEXT,
+        "Sewershed_Count" INTEGER,
+        "Population_Served" FLOAT,
+        "Reporting_Week" TEXT
+    )""",
+    """CREATE TABLE IF NOT EXISTS "region_series" (
+        "Region" TEXT,
+        "Ending_Date" TEXT,
+        "Regional_WVAL" FLOAT
+    )""",
+    """CREATE TABLE IF NOT EXISTS "national_series" (
+        "Ending_Date" TEXT,
+        "National_WVAL" FLOAT
+    )""",
+    """CREATE TABLE IF NOT EXISTS "future_predictions" (
+        "State" TEXT,
+        "Week_1_Prediction" REAL,
+        "Week_2_Prediction" REAL,
+        "Week_3_Prediction" REAL,
+        "Week_4_Prediction" REAL,
+        "Week_1_Lower" REAL,
+        "Week_1_Upper" REAL,
+        "Week_2_Lower" REAL,
+        "Week_2_Upper" REAL,
+        "Week_3_Lower" REAL,
+        "Week_3_Upper" REAL,
+        "Week_4_Lower" REAL,
+        "Week_4_Upper" REAL
+    )""",
+    """CREATE TABLE IF NOT EXISTS "ingest_run" (
+        "Id" INTEGER PRIMARY KEY AUTOINCREMENT,
+        "Source" TEXT,
+        "Finished_At" TEXT,
+        "Max_Ending_Date" TEXT
+    )""",
+]
+
+# Columns added after their table was first created; (table, column, type).
+# CREATE TABLE IF NOT EXISTS leaves older tables alone, so these are added
+# to existing tables by add_missing_columns.
+ADDED_COLUMNS = [
+    ("future_predictions", f"Week_{week}_{bound}", "REAL")
+    for week in range(1, 5)
+    for bound in ("Lower", "Upper")
+]
+
+# Natural key of each raw table populate_db.py upserts into. state_timeseries
+# holds one row per collection period (45 Days, 6 Months, ...) of each week.
+NATURAL_KEYS = {
+    "state_timeseries": ("State", "Ending_Date", "Data_Collection_Period"),
+    "county_current": ("Sewershed_ID", "Reporting_Week"),
+}
+
+# Tables loaded by appending before the natural keys existed can hold
+# duplicates, which would block the unique indexes below; keep the newest row.
+# Keyed by the natural key index each statement makes room for.
+DEDUPLICATE = {
+    "state_timeseries_natural_key_idx": """DELETE FROM "state_timeseries"
+        WHERE rowid NOT IN (
+            SELECT MAX(rowid) FROM "state_timeseries"
+            GROUP BY "State", "Ending_Date", "Data_Collection_Period"
+        )""",
+    "county_current_natural_key_idx": """DELETE FROM "county_current"
+        WHERE rowid NOT IN (
+            SELECT MAX(rowid) FROM "county_current"
+            GROUP BY "Sewershed_ID", "Reporting_Week"
+        )""",
+}
+
+INDEXES = [
+    """CREATE INDEX IF NOT EXISTS "state_timeseries_state_date_idx"
+        ON "state_timeseries" ("State", "Ending_Date")""",
+    """CREATE INDEX IF NOT EXISTS "county_current_state_sewershed_idx"
+        ON "county_current" ("State", "Sewershed_ID")""",
+    """CREATE INDEX IF NOT EXISTS "sewershed_county_state_county_idx"
+        ON "sewershed_county" ("State", "County")""",
+    """CREATE UNIQUE INDEX IF NOT EXISTS "county_aggregate_state_county_idx"
+        ON "county_aggregate" ("State", "County")""",
+    """CREATE UNIQUE INDEX IF NOT EXISTS "region_series_region_date_idx"
+        ON "region_series" ("Region", "Ending_Date")""",
+    """CREATE UNIQUE INDEX IF NOT EXISTS "national_series_date_idx"
+        ON "national_series" ("Ending_Date")""",
+    """CREATE UNIQUE INDEX IF NOT EXISTS "state_timeseries_natural_key_idx"
+        ON "state_timeseries" ("State", "Ending_Date", "Data_Collection_Period")""",
+    """CREATE UNIQUE INDEX IF NOT EXISTS "county_current_natural_key_idx"
+        ON "county_current" ("Sewershed_ID", "Reporting_Week")""",
+]
+
+
+def record_ingest_run(conn, source):
+    """
+    Records a completed write so the API's data version (ETag) changes. Runs
+    in the caller's transaction, so the run becomes visible together with the
+    data it records when the caller commits. Returns the new run id.
+    """
+    cursor = conn.execute(
+        '''INSERT INTO "ingest_run" ("Source", "Finished_At", "Max_Ending_Date")
+            SELECT ?, datetime('now'), MAX("Ending_Date") FROM "state_timeseries"''',
+        (source,),
+    )
+    return cursor.lastrowid
+
+
+def add_missing_columns(cursor):
+    """
+    Adds any ADDED_COLUMNS missing from existing tables. Takes a DB-API
+    cursor, so it serves both sqlite3 and the migrations' Django connection.
+    """
+    for table, column, column_type in ADDED_COLUMNS:
+        cursor.execute(f'PRAGMA table_info("{table}")')
+        existing = {row[1] for row in cursor.fetchall()}
+        if existing and column not in existing:
+            cursor.execute(f'ALTER TABLE "{table}" ADD COLUMN "{column}" {column_type}')
+
+
+def ensure_schema(conn):
+    """
+    Creates any missing tables, columns and indexes on a sqlite3 connection,
+    dropping natural-key duplicates first where a unique index is still to be
+    built. Also switches the database file to WAL, so API readers keep reading
+    while populate_db.py or virus_prediction.py write.
+    """
+    # Persistent for the file; must run outside a transaction
+    conn.execute("PRAGMA journal_mode=WAL")
+    for statement in TABLES:
+        conn.execute(statement)
+    # Once an index exists it keeps duplicates out, so the full-table scans
+    # run at most once per database (migration 0007 does the same)
+    indexes = {
+        row[0]
+        for row in conn.execute("SELECT name FROM sqlite_master WHERE type = 'index'")
+    }
+    for index, statement in DEDUPLICATE.items():
+        if index not in indexes:
+            conn.execute(statement)
+    for statement in INDEXES:
+        conn.execute(statement)
+    add_missing_columns(conn.cursor())
+    conn.commit()
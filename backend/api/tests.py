@@ -1,3 +1,413 @@
-from django.test import TestCase
+import csv
+import os
+import sqlite3
+import tempfile
+from unittest import mock
 
-# Create your tests here.
+from asgiref.sync import async_to_sync
+from django.conf import settings
+from django.core.cache import caches
+from django.db import connection
+from django.test import AsyncClient, SimpleTestCase, TestCase
+
+import populate_db
+
+from .schema import INDEXES, TABLES, ensure_schema
+
+STATES = ["Ohio", "Texas"]
+WEEKS = ["2025-03-29", "2025-04-05", "2025-04-12"]
+PERIODS = ["45 Days", "All Results"]
+
+
+class DataTablesTestCase(TestCase):
+    """
+    Creates the unmanaged data tables (api/schema.py) in the test database and
+    loads a small fixture: two states, three weeks, two collection periods.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        with connection.cursor() as cursor:
+            for statement in TABLES + INDEXES:
+                cursor.execute(statement)
+            for i, week in enumerate(WEEKS):
+                for state in STATES:
+                    for period in PERIODS:
+                        cursor.execute(
+                            'INSERT INTO "state_timeseries" VALUES '
+                            "(%s, %s, %s, %s, %s, %s, %s, %s)",
+                            [state, week, period, 1.0 + i, 2.0, 3.0, "Low", "Full"],
+                        )
+                cursor.execute(
+                    'INSERT INTO "national_series" VALUES (%s, %s)', [week, 2.0 + i]
+                )
+                cursor.execute(
+                    'INSERT INTO "region_series" VALUES (%s, %s, %s)',
+                    ["MW", week, 3.0 + i],
+                )
+            cursor.execute(
+                'INSERT INTO "county_aggregate" VALUES (%s, %s, %s, %s, %s, %s, %s)',
+                ["Ohio", "Allen", "Low", "Moderate", 2, 1000.0, WEEKS[-1]],
+            )
+            cursor.execute(
+                'INSERT INTO "future_predictions" ("State", "Week_1_Prediction", '
+                '"Week_2_Prediction", "Week_3_Prediction", "Week_4_Prediction") '
+                "VALUES (%s, %s, %s, %s, %s)",
+                ["Ohio", 1.0, 2.0, 3.0, 4.0],
+            )
+            cursor.execute(
+                'INSERT INTO "ingest_run" ("Source", "Finished_At", "Max_Ending_Date") '
+                "VALUES (%s, %s, %s)",
+                ["tests", "2025-04-13 00:00:00", WEEKS[-1]],
+            )
+
+    def setUp(self):
+        caches[settings.API_RESPONSE_CACHE].clear()
+
+
+def body(response):
+    if response.streaming:
+        return b"".join(response.streaming_content)
+    return response.content
+
+
+async def async_get(url):
+    # Reads the body inside the event loop, where async streams can be iterated
+    response = await AsyncClient().get(url)
+    if response.streaming:
+        return response, b"".join([chunk async for chunk in response.streaming_content])
+    return response, response.content
+
+
+class AsyncParityTests(DataTablesTestCase):
+    """The /api/async/ endpoints return exactly what their sync twins return."""
+
+    URLS = [
+        "county?state=Ohio",
+        "county?state=Ohio&county=Allen&weighted=true",
+        "county?state=Ohio&history=true",
+        "state?state=Ohio",
+        "state?state=Ohio&history=true&limit=2&fields=state_territory_wval",
+        "state?state=Nowhere",
+        "state/all",
+        "state/all?history=true",
+        "state/all?history=true&format=columnar",
+        "region?region=MW&history=true&since=2025-04-01",
+        "region?region=XX",
+        "nation",
+        "nation?history=true&limit=1&after=2025-03-29",
+        "predictions",
+    ]
+
+    def test_async_endpoints_match_sync(self):
+        for url in self.URLS:
+            with self.subTest(url=url):
+                sync_response = self.client.get(f"/api/{url}")
+                # Both routes share cache keys, so miss the cache for each
+                caches[settings.API_RESPONSE_CACHE].clear()
+                async_response, async_body = async_to_sync(async_get)(
+                    f"/api/async/{url}"
+                )
+                caches[settings.API_RESPONSE_CACHE].clear()
+
+                self.assertEqual(async_response.status_code, sync_response.status_code)
+                self.assertEqual(async_body, body(sync_response))
+                self.assertEqual(
+                    async_response.get("X-Next-Cursor"),
+                    sync_response.get("X-Next-Cursor"),
+                )
+
+
+def record_ingest_run():
+    # A write as populate_db.py makes it: new data plus a new ingest_run row
+    with connection.cursor() as cursor:
+        cursor.execute(
+            'UPDATE "state_timeseries" SET "State_WVAL" = 9.0 '
+            'WHERE "State" = %s AND "Ending_Date" = %s',
+            ["Ohio", WEEKS[-1]],
+        )
+        cursor.execute(
+            'INSERT INTO "ingest_run" ("Source", "Finished_At", '
+            '"Max_Ending_Date") VALUES (%s, %s, %s)',
+            ["tests", "2025-04-14 00:00:00", WEEKS[-1]],
+        )
+
+
+class DataVersionTests(DataTablesTestCase):
+    """ETag/304 handling follows the latest ingest run."""
+
+    URL = "/api/state?state=Ohio"
+
+    def test_conditional_get_is_not_modified(self):
+        response = self.client.get(self.URL)
+        self.assertEqual(response.status_code, 200)
+        self.assertIn("max-age", response["Cache-Control"])
+
+        response = self.client.get(self.URL, HTTP_IF_NONE_MATCH=response["ETag"])
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response.content, b"")
+
+    def test_new_ingest_run_changes_etag(self):
+        before = self.client.get(self.URL)
+        record_ingest_run()
+
+        after = self.client.get(self.URL, HTTP_IF_NONE_MATCH=before["ETag"])
+
+        self.assertEqual(after.status_code, 200)
+        self.assertNotEqual(after["ETag"], before["ETag"])
+
+
+class ResponseCacheTests(DataTablesTestCase):
+    """Rendered responses are cached under the current data version."""
+
+    URL = "/api/state?state=Ohio"
+
+    def test_repeat_request_is_served_from_cache(self):
+        first = self.client.get(self.URL)
+        second = self.client.get(self.URL)
+
+        self.assertEqual(first["X-Cache"], "MISS")
+        self.assertEqual(second["X-Cache"], "HIT")
+        self.assertEqual(second.content, first.content)
+
+    def test_new_ingest_run_misses_the_cache(self):
+        self.client.get(self.URL)
+        record_ingest_run()
+
+        response = self.client.get(self.URL)
+
+        self.assertEqual(response["X-Cache"], "MISS")
+        self.assertEqual(response.json()["state_territory_wval"], 9.0)
+
+
+class HistoryCursorTests(DataTablesTestCase):
+    """History pages are cut on whole weeks and chained with X-Next-Cursor."""
+
+    def test_pages_hold_every_collection_period_of_a_week(self):
+        url = "/api/state?state=Ohio&history=true&limit=1"
+        response = self.client.get(url)
+        pages = [response.json()]
+        while "X-Next-Cursor" in response:
+            response = self.client.get(f"{url}&after={response['X-Next-Cursor']}")
+            pages.append(response.json())
+
+        self.assertEqual(
+            [[row["ending_date"] for row in page] for page in pages],
+            [[week] * len(PERIODS) for week in WEEKS],
+        )
+
+    def test_last_page_has_no_cursor(self):
+        response = self.client.get(
+            f"/api/nation?history=true&limit={len(WEEKS)}&after=2025-01-01"
+        )
+        self.assertEqual(response.json()["dates"], WEEKS)
+        self.assertNotIn("X-Next-Cursor", response)
+
+    def test_cursor_is_the_last_week_returned(self):
+        response = self.client.get("/api/region?region=MW&history=true&limit=2")
+        self.assertEqual(response.json()["dates"], WEEKS[:2])
+        self.assertEqual(response["X-Next-Cursor"], WEEKS[1])
+
+
+class BatchIncludeTests(DataTablesTestCase):
+    """Parsing of /api/batch's states and include parameters."""
+
+    def get_batch(self, query):
+        return self.client.get(f"/api/batch?{query}")
+
+    def test_empty_include_tokens_are_ignored(self):
+        response = self.get_batch("states=Ohio,Texas&include=latest,,counties,")
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(set(response.json()), set(STATES))
+        self.assertEqual(set(response.json()["Ohio"]), {"latest", "counties"})
+        self.assertEqual(response.json()["Ohio"]["latest"]["ending_date"], WEEKS[-1])
+
+    def test_default_include_is_latest_and_predictions(self):
+        response = self.get_batch("states=Ohio")
+        self.assertEqual(set(response.json()["Ohio"]), {"latest", "prediction"})
+
+    def test_unknown_include_section_is_rejected(self):
+        response = self.get_batch("states=Ohio&include=latest,bogus")
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.json()["error"], "Unknown include sections: bogus")
+
+    def test_unknown_states_are_rejected(self):
+        response = self.get_batch("states=Ohio,Nowhere,Atlantis")
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.json()["error"], "Unknown states: Nowhere, Atlantis")
+
+
+class ScratchDatabaseTestCase(SimpleTestCase):
+    """Runs populate_db.py's loaders against a scratch sqlite3 database."""
+
+    def setUp(self):
+        self.conn = sqlite3.connect(":memory:")
+        ensure_schema(self.conn)
+        self.addCleanup(self.conn.close)
+
+    def count(self, table):
+        return self.conn.execute(f'SELECT COUNT(*) FROM "{table}"').fetchone()[0]
+
+
+class StateIngestTests(ScratchDatabaseTestCase):
+    """Staging, upserting and publishing the state CSV."""
+
+    def write_state_csv(self, rows):
+        # rows: (state, week, period, state_wval)
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        path = os.path.join(directory.name, "state.csv")
+        with open(path, "w", newline="") as f:
+            writer = csv.writer(f)
+            writer.writerow(populate_db.STATE_COLUMNS)
+            for state, week, period, wval in rows:
+                writer.writerow([state, week, period, wval, 2.0, 3.0, "Low", "Full"])
+        return path
+
+    def load(self, rows, backfill=False):
+        staged = populate_db.process_state_data(
+            self.write_state_csv(rows), self.conn, backfill=backfill
+        )
+        return staged, populate_db.publish(self.conn)
+
+    def state_rows(self):
+        return self.conn.execute(
+            'SELECT "State", "Ending_Date", "Data_Collection_Period", "State_WVAL" '
+            'FROM "state_timeseries" ORDER BY 1, 2, 3'
+        ).fetchall()
+
+    ROWS = [
+        ("Ohio", WEEKS[0], "45 Days", 1.0),
+        ("Ohio", WEEKS[1], "45 Days", 2.0),
+        ("Ohio", WEEKS[1], "All Results", 2.5),
+        ("Texas", WEEKS[0], "45 Days", 4.0),
+    ]
+
+    def test_loads_each_states_latest_week(self):
+        self.assertEqual(self.load(self.ROWS), (4, 3))
+        self.assertEqual(
+            self.state_rows(),
+            [
+                ("Ohio", WEEKS[1], "45 Days", 2.0),
+                ("Ohio", WEEKS[1], "All Results", 2.5),
+                ("Texas", WEEKS[0], "45 Days", 4.0),
+            ],
+        )
+        self.assertEqual(self.count("ingest_run"), 1)
+
+    def test_backfill_loads_every_week(self):
+        self.load(self.ROWS, backfill=True)
+        self.assertEqual(self.state_rows(), sorted(self.ROWS))
+
+    def test_rerun_writes_nothing_and_changes_update_in_place(self):
+        self.load(self.ROWS)
+
+        self.assertEqual(self.load(self.ROWS)[1], 0)
+        self.assertEqual(self.count("ingest_run"), 1)
+
+        changed = self.ROWS[:2] + [("Ohio", WEEKS[1], "All Results", 7.0)]
+        self.assertEqual(self.load(changed)[1], 1)
+        self.assertIn(("Ohio", WEEKS[1], "All Results", 7.0), self.state_rows())
+        self.assertEqual(self.count("state_timeseries"), 3)
+        self.assertEqual(self.count("ingest_run"), 2)
+
+    def test_invalid_file_leaves_live_tables_alone(self):
+        self.load(self.ROWS)
+        before = self.state_rows()
+
+        staged, changed = self.load([("Ohio", WEEKS[2], "45 Days", -1.0)])
+
+        self.assertIsNone(staged)
+        self.assertEqual(changed, 0)
+        self.assertEqual(self.state_rows(), before)
+        self.assertEqual(self.count("ingest_run"), 1)
+        self.assertEqual(populate_db.staged_tables(self.conn), [])
+
+    def test_failed_rebuild_rolls_back_the_whole_load(self):
+        self.load(self.ROWS)
+        before = self.state_rows()
+        national_weeks = self.count("national_series")
+
+        with mock.patch.object(
+            populate_db,
+            "process_region_national_series",
+            side_effect=ValueError("rebuild failed"),
+        ):
+            staged, changed = self.load([("Ohio", WEEKS[2], "45 Days", 3.0)])
+
+        self.assertEqual(staged, 1)
+        self.assertIsNone(changed)
+        self.assertEqual(self.state_rows(), before)
+        self.assertEqual(self.count("ingest_run"), 1)
+        self.assertEqual(self.count("national_series"), national_weeks)
+        self.assertEqual(populate_db.staged_tables(self.conn), [])
+
+
+class CountyAggregateTests(ScratchDatabaseTestCase):
+    """populate_db.py's county aggregates, rebuilt from county_current."""
+
+    def add_county_rows(self, *rows):
+        self.conn.executemany(
+            'INSERT INTO "county_current" VALUES (?, ?, ?, ?, ?, ?)', rows
+        )
+        self.conn.commit()
+
+    def aggregates(self):
+        return self.conn.execute(
+            'SELECT "County", "WVAL_Category", "Sewershed_Count", "Reporting_Week" '
+            'FROM "county_aggregate" ORDER BY "County"'
+        ).fetchall()
+
+    def test_uses_only_the_latest_snapshot(self):
+        # Older week first, and sorting after the newer one as a string
+        old_week = "March 29, 2025 - April 4, 2025"
+        new_week = "April 5, 2025 - April 11, 2025"
+        self.add_county_rows(
+            ("Ohio", "ID:1", "Allen, Auglaize", 1000.0, "Very High", old_week),
+            ("Ohio", "ID:2", "Allen", 500.0, "Very High", old_week),
+            ("Ohio", "ID:3", "Hardin", 800.0, "High", old_week),
+            ("Ohio", "ID:1", "Allen, Auglaize", 1000.0, "Low", new_week),
+        )
+
+        populate_db.publish(self.conn, rebuild=True)
+
+        # ID:2 and ID:3 are not in the newest snapshot, so Hardin has no
+        # sewersheds left and ID:2 no longer raises Allen's level
+        self.assertEqual(
+            self.aggregates(),
+            [("Allen", "Low", 1, new_week), ("Auglaize", "Low", 1, new_week)],
+        )
+
+
+class SourceManifestTests(SimpleTestCase):
+    """populate_db.py's record of what each database last loaded."""
+
+    source = populate_db.Source("state", "https://example.com/state.csv", None, 30)
+
+    def test_entries_are_kept_per_database(self):
+        manifest = {}
+        entry = {"sha256": "abc", "path": "cache/raw/abc.csv"}
+        with mock.patch.object(populate_db, "save_raw_manifest"):
+            populate_db.record_source(
+                self.source, ("cache/raw/abc.csv", entry, True), manifest, "/a.sqlite"
+            )
+
+        self.assertEqual(
+            populate_db.manifest_entry(manifest, self.source, "/a.sqlite"),
+            {**entry, "db": "/a.sqlite"},
+        )
+        # Another database has not loaded it, so it must not be skipped there
+        self.assertEqual(
+            populate_db.manifest_entry(manifest, self.source, "/b.sqlite"), {}
+        )
+        forced = self.source._replace(force=True)
+        self.assertEqual(populate_db.manifest_entry(manifest, forced, "/a.sqlite"), {})
+
+    def test_entries_without_a_database_belong_to_the_default_one(self):
+        manifest = {self.source.url: {"sha256": "abc"}}
+
+        self.assertEqual(
+            populate_db.manifest_entry(manifest, self.source, populate_db.DB_FILE),
+            {"sha256": "abc"},
+        )
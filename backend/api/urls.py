@@ -1,3 +1,4 @@
+from django.conf import settings
 from django.urls import path
 
 from . import views
@@ -8,7 +9,12 @@ urlpatterns = [
     path("state", views.get_state),
     path("state/all", views.get_all_states),
     path("county", views.get_county),
+    path("batch", views.get_batch),
     path("predictions", views.get_predictions, name="get_predictions"),
+    path("forecast", views.get_forecast),
     path("force_email", views.force_email),
     path("notifyme", views.notify_me),
 ]
+
+if settings.DEBUG:
+    urlpatterns.append(path("io_wait", views.io_wait))
@@ -1,296 +1,171 @@
-from collections import defaultdict
+import json
+import time
 
-from django.db.models import Avg
 from django.forms.models import model_to_dict
 from django.http import JsonResponse
-
-from .models import CountyCurrent, FuturePrediction, StateTimeseries
 from django.views.decorators.csrf import csrf_exempt
-from .tasks import *
-import json
-from collections import defaultdict
-
-from .models import CountyCurrent, StateTimeseries
-
-WVAL_CATEGORY_MAPPING = {
-    "Very Low": 1,
-    "Low": 2,
-    "Medium": 3,
-    "High": 4,
-    "Very High": 5,
-}
-
-REVERSE_WVAL_CATEGORY_MAPPING = {v: k for k, v in WVAL_CATEGORY_MAPPING.items()}
-
-
-def average_wval_category(values):
-    if not values:
-        return None
-    numeric_values = [
-        WVAL_CATEGORY_MAPPING.get(val) for val in values if val in WVAL_CATEGORY_MAPPING
-    ]
-    if not numeric_values:
-        return None
-    average = sum(numeric_values) / len(numeric_values)
-    closest_category_value = min(
-        REVERSE_WVAL_CATEGORY_MAPPING.keys(), key=lambda k: abs(k - average)
-    )
-    return REVERSE_WVAL_CATEGORY_MAPPING.get(closest_category_value)
-
 
+from .data_version import data_versioned
+from .endpoints import (
+    STATE_HISTORY_FIELDS,
+    all_states_response,
+    county_response,
+    io_wait_seconds,
+    latest_state_records,
+    national_response,
+    predictions_response,
+    regional_response,
+    run_sync,
+    state_response,
+)
+from .forecast import forecast_state
+from .history import paginate_history, parse_history_params
+from .models import CountyAggregate, EmailList, FuturePrediction, StateTimeseries
+from .response_cache import cached_response
+from .tasks import send_email
+
+# Sections /api/batch can return per state, and its fan-in limit
+BATCH_SECTIONS = {"latest", "history", "predictions", "counties"}
+MAX_BATCH_STATES = 60
+
+# Furthest horizon /api/forecast will roll a model out to, in weeks
+MAX_FORECAST_STEPS = 12
+
+
+# The read endpoints are written once in endpoints.py and shared with
+# async_views.py
+@data_versioned
+@cached_response
 def get_county(request):
-    if request.method == "GET":
-        state = request.GET.get("state")
-        county = request.GET.get("county")
-        historical = request.GET.get("history", "false").lower() == "true"
-
-        if historical:
-            return JsonResponse(
-                {"error": "Historical data not available on a per-county basis"},
-                status=400,
-            )
-
-        if not state:
-            return JsonResponse({"error": "Missing 'state' parameter"}, status=400)
-
-        try:
-            records = ""
-            if not county:
-                records = CountyCurrent.objects.filter(state_territory__icontains=state)
-            else:
-                records = CountyCurrent.objects.filter(
-                    state_territory__icontains=state, counties_served__icontains=county
-                )
-
-            if not records:
-                return JsonResponse({"error": "No matching counties found"}, status=404)
-
-            if not county:
-                entries = list(records.values())
-
-                county_groups_categories = defaultdict(list)
-
-                for entry in entries:
-                    counties_served = entry.get("counties_served")
-                    wval_cat = entry.get("wval_category")
-
-                    if counties_served and wval_cat is not None:
-                        county_names = [
-                            name.strip()
-                            for name in counties_served.split(",")
-                            if name.strip()
-                        ]
-                        for county_name in county_names:
-                            if county_name:
-                                county_groups_categories[county_name].append(wval_cat)
-                            else:
-                                print("Empty county name?")
-
-                response = []
-                for county_name, wval_list in county_groups_categories.items():
-                    if wval_list:
-                        averaged_category = average_wval_category(wval_list)
-                        response.append(
-                            {
-                                "state_territory": records.first().state_territory,
-                                "counties_served": county_name,
-                                "wval_category": averaged_category,
-                                "reporting week": records.first().reporting_week,
-                            }
-                        )
-
-                return JsonResponse(response, safe=False)
-            else:
-                wval_categories = [record.wval_category for record in records]
-                averaged_category = average_wval_category(wval_categories)
-
-                first_record = records.first()
-
-                if averaged_category:
-                    result = {
-                        "state_territory": first_record.state_territory,
-                        "counties_served": first_record.counties_served,
-                        "wval_category": averaged_category,
-                        "reporting_week": first_record.reporting_week,
-                    }
-                    return JsonResponse(result)
-                else:
-                    return JsonResponse(
-                        {"error": "Could not average wval_category"}, status=500
-                    )
-
-        except Exception as e:
-            return JsonResponse({"error": str(e)}, status=500)
-
-    return JsonResponse({"error": "GET request required"}, status=405)
+    return run_sync(county_response(request))
 
 
+@data_versioned
+@cached_response
 def get_state(request):
-    if request.method == "GET":
-        state = request.GET.get("state")
-        historical = request.GET.get("history", "false").lower() == "true"
-
-        if not state:
-            return JsonResponse({"error": "Missing 'state' parameter"}, status=400)
-
-        if historical:
-            # Historical query from StateTimeseries
-            records = StateTimeseries.objects.filter(
-                state_territory__icontains=state,
-            ).order_by("ending_date")
-
-            if not records:
-                return JsonResponse({"error": "No matching states found"}, status=404)
-
-            result = list(records.values())
-            return JsonResponse(result, safe=False)
-        else:
-            # Current query from StateTimeseries
-            record = (
-                StateTimeseries.objects.filter(
-                    state_territory__icontains=state,
-                )
-                .order_by("-ending_date")
-                .first()
-            )
-
-            if not record:
-                return JsonResponse({"error": "No matching states found"}, status=404)
-
-            return JsonResponse(model_to_dict(record), safe=False)
-
-    return JsonResponse({"error": "GET request required"}, status=405)
+    return run_sync(state_response(request))
 
 
+@data_versioned
+@cached_response
 def get_all_states(request):
-    if request.method == "GET":
-        try:
-            unique_states = StateTimeseries.objects.values_list(
-                "state_territory", flat=True
-            ).distinct()
-            all_state_data = {}
-
-            history = request.GET.get("history") == "true"
-
-            for state in unique_states:
-                if history:
-                    state_history = StateTimeseries.objects.filter(
-                        state_territory=state
-                    ).order_by("ending_date")
-                    all_state_data[state] = [
-                        model_to_dict(record) for record in state_history
-                    ]
-                else:
-                    # Retrieve only the latest record for the state
-                    latest_record = (
-                        StateTimeseries.objects.filter(state_territory=state)
-                        .order_by("-ending_date")
-                        .first()
-                    )
-                    if latest_record:
-                        all_state_data[state] = model_to_dict(latest_record)
-
-            if not all_state_data:
-                return JsonResponse({"error": "No state data found"}, status=404)
-
-            return JsonResponse(all_state_data, safe=False)
-
-        except Exception as e:
-            return JsonResponse({"error": str(e)}, status=500)
-
-    return JsonResponse({"error": "GET request required"}, status=405)
+    return run_sync(all_states_response(request))
 
 
+@data_versioned
+@cached_response
 def get_regional(request):
-    # Each state in a region has the same wval_regional,
-    # So we can just return one of the states in that region
-    if request.method == "GET":
-        region = request.GET.get("region").upper()
-        historical = request.GET.get("history", "false").lower() == "true"
+    return run_sync(regional_response(request))
 
-        state = ""
 
-        match region:
-            case "S":  # South
-                state = "Alabama"
-            case "W":  # West
-                state = "California"
-            case "MW":  # Midwest
-                state = "Illinois"
-            case "NE":  # Northeast
-                state = "New York"
+@data_versioned
+@cached_response
+def get_national(request):
+    return run_sync(national_response(request))
 
-        if not state:
-            return JsonResponse({"error": "Missing 'state' parameter"}, status=400)
 
-        if historical:
-            # Historical query from StateTimeseries
-            records = StateTimeseries.objects.filter(
-                state_territory__icontains=state,
-            ).order_by("ending_date")
-
-            if not records:
-                return JsonResponse({"error": "No matching states found"}, status=404)
-
-            result = list(records.values())
-            return JsonResponse(result, safe=False)
-        else:
-            # Current query from StateTimeseries
-            record = (
-                StateTimeseries.objects.filter(
-                    state_territory__icontains=state,
-                )
-                .order_by("-ending_date")
-                .first()
+@data_versioned
+@cached_response
+def get_batch(request):
+    # Latest values, history slices, predictions and county aggregates for
+    # several states in one response, each section read with one set-based query
+    if request.method == "GET":
+        states = [
+            name.strip()
+            for name in request.GET.get("states", "").split(",")
+            if name.strip()
+        ]
+        include = {
+            name.strip()
+            for name in request.GET.get("include", "latest,predictions").split(",")
+            if name.strip()
+        }
+
+        if not states:
+            return JsonResponse({"error": "Missing 'states' parameter"}, status=400)
+
+        if len(states) > MAX_BATCH_STATES:
+            return JsonResponse(
+                {"error": f"At most {MAX_BATCH_STATES} states per batch request"},
+                status=400,
             )
 
-            if not record:
-                return JsonResponse({"error": "No matching states found"}, status=404)
-
-            return JsonResponse(model_to_dict(record), safe=False)
+        unknown_sections = include - BATCH_SECTIONS
+        if unknown_sections:
+            return JsonResponse(
+                {"error": f"Unknown include sections: {', '.join(sorted(unknown_sections))}"},
+                status=400,
+            )
 
-    return JsonResponse({"error": "GET request required"}, status=405)
+        known_states = set(
+            StateTimeseries.objects.filter(state_territory__in=states)
+            .values_list("state_territory", flat=True)
+            .distinct()
+        )
+        unknown_states = [state for state in states if state not in known_states]
+        if unknown_states:
+            return JsonResponse(
+                {"error": f"Unknown states: {', '.join(unknown_states)}"},
+                status=400,
+            )
 
+        try:
+            params = parse_history_params(request, STATE_HISTORY_FIELDS)
+        except ValueError as e:
+            return JsonResponse({"error": str(e)}, status=400)
 
-def get_national(request):
-    # Each state in the nation has the same wval_national,
-    # So we can just return one of the states in that region
-    if request.method == "GET":
-        historical = request.GET.get("history", "false").lower() == "true"
+        if params["limit"] or params["after"]:
+            return JsonResponse(
+                {"error": "Use since/until to slice history in batch requests"},
+                status=400,
+            )
 
-        state = "California"
+        result = {state: {} for state in states}
 
-        if not state:
-            return JsonResponse({"error": "Missing 'state' parameter"}, status=400)
+        if "latest" in include:
+            for record in latest_state_records(states):
+                result[record.state_territory]["latest"] = model_to_dict(record)
 
-        if historical:
-            # Historical query from StateTimeseries
-            records = StateTimeseries.objects.filter(
-                state_territory__icontains=state,
-            ).order_by("ending_date")
-
-            if not records:
-                return JsonResponse({"error": "No matching states found"}, status=404)
-
-            result = list(records.values())
-            return JsonResponse(result, safe=False)
-        else:
-            # Current query from StateTimeseries
-            record = (
-                StateTimeseries.objects.filter(
-                    state_territory__icontains=state,
-                )
-                .order_by("-ending_date")
-                .first()
+        if "history" in include:
+            for state in states:
+                result[state]["history"] = []
+            records, _ = paginate_history(
+                StateTimeseries.objects.filter(state_territory__in=states), params
             )
+            for row in records.values(
+                "state_territory", "ending_date", *params["fields"]
+            ).order_by("state_territory", "ending_date"):
+                state = (
+                    row["state_territory"]
+                    if "state_territory" in params["fields"]
+                    else row.pop("state_territory")
+                )
+                result[state]["history"].append(row)
+
+        if "predictions" in include:
+            for prediction in FuturePrediction.objects.filter(state__in=states):
+                result[prediction.state]["prediction"] = prediction.to_dict()
+
+        if "counties" in include:
+            for state in states:
+                result[state]["counties"] = []
+            for record in CountyAggregate.objects.filter(
+                state_territory__in=states
+            ).order_by("state_territory", "county"):
+                result[record.state_territory]["counties"].append(
+                    {
+                        "counties_served": record.county,
+                        "wval_category": record.wval_category,
+                        "weighted_wval_category": record.weighted_wval_category,
+                        "reporting_week": record.reporting_week,
+                    }
+                )
 
-            if not record:
-                return JsonResponse({"error": "No matching states found"}, status=404)
-
-            return JsonResponse(model_to_dict(record), safe=False)
+        return JsonResponse(result)
 
     return JsonResponse({"error": "GET request required"}, status=405)
 
+
 @csrf_exempt
 def notify_me(request):
     print(request)
@@ -319,11 +194,50 @@ def notify_me(request):
         return JsonResponse({"error": "POST request required"}, status=405)
 
 
+@data_versioned
+@cached_response
 def get_predictions(request):
+    return run_sync(predictions_response(request))
+
+
+@data_versioned
+@cached_response
+def get_forecast(request):
     if request.method == "GET":
-        predictions = FuturePrediction.objects.all()
-        predictions_list = [prediction.to_dict() for prediction in predictions]
-        return JsonResponse({"predictions": predictions_list}, status=200)
+        state = request.GET.get("state")
+        if not state:
+            return JsonResponse({"error": "Missing 'state' parameter"}, status=400)
+
+        try:
+            steps = int(request.GET.get("steps", 4))
+        except ValueError:
+            return JsonResponse({"error": "'steps' must be an integer"}, status=400)
+        if not 1 <= steps <= MAX_FORECAST_STEPS:
+            return JsonResponse(
+                {"error": f"'steps' must be between 1 and {MAX_FORECAST_STEPS}"},
+                status=400,
+            )
+
+        try:
+            forecast = forecast_state(state, steps)
+        except Exception as e:
+            return JsonResponse({"error": str(e)}, status=500)
+
+        if forecast is None:
+            return JsonResponse(
+                {"error": f"No forecast available for {state}"}, status=404
+            )
+
+        last_date, predictions, model = forecast
+        return JsonResponse(
+            {
+                "state": state,
+                "last_ending_date": last_date,
+                "model": model,
+                "predictions": predictions,
+            },
+            status=200,
+        )
     else:
         return JsonResponse({"error": "GET request required"}, status=405)
 
@@ -334,3 +248,13 @@ def force_email(request):
         return JsonResponse({"response": "Emails on the way"}, status=200)
     else:
         return JsonResponse({"error": "GET request required"}, status=405)
+
+
+def io_wait(request):
+    """
+    Waits ?ms= milliseconds, standing in for a slow upstream call such as an
+    SMTP send. Only routed with DEBUG, for loadtest.py --slow-io.
+    """
+    seconds = io_wait_seconds(request)
+    time.sleep(seconds)
+    return JsonResponse({"waited_ms": seconds * 1000}, status=200)
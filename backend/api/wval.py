@@ -0,0 +1,30 @@
+WVAL_CATEGORY_MAPPING = {
+    "Very Low": 1,
+    "Low": 2,
+    "Moderate": 3,
+    "High": 4,
+    "Very High": 5,
+}
+
+REVERSE_WVAL_CATEGORY_MAPPING = {v: k for k, v in WVAL_CATEGORY_MAPPING.items()}
+
+
+def closest_wval_category(level):
+    """Maps a (possibly fractional) numeric level back to its nearest category."""
+    if level is None or level != level:  # None or NaN
+        return None
+    closest_category_value = min(
+        REVERSE_WVAL_CATEGORY_MAPPING.keys(), key=lambda k: abs(k - level)
+    )
+    return REVERSE_WVAL_CATEGORY_MAPPING.get(closest_category_value)
+
+
+def average_wval_category(values):
+    if not values:
+        return None
+    numeric_values = [
+        WVAL_CATEGORY_MAPPING.get(val) for val in values if val in WVAL_CATEGORY_MAPPING
+    ]
+    if not numeric_values:
+        return None
+    return closest_wval_category(sum(numeric_values) / len(numeric_values))
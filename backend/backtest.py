@@ -0,0 +1,112 @@
+"""
+Rolling-origin backtest of the forecasting engines (forecasting.backtest).
+
+    python backtest.py                                   # every engine and state
+    python backtest.py --engines damped_trend seasonal_naive
+    python backtest.py --engines lstm rnn --states Ohio Texas --folds 2 --epochs 50
+
+Prints MAE per forecast week alongside training seconds, epochs to early stop
+and inference latency for each engine, and writes every scored forecast to
+--output. The neural engines train one model per state and fold, so a full
+run takes about as long as `folds` full training runs.
+"""
+
+import argparse
+import csv
+import time
+
+from forecasting import PREDICT_STEPS
+from forecasting.backtest import (
+    ENGINES,
+    NEURAL_ENGINES,
+    backtest_baseline,
+    backtest_cases,
+    backtest_neural,
+    rolling_origins,
+    summarize,
+)
+from forecasting.baselines import state_matrix
+from forecasting.dataset import load_state_frame
+from forecasting.training import EPOCHS
+
+DB_PATH = "db/db.sqlite"
+RESULTS_CSV = "backtest_results.csv"
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(
+        description="Rolling-origin backtest of the forecasting engines."
+    )
+    parser.add_argument("--engines", nargs="+", choices=ENGINES, default=ENGINES)
+    parser.add_argument("--states", nargs="+", help="Default: every state")
+    parser.add_argument(
+        "--folds", type=int, default=4, help="Forecast origins per state"
+    )
+    parser.add_argument("--horizon", type=int, default=PREDICT_STEPS)
+    parser.add_argument("--epochs", type=int, default=EPOCHS)
+    parser.add_argument("--output", default=RESULTS_CSV)
+    return parser.parse_args()
+
+
+def write_results(path, results, horizon):
+    with open(path, "w", newline="") as f:
+        writer = csv.writer(f)
+        writer.writerow(
+            ["Engine", "State", "Origin"]
+            + [f"Week_{i + 1}_Abs_Error" for i in range(horizon)]
+            + ["Fit_Seconds", "Epochs", "Predict_Ms"]
+        )
+        for result in results:
+            writer.writerow(
+                [result["engine"], result["state"], result["origin"]]
+                + result["errors"].tolist()
+                + [result["fit_s"], result["epochs"], result["predict_ms"]]
+            )
+
+
+def print_summary(summary, horizon):
+    header = f"{'engine':<24}{'forecasts':>10}"
+    header += "".join(f"{f'MAE w{i + 1}':>9}" for i in range(horizon))
+    header += f"{'MAE':>9}{'fit s':>9}{'epochs':>8}{'pred ms':>9}"
+    print(header)
+    for row in summary:
+        if not row["forecasts"]:
+            print(f"{row['engine']:<24}{0:>10}")
+            continue
+        line = f"{row['engine']:<24}{row['forecasts']:>10}"
+        line += "".join(f"{mae:>9.3f}" for mae in row["mae_by_horizon"])
+        epochs = f"{row['epochs']:.1f}" if row["epochs"] else "-"
+        line += f"{row['mae']:>9.3f}{row['fit_s']:>9.3f}{epochs:>8}"
+        line += f"{row['predict_ms']:>9.2f}"
+        print(line)
+
+
+if __name__ == "__main__":
+    args = parse_args()
+
+    states, history = state_matrix(load_state_frame(DB_PATH))
+    if args.states:
+        rows = [states.index(state) for state in args.states if state in states]
+        states, history = [states[row] for row in rows], history[rows]
+
+    origins = rolling_origins(history.shape[1], args.folds, args.horizon)
+    cases = backtest_cases(history, origins, args.horizon)
+    print(
+        f"{len(cases)} forecasts: {len(states)} states x {len(origins)} origins, "
+        f"{args.horizon} weeks each (cases with unreported weeks are left out)"
+    )
+
+    results = []
+    for engine in args.engines:
+        start = time.perf_counter()
+        if engine in NEURAL_ENGINES:
+            results += backtest_neural(
+                engine, states, history, cases, args.horizon, args.epochs
+            )
+        else:
+            results += backtest_baseline(engine, states, history, cases, args.horizon)
+        print(f"{engine}: {time.perf_counter() - start:.1f}s")
+
+    write_results(args.output, results, args.horizon)
+    print(f"Wrote {len(results)} scored forecasts to {args.output}\n")
+    print_summary(summarize(results, args.engines), args.horizon)
@@ -0,0 +1,166 @@
+"""
+Latency and memory of serving the per-state models with Keras versus the
+NumPy engine in forecasting.numpy_engine.
+
+Each engine runs in its own fresh process so import cost and peak memory are
+measured separately:
+
+    python export_models.py
+    python benchmark_numpy_engine.py --repeat 50
+
+Reports import and load time for every model, the median latency of a single
+state's 4-week rollout and of one batched rollout over all states, peak RSS,
+and the largest difference between the two engines' predictions.
+"""
+
+import argparse
+import json
+import os
+import resource
+import statistics
+import subprocess
+import sys
+import time
+
+import numpy as np
+
+from forecasting import N_FEATURES, PREDICT_STEPS, SEQUENCE_LENGTH
+
+
+def median_ms(fn, repeat):
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        timings.append(time.perf_counter() - start)
+    return statistics.median(timings) * 1000
+
+
+def run_engine(engine, model_dir, export_dir, repeat):
+    """Runs inside the child process; returns the measurements as a dict."""
+    start = time.perf_counter()
+    if engine == "keras":
+        from forecasting.inference import compiled_rollout
+        from forecasting.registry import ModelRegistry
+
+        registry = ModelRegistry(model_dir, max_models=100)
+    else:
+        from forecasting.numpy_engine import (
+            EXPORT_SUFFIX,
+            ExportedModel,
+            rollout,
+            stack_models,
+        )
+        from forecasting.registry import ModelRegistry
+
+        registry = ModelRegistry(
+            export_dir,
+            max_models=100,
+            loader=ExportedModel.load,
+            sizer=lambda model: model.nbytes,
+            suffix=EXPORT_SUFFIX,
+        )
+    import_s = time.perf_counter() - start
+
+    states = registry.available_states()
+    start = time.perf_counter()
+    models = [registry.get(state) for state in states]
+    load_s = time.perf_counter() - start
+
+    rng = np.random.default_rng(0)
+    sequences = rng.random((len(states), SEQUENCE_LENGTH, N_FEATURES), dtype="float32")
+
+    if engine == "keras":
+        rollouts = [compiled_rollout(model, PREDICT_STEPS) for model in models]
+
+        def predict_one():
+            return np.asarray(rollouts[0](sequences[:1]))[0]
+
+        def predict_all():
+            # Keras has no cross-model batching: one call per state
+            return np.stack(
+                [
+                    np.asarray(rollout_fn(sequences[i : i + 1]))[0]
+                    for i, rollout_fn in enumerate(rollouts)
+                ]
+            )
+
+    else:
+        single = stack_models(models[:1])
+        stacked = stack_models(models)
+
+        def predict_one():
+            return rollout(single, sequences[:1, np.newaxis], PREDICT_STEPS)[0, 0]
+
+        def predict_all():
+            return rollout(stacked, sequences[:, np.newaxis], PREDICT_STEPS)[:, 0]
+
+    start = time.perf_counter()
+    predictions = predict_all()  # Includes Keras' one-off graph traces
+    first_s = time.perf_counter() - start
+
+    return {
+        "engine": engine,
+        "states": len(states),
+        "import_s": import_s,
+        "load_s": load_s,
+        "first_call_s": first_s,
+        "single_ms": median_ms(predict_one, repeat),
+        "all_states_ms": median_ms(predict_all, repeat),
+        "max_rss_mb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024,
+        "predictions": predictions.tolist(),
+    }
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(
+        description="Benchmark Keras against the NumPy inference engine."
+    )
+    parser.add_argument("--model-dir", default="models/")
+    parser.add_argument("--export-dir", default=os.path.join("models", "numpy"))
+    parser.add_argument("--repeat", type=int, default=20)
+    parser.add_argument("--engine", choices=["keras", "numpy"], help=argparse.SUPPRESS)
+    return parser.parse_args()
+
+
+if __name__ == "__main__":
+    args = parse_args()
+    if args.engine:
+        print(
+            json.dumps(
+                run_engine(args.engine, args.model_dir, args.export_dir, args.repeat)
+            )
+        )
+        sys.exit()
+
+    results = {}
+    for engine in ("keras", "numpy"):
+        output = subprocess.run(
+            [sys.executable, __file__, "--engine", engine]
+            + ["--model-dir", args.model_dir, "--export-dir", args.export_dir]
+            + ["--repeat", str(args.repeat)],
+            capture_output=True,
+            text=True,
+            check=True,
+            env={**os.environ, "TF_CPP_MIN_LOG_LEVEL": "3"},
+        ).stdout
+        results[engine] = json.loads(output.strip().splitlines()[-1])
+
+    print(f"{'':<22}{'keras':>12}{'numpy':>12}")
+    for key, label in [
+        ("states", "models"),
+        ("import_s", "import (s)"),
+        ("load_s", "load all (s)"),
+        ("first_call_s", "first call, all (s)"),
+        ("single_ms", "one state (ms)"),
+        ("all_states_ms", "all states (ms)"),
+        ("max_rss_mb", "peak RSS (MB)"),
+    ]:
+        keras, numpy = results["keras"][key], results["numpy"][key]
+        print(f"{label:<22}{keras:>12.3f}{numpy:>12.3f}")
+
+    difference = np.abs(
+        np.array(results["keras"]["predictions"])
+        - np.array(results["numpy"]["predictions"])
+    ).max()
+    print(f"max |keras - numpy| (scaled): {difference:.2e}")
@@ -0,0 +1,100 @@
+"""
+Compares the per-step `model.predict` loop that the training scripts used for
+future predictions against the compiled rollout in forecasting.inference.
+
+    python benchmark_rollout.py                 # every model in models/
+    python benchmark_rollout.py --states Ohio Texas --steps 12 --repeat 20
+
+"first" is the first call per model, including the one-off graph trace for
+the compiled rollout; "steady" is the median of the repeated calls after it.
+"""
+
+import argparse
+import statistics
+import time
+
+import numpy as np
+
+from forecasting import N_FEATURES, PREDICT_STEPS, SEQUENCE_LENGTH
+from forecasting.inference import compiled_rollout
+from forecasting.registry import ModelRegistry
+
+
+def predict_loop(model, last_sequence, steps_ahead):
+    """The previous implementation: one model.predict call per step."""
+    predictions_scaled = []
+    current_sequence = last_sequence.copy().reshape(1, SEQUENCE_LENGTH, N_FEATURES)
+    for _ in range(steps_ahead):
+        pred_scaled = model.predict(current_sequence, verbose=0)[0, 0]
+        predictions_scaled.append(pred_scaled)
+        current_sequence = np.roll(current_sequence, -1, axis=1)
+        current_sequence[0, -1, :] = pred_scaled
+    return np.array(predictions_scaled)
+
+
+def predict_compiled(model, last_sequence, steps_ahead):
+    sequence = last_sequence.reshape(1, SEQUENCE_LENGTH, N_FEATURES)
+    return np.asarray(compiled_rollout(model, steps_ahead)(sequence))[0]
+
+
+def time_calls(fn, repeat):
+    timings = []
+    for _ in range(repeat + 1):
+        start = time.perf_counter()
+        result = fn()
+        timings.append(time.perf_counter() - start)
+    return result, timings[0], statistics.median(timings[1:])
+
+
+def run(model_dir, states, steps, repeat):
+    registry = ModelRegistry(model_dir, max_models=len(states))
+    rng = np.random.default_rng(0)
+    totals = {"loop": [0.0, 0.0], "compiled": [0.0, 0.0]}
+    max_diff = 0.0
+
+    for state in states:
+        model = registry.get(state)
+        last_sequence = rng.random((SEQUENCE_LENGTH, N_FEATURES), dtype="float32")
+
+        loop, loop_first, loop_steady = time_calls(
+            lambda: predict_loop(model, last_sequence, steps), repeat
+        )
+        compiled, compiled_first, compiled_steady = time_calls(
+            lambda: predict_compiled(model, last_sequence, steps), repeat
+        )
+        max_diff = max(max_diff, float(np.abs(loop - compiled).max()))
+
+        totals["loop"][0] += loop_first
+        totals["loop"][1] += loop_steady
+        totals["compiled"][0] += compiled_first
+        totals["compiled"][1] += compiled_steady
+        print(
+            f"{state:<24} loop {loop_steady * 1000:8.2f} ms   "
+            f"compiled {compiled_steady * 1000:8.2f} ms"
+        )
+
+    print(f"\n{len(states)} models, {steps} steps, {repeat} repeats")
+    for name, (first, steady) in totals.items():
+        print(
+            f"{name:<9} first-call total {first:7.2f} s   "
+            f"steady total {steady * 1000:9.2f} ms"
+        )
+    print(f"speedup (steady): {totals['loop'][1] / totals['compiled'][1]:.1f}x")
+    print(f"max |loop - compiled| (scaled): {max_diff:.2e}")
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(
+        description="Benchmark per-step predict against the compiled rollout."
+    )
+    parser.add_argument("--model-dir", default="models/")
+    parser.add_argument("--states", nargs="*", help="Defaults to every model")
+    parser.add_argument("--steps", type=int, default=PREDICT_STEPS)
+    parser.add_argument("--repeat", type=int, default=10)
+    return parser.parse_args()
+
+
+if __name__ == "__main__":
+    args = parse_args()
+    states = args.states or ModelRegistry(args.model_dir).available_states()
+    run(args.model_dir, states, args.steps, args.repeat)
@@ -0,0 +1,130 @@
+"""
+Local stand-in for the CDC CSV downloads, for exercising populate_db.py's
+conditional downloads and raw cache without the network.
+
+Serve a directory of CSVs and point the ingest at it:
+
+    python cdc_standin.py csvs/ --port 8765
+    python populate_db.py --exit-code --county-csv http://127.0.0.1:8765/county.csv --state-csv http://127.0.0.1:8765/state.csv
+
+Files are served with a content-hash ETag and a Last-Modified from their
+mtime, and matching If-None-Match / If-Modified-Since requests get a 304.
+Editing a file publishes a new version. --no-validators serves plain 200s
+without either header, like a server without conditional GET support, so
+the content-hash check is what skips unchanged downloads.
+
+--delay holds every response for a number of seconds, to compare sequential
+and concurrent fetching, and --flaky N answers the first N requests for each
+file with 503, to exercise the ingest's retries.
+"""
+
+import argparse
+import hashlib
+import os
+import threading
+import time
+from collections import Counter
+from email.utils import formatdate, parsedate_to_datetime
+from functools import partial
+from http import HTTPStatus
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+
+class CSVHandler(BaseHTTPRequestHandler):
+    requests_seen = Counter()  # Per file, for --flaky
+    lock = threading.Lock()
+
+    def __init__(self, *args, directory, validators, delay=0.0, flaky=0, **kwargs):
+        self.directory = directory
+        self.validators = validators
+        self.delay = delay
+        self.flaky = flaky
+        super().__init__(*args, **kwargs)
+
+    def do_GET(self):
+        path = os.path.join(self.directory, os.path.basename(self.path.split("?")[0]))
+        if not os.path.isfile(path):
+            self.send_error(HTTPStatus.NOT_FOUND)
+            return
+
+        time.sleep(self.delay)
+        with self.lock:
+            self.requests_seen[path] += 1
+            seen = self.requests_seen[path]
+        if seen <= self.flaky:
+            self.send_error(HTTPStatus.SERVICE_UNAVAILABLE)
+            return
+
+        with open(path, "rb") as f:
+            body = f.read()
+        mtime = int(os.path.getmtime(path))
+        etag = f'"{hashlib.sha256(body).hexdigest()[:32]}"'
+
+        if self.validators and self.not_modified(etag, mtime):
+            self.send_response(HTTPStatus.NOT_MODIFIED)
+            self.send_header("ETag", etag)
+            self.end_headers()
+            return
+
+        self.send_response(HTTPStatus.OK)
+        self.send_header("Content-Type", "text/csv")
+        self.send_header("Content-Length", str(len(body)))
+        if self.validators:
+            self.send_header("ETag", etag)
+            self.send_header("Last-Modified", formatdate(mtime, usegmt=True))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def not_modified(self, etag, mtime):
+        # If-None-Match takes precedence over If-Modified-Since (RFC 9110)
+        if_none_match = self.headers.get("If-None-Match")
+        if if_none_match is not None:
+            return etag in (tag.strip() for tag in if_none_match.split(","))
+        if_modified_since = self.headers.get("If-Modified-Since")
+        if if_modified_since is not None:
+            try:
+                return mtime <= parsedate_to_datetime(if_modified_since).timestamp()
+            except (TypeError, ValueError):
+                return False
+        return False
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(
+        description="Serve CSVs like the CDC endpoints, with conditional GET support."
+    )
+    parser.add_argument("directory", help="Directory of CSV files to serve")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument(
+        "--no-validators",
+        action="store_true",
+        help="Omit ETag/Last-Modified and never answer 304.",
+    )
+    parser.add_argument(
+        "--delay", type=float, default=0.0, help="Seconds to hold each response"
+    )
+    parser.add_argument(
+        "--flaky",
+        type=int,
+        default=0,
+        help="Answer the first N requests for each file with 503",
+    )
+    return parser.parse_args()
+
+
+if __name__ == "__main__":
+    args = parse_args()
+    handler = partial(
+        CSVHandler,
+        directory=args.directory,
+        validators=not args.no_validators,
+        delay=args.delay,
+        flaky=args.flaky,
+    )
+    server = ThreadingHTTPServer((args.host, args.port), handler)
+    print(f"Serving {args.directory} on http://{args.host}:{args.port}/")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
@@ -0,0 +1,55 @@
+"""
+Exports the trained per-state Keras models to the NumPy format that
+forecasting.numpy_engine serves without TensorFlow.
+
+    python export_models.py                      # models/ -> models/numpy/
+
+Each state's scaler range is the one recorded next to its model at training
+time. Models saved before ranges were recorded take it from the current data,
+which matches only as long as no new weeks were ingested since.
+virus_prediction.py writes the exports itself after training.
+"""
+
+import argparse
+import os
+
+from forecasting import SEQUENCE_LENGTH
+from forecasting.dataset import load_state_windows, scaler_range
+from forecasting.numpy_engine import EXPORT_SUFFIX, export_model, save_export
+from forecasting.registry import MODEL_PREFIX, ModelRegistry
+
+DB_PATH = "db/db.sqlite"
+MODEL_DIR = "models/"
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Export Keras models to NumPy.")
+    parser.add_argument("--model-dir", default=MODEL_DIR)
+    parser.add_argument("--export-dir", default=os.path.join(MODEL_DIR, "numpy"))
+    return parser.parse_args()
+
+
+if __name__ == "__main__":
+    args = parse_args()
+    os.makedirs(args.export_dir, exist_ok=True)
+    state_data, _ = load_state_windows(DB_PATH, SEQUENCE_LENGTH)
+    registry = ModelRegistry(args.model_dir, max_models=1)
+
+    exported = 0
+    for state in registry.available_states():
+        try:
+            model, trained_range = registry.get_with_scaler_range(state)
+            if trained_range is None:
+                if state not in state_data:
+                    print(f"Skipping {state}: no data to take its scaler range from")
+                    continue
+                trained_range = scaler_range(state_data[state]["scaler"])
+            save_export(
+                os.path.join(args.export_dir, f"{MODEL_PREFIX}{state}{EXPORT_SUFFIX}"),
+                export_model(model),
+                trained_range,
+            )
+            exported += 1
+        except Exception as e:
+            print(f"Error exporting {state}: {e}")
+    print(f"Exported {exported} models to {args.export_dir}")
@@ -0,0 +1,11 @@
+"""
+Forecasting code shared by the training scripts (virus_prediction*.py,
+generatecsv.py) and the API's on-demand forecasts.
+
+Nothing in this package imports TensorFlow at module level; Keras is only
+loaded when a model is actually read from disk.
+"""
+
+SEQUENCE_LENGTH = 4  # Weeks of history fed to the models
+N_FEATURES = 1
+PREDICT_STEPS = 4  # Number of future weeks to predict
@@ -0,0 +1,234 @@
+"""
+Rolling-origin backtests of the forecasting engines.
+
+Every state's series is cut at several origins, `horizon` weeks apart and
+ending `horizon` weeks before its latest week. At each origin an engine only
+sees the weeks before it, forecasts the next `horizon` weeks and is scored
+against what was reported. The neural engines are retrained from scratch at
+every origin with the production training setup (min-max scaling fitted on
+the training weeks only, a trailing validation split and early stopping);
+the baselines refit their smoothing parameters.
+
+Each forecast records its absolute error per horizon next to its training
+time, epochs run and inference latency, so an engine change shows its
+accuracy and its cost side by side.
+"""
+
+import time
+
+import numpy as np
+from numpy.lib.stride_tricks import sliding_window_view
+
+from . import N_FEATURES, PREDICT_STEPS, SEQUENCE_LENGTH
+from .baselines import BASELINES
+from .dataset import scaler_for_range
+from .training import (
+    BATCH_SIZE,
+    EPOCHS,
+    build_improved_model,
+    build_simple_rnn_model,
+)
+
+NEURAL_ENGINES = {"lstm": build_improved_model, "rnn": build_simple_rnn_model}
+ENGINES = list(NEURAL_ENGINES) + list(BASELINES)
+
+VALIDATION_FRACTION = 0.2  # Trailing training windows held out for early stopping
+EARLY_STOPPING_PATIENCE = 10
+MIN_TRAIN_WINDOWS = 5
+
+
+def rolling_origins(weeks, folds, horizon=PREDICT_STEPS):
+    """
+    Column indices of the first forecast week for each fold, oldest first.
+    Origins that leave no input window before them are dropped.
+    """
+    origins = [weeks - horizon * fold for fold in range(folds, 0, -1)]
+    return [origin for origin in origins if origin > SEQUENCE_LENGTH]
+
+
+def backtest_cases(history, origins, horizon=PREDICT_STEPS):
+    """
+    (state row, origin) pairs where the input window before the origin and
+    the `horizon` weeks after it were all reported, so every engine can be
+    scored on the same forecasts.
+    """
+    cases = []
+    for origin in origins:
+        reported = np.isfinite(
+            history[:, origin - SEQUENCE_LENGTH : origin + horizon]
+        ).all(axis=1)
+        cases.extend((row, origin) for row in np.flatnonzero(reported))
+    return cases
+
+
+def case_result(engine, state, origin, weeks, forecast, actual, **timings):
+    return {
+        "engine": engine,
+        "state": state,
+        # Weeks before the latest week at which the forecast starts
+        "origin": origin - weeks,
+        "errors": np.abs(np.asarray(forecast, dtype=float) - actual),
+        **timings,
+    }
+
+
+def backtest_baseline(name, states, history, cases, horizon=PREDICT_STEPS):
+    """
+    Scores one baseline, all states of an origin in one vectorized call. The
+    baselines fit while they forecast, so that call's time per state is both
+    their training time and their latency.
+    """
+    baseline = BASELINES[name]
+    results = []
+    for origin in sorted({origin for _, origin in cases}):
+        rows = [row for row, case_origin in cases if case_origin == origin]
+        start = time.perf_counter()
+        forecasts = baseline.predict(history[rows, :origin], horizon)
+        per_state = (time.perf_counter() - start) / len(rows)
+        for row, forecast in zip(rows, forecasts):
+            results.append(
+                case_result(
+                    name,
+                    states[row],
+                    origin,
+                    history.shape[1],
+                    forecast,
+                    history[row, origin : origin + horizon],
+                    fit_s=per_state,
+                    epochs=None,
+                    predict_ms=per_state * 1000,
+                )
+            )
+    return results
+
+
+def training_windows(series):
+    """
+    Scaler fitted on `series` plus its scaled series and complete (X, y)
+    windows, as forecasting.dataset prepares them for training.
+    """
+    series = series[np.argmax(np.isfinite(series)) :]  # Drop the left padding
+    scaler = scaler_for_range(np.nanmin(series), np.nanmax(series))
+    scaled = scaler.transform(series.reshape(-1, 1))[:, 0]
+    windows = sliding_window_view(scaled, SEQUENCE_LENGTH + 1)
+    windows = windows[np.isfinite(windows).all(axis=1)]
+    return scaler, scaled, windows[:, :SEQUENCE_LENGTH, np.newaxis], windows[:, -1:]
+
+
+def backtest_neural(
+    name,
+    states,
+    history,
+    cases,
+    horizon=PREDICT_STEPS,
+    epochs=EPOCHS,
+    batch_size=BATCH_SIZE,
+    verbose=0,
+):
+    """
+    Trains and scores one model per case. Cases with fewer than
+    MIN_TRAIN_WINDOWS complete training windows are skipped, as training
+    skips such states.
+    """
+    import tensorflow as tf
+    from tensorflow.keras.callbacks import EarlyStopping
+
+    from .inference import predict_future
+
+    results = []
+    for row, origin in cases:
+        scaler, scaled, X, y = training_windows(history[row, :origin])
+        if len(X) < MIN_TRAIN_WINDOWS:
+            continue
+        split = len(X) - max(1, int(len(X) * VALIDATION_FRACTION))
+
+        model = NEURAL_ENGINES[name](SEQUENCE_LENGTH, N_FEATURES)
+        start = time.perf_counter()
+        fit_history = model.fit(
+            X[:split],
+            y[:split],
+            epochs=epochs,
+            batch_size=batch_size,
+            validation_data=(X[split:], y[split:]),
+            callbacks=[
+                EarlyStopping(
+                    monitor="val_loss",
+                    patience=EARLY_STOPPING_PATIENCE,
+                    restore_best_weights=True,
+                )
+            ],
+            verbose=verbose,
+        )
+        fit_s = time.perf_counter() - start
+
+        forecast_args = (
+            model,
+            scaler,
+            scaled[-SEQUENCE_LENGTH:].reshape(SEQUENCE_LENGTH, N_FEATURES),
+            horizon,
+            SEQUENCE_LENGTH,
+            N_FEATURES,
+        )
+        predict_future(*forecast_args)  # The first call traces the rollout
+        start = time.perf_counter()
+        forecast = predict_future(*forecast_args)
+        predict_ms = (time.perf_counter() - start) * 1000
+
+        results.append(
+            case_result(
+                name,
+                states[row],
+                origin,
+                history.shape[1],
+                forecast,
+                history[row, origin : origin + horizon],
+                fit_s=fit_s,
+                epochs=len(fit_history.history["loss"]),
+                predict_ms=predict_ms,
+            )
+        )
+        tf.keras.backend.clear_session()
+    return results
+
+
+def summarize(results, engines):
+    """
+    One row per engine: MAE per horizon and overall, mean training seconds
+    and epochs per fitted model, and mean latency per forecast. Errors are
+    averaged over the (state, origin) cases every engine forecast, so skipped
+    cases never flatter an engine.
+    """
+    by_engine = {engine: [] for engine in engines}
+    for result in results:
+        by_engine[result["engine"]].append(result)
+    common = set.intersection(
+        *(
+            {(result["state"], result["origin"]) for result in engine_results}
+            for engine_results in by_engine.values()
+        )
+    )
+
+    summary = []
+    for engine, engine_results in by_engine.items():
+        scored = [
+            result["errors"]
+            for result in engine_results
+            if (result["state"], result["origin"]) in common
+        ]
+        if not scored:
+            summary.append({"engine": engine, "forecasts": 0})
+            continue
+        mae = np.mean(scored, axis=0)
+        epochs = [result["epochs"] for result in engine_results if result["epochs"]]
+        summary.append(
+            {
+                "engine": engine,
+                "forecasts": len(scored),
+                "mae_by_horizon": mae.tolist(),
+                "mae": float(np.mean(mae)),
+                "fit_s": float(np.mean([r["fit_s"] for r in engine_results])),
+                "epochs": float(np.mean(epochs)) if epochs else None,
+                "predict_ms": float(np.mean([r["predict_ms"] for r in engine_results])),
+            }
+        )
+    return summary
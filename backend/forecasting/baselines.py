@@ -0,0 +1,141 @@
+"""
+Cheap statistical forecasters, vectorized across states.
+
+Every baseline takes a (states, weeks) matrix of history, NaN where a week is
+missing or before a state's series starts, and returns (states, steps)
+forecasts. Smoothing parameters are picked per state from a small grid by
+one-step-ahead squared error, with every grid point and state updated
+together in one pass over the weeks.
+
+They back /api/forecast and the published predictions for states without a
+usable trained model, and serve as a speed and accuracy baseline for the LSTM.
+"""
+
+from itertools import product
+
+import numpy as np
+import pandas as pd
+
+SEASON_LENGTH = 52  # Weekly data with a yearly cycle
+
+
+def state_matrix(df):
+    """
+    (states, weeks) State_WVAL matrix from a load_state_frame() frame, with
+    one column per week from the first Ending_Date to the last, so a column
+    is the same week for every state. Weeks a state did not report are NaN.
+    Returns (states, matrix).
+    """
+    if df.empty:
+        return [], np.empty((0, 0))
+    values = df.pivot(index="State", columns="Ending_Date", values="State_WVAL")
+    # Fill in weeks no state reported, so a SEASON_LENGTH column lag is a year
+    weeks = pd.date_range(values.columns.min(), values.columns.max(), freq="7D")
+    values = values.reindex(columns=weeks.union(values.columns))
+    return values.index.tolist(), values.to_numpy(dtype=float)
+
+
+def last_valid(history):
+    """Most recent non-NaN value of each row (NaN if there is none)."""
+    return pd.DataFrame(history).ffill(axis=1).to_numpy()[:, -1]
+
+
+class ExponentialSmoothing:
+    """Simple exponential smoothing: a flat forecast at the smoothed level."""
+
+    name = "exponential_smoothing"
+    alphas = np.linspace(0.1, 1.0, 10)
+
+    def predict(self, history, steps):
+        history = np.asarray(history, dtype=float)
+        alpha = self.alphas[:, np.newaxis]  # (grid, 1), broadcast over states
+        level = np.full((len(self.alphas), len(history)), np.nan)
+        sse = np.zeros_like(level)
+
+        for y in history.T:
+            observed = ~np.isnan(y)
+            started = ~np.isnan(level)
+            error = np.where(observed & started, y - level, 0.0)
+            sse += error**2
+            level = np.where(started, level + alpha * error, level)
+            level = np.where(observed & ~started, y, level)  # First observation
+
+        best = np.argmin(sse, axis=0)
+        final = level[best, np.arange(len(history))]
+        return np.repeat(final[:, np.newaxis], steps, axis=1)
+
+
+class DampedTrend:
+    """Holt's linear trend with a damped slope (error-correction form)."""
+
+    name = "damped_trend"
+    alphas = (0.1, 0.3, 0.5, 0.7, 0.9)
+    betas = (0.05, 0.1, 0.2, 0.3)
+    phis = (0.8, 0.9, 0.98)
+
+    def predict(self, history, steps):
+        history = np.asarray(history, dtype=float)
+        grid = np.array(list(product(self.alphas, self.betas, self.phis)))
+        alpha, beta, phi = (grid[:, [i]] for i in range(3))  # (grid, 1) each
+        level = np.full((len(grid), len(history)), np.nan)
+        trend = np.zeros_like(level)
+        sse = np.zeros_like(level)
+
+        for y in history.T:
+            observed = ~np.isnan(y)
+            started = ~np.isnan(level)
+            forecast = level + phi * trend
+            error = np.where(observed & started, y - forecast, 0.0)
+            sse += error**2
+            level = np.where(started, forecast + alpha * error, level)
+            trend = np.where(started, phi * trend + alpha * beta * error, trend)
+            level = np.where(observed & ~started, y, level)
+
+        best = np.argmin(sse, axis=0)
+        states = np.arange(len(history))
+        level, trend, phi = level[best, states], trend[best, states], phi[best, 0]
+        # h-step forecast: level + (phi + phi^2 + ... + phi^h) * trend
+        damping = np.cumsum(phi[:, np.newaxis] ** np.arange(1, steps + 1), axis=1)
+        return level[:, np.newaxis] + damping * trend[:, np.newaxis]
+
+
+class SeasonalNaive:
+    """
+    The value from the same week one season earlier; falls back to the last
+    observed value where that week is missing or the series is too short.
+    """
+
+    name = "seasonal_naive"
+
+    def __init__(self, season_length=SEASON_LENGTH):
+        self.season_length = season_length
+
+    def predict(self, history, steps):
+        history = np.asarray(history, dtype=float)
+        fallback = np.repeat(last_valid(history)[:, np.newaxis], steps, axis=1)
+        weeks = history.shape[1]
+        if weeks < self.season_length:
+            return fallback
+        columns = weeks - self.season_length + np.arange(steps) % self.season_length
+        seasonal = history[:, columns]
+        return np.where(np.isnan(seasonal), fallback, seasonal)
+
+
+BASELINES = {
+    baseline.name: baseline
+    for baseline in (ExponentialSmoothing(), DampedTrend(), SeasonalNaive())
+}
+DEFAULT_BASELINE = DampedTrend.name
+
+
+def predict_future(
+    model, scaler, last_sequence, steps_ahead, sequence_length, n_features
+):
+    """
+    forecasting.inference.predict_future for a baseline. `last_sequence` may
+    be the state's whole scaled history: the baselines use every week they
+    are given, not just the last `sequence_length`.
+    """
+    history = np.asarray(last_sequence, dtype=float).reshape(1, -1)
+    predictions_scaled = model.predict(history, steps_ahead)
+    return scaler.inverse_transform(predictions_scaled.reshape(-1, 1)).flatten()
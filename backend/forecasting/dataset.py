@@ -0,0 +1,211 @@
+"""
+Loading and windowing of the weekly state series for training and inference.
+
+prepare_state_windows turns the whole frame into per-state (X, y) windows in
+one groupby pass, with sliding-window views instead of Python loops.
+load_state_windows adds an on-disk `.npz` cache keyed by the database's data
+version, so repeated training runs and experiments skip the work entirely.
+"""
+
+import hashlib
+import os
+import sqlite3
+
+import numpy as np
+import pandas as pd
+from numpy.lib.stride_tricks import sliding_window_view
+from sklearn.preprocessing import MinMaxScaler
+
+SERIES_QUERY = (
+    "SELECT State, Ending_Date, State_WVAL FROM state_timeseries "
+    "ORDER BY State, Ending_Date"
+)
+
+# Bump when the prepared arrays change meaning, to orphan old cache files
+DATASET_FORMAT = 1
+DATASET_CACHE_DIR = os.path.join("cache", "datasets")
+
+# ingest_run.Source written by virus_prediction.py when it publishes forecasts
+PREDICTION_RUN_SOURCE = "virus_prediction"
+
+
+def load_state_frame(db_path):
+    """Reads (State, Ending_Date, State_WVAL) with one row per state and week."""
+    conn = sqlite3.connect(db_path)
+    try:
+        df = pd.read_sql(SERIES_QUERY, conn)
+    finally:
+        conn.close()
+
+    df["Ending_Date"] = pd.to_datetime(df["Ending_Date"])
+    # state_timeseries repeats each week once per Data_Collection_Period
+    return df.drop_duplicates(subset=["State", "Ending_Date"]).sort_values(
+        ["State", "Ending_Date"]
+    )
+
+
+def data_version(db_path):
+    """
+    "<ingest run id>-<max Ending_Date>" for the latest write to the state
+    series, in the same format as the API's ETags (api/data_version.py). Runs
+    recorded by the prediction pipeline are ignored: they publish forecasts
+    without touching state_timeseries.
+    """
+    conn = sqlite3.connect(db_path)
+    try:
+        try:
+            row = conn.execute(
+                'SELECT "Id", "Max_Ending_Date" FROM "ingest_run" '
+                'WHERE "Source" != ? ORDER BY "Id" DESC LIMIT 1',
+                (PREDICTION_RUN_SOURCE,),
+            ).fetchone()
+        except sqlite3.OperationalError:  # Database predates ingest_run
+            row = None
+        if row is None:
+            row = (0,) + conn.execute(
+                'SELECT MAX("Ending_Date") FROM "state_timeseries"'
+            ).fetchone()
+    finally:
+        conn.close()
+    return f"{row[0]}-{row[1]}"
+
+
+def scaler_for_range(minimum, maximum):
+    """A MinMaxScaler equivalent to one fitted on a series with this range."""
+    scaler = MinMaxScaler()
+    scaler.fit(np.array([[minimum], [maximum]], dtype=float))
+    return scaler
+
+
+def scaler_range(scaler):
+    """The (min, max) a fitted MinMaxScaler maps to [0, 1]; see scaler_for_range()."""
+    return float(scaler.data_min_[0]), float(scaler.data_max_[0])
+
+
+def last_sequence_scaled(values, scaler, sequence_length):
+    """Scales the last `sequence_length` values into a (sequence_length, 1) array."""
+    values = np.asarray(values, dtype=float).reshape(-1, 1)[-sequence_length:]
+    return scaler.transform(values)
+
+
+def series_fingerprint(dates, values):
+    """Hash of a state's input series; changes when any week is added or revised."""
+    digest = hashlib.sha256()
+    digest.update(np.asarray(dates).astype("datetime64[D]").astype("int64").tobytes())
+    digest.update(np.asarray(values, dtype="float64").tobytes())
+    return digest.hexdigest()
+
+
+def prepare_state_windows(df, sequence_length):
+    """
+    Builds each state's training windows from a load_state_frame() frame.
+
+    Returns (state_data, states) where state_data[state] holds "X" of shape
+    (windows, sequence_length, 1), "y" of shape (windows, 1), the state's
+    fitted "scaler", "last_sequence_scaled" and the series "fingerprint".
+    States with no complete window are left out.
+    """
+    groups = df.groupby("State", sort=True)["State_WVAL"]
+    # MinMax scaling for every state at once; NaNs are ignored like
+    # MinMaxScaler does, and a flat series scales by 1 like sklearn
+    minimum = groups.transform("min").to_numpy(dtype=float)
+    maximum = groups.transform("max").to_numpy(dtype=float)
+    value_range = maximum - minimum
+    value_range[value_range == 0] = 1.0
+    scaled = (df["State_WVAL"].to_numpy(dtype=float) - minimum) / value_range
+
+    dates = df["Ending_Date"].to_numpy()
+    values = df["State_WVAL"].to_numpy(dtype=float)
+
+    state_data = {}
+    for state, rows in groups.indices.items():
+        if len(rows) <= sequence_length:
+            continue
+        series = scaled[rows]
+        windows = sliding_window_view(series, sequence_length + 1)
+        first = rows[0]
+        state_data[state] = {
+            "X": windows[:, :sequence_length, np.newaxis],
+            "y": windows[:, sequence_length:],
+            "scaler": scaler_for_range(minimum[first], maximum[first]),
+            "last_sequence_scaled": series[-sequence_length:, np.newaxis],
+            "fingerprint": series_fingerprint(dates[rows], values[rows]),
+        }
+    return state_data, list(state_data)
+
+
+def dataset_cache_path(cache_dir, db_path, version, sequence_length):
+    key = f"{os.path.abspath(db_path)}|{version}|{sequence_length}|{DATASET_FORMAT}"
+    digest = hashlib.sha256(key.encode()).hexdigest()[:16]
+    return os.path.join(cache_dir, f"windows_{digest}.npz")
+
+
+def save_state_windows(path, state_data, states):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    counts = [len(state_data[state]["X"]) for state in states]
+    arrays = {
+        "states": np.array(states),
+        "offsets": np.concatenate([[0], np.cumsum(counts)]),
+        "X": np.concatenate([state_data[state]["X"] for state in states]),
+        "y": np.concatenate([state_data[state]["y"] for state in states]),
+        "last_sequences": np.stack(
+            [state_data[state]["last_sequence_scaled"] for state in states]
+        ),
+        "ranges": np.array(
+            [
+                [
+                    state_data[state]["scaler"].data_min_[0],
+                    state_data[state]["scaler"].data_max_[0],
+                ]
+                for state in states
+            ]
+        ),
+        "fingerprints": np.array(
+            [state_data[state]["fingerprint"] for state in states]
+        ),
+    }
+    # Write then rename so concurrent runs never read a half-written file
+    tmp_path = f"{path}.{os.getpid()}.tmp.npz"
+    np.savez(tmp_path, **arrays)
+    os.replace(tmp_path, path)
+
+
+def read_state_windows(path):
+    with np.load(path) as npz:
+        # Each npz member is decompressed on access, so read each one once
+        arrays = {name: npz[name] for name in npz.files}
+    states = arrays["states"].tolist()
+    offsets = arrays["offsets"]
+    state_data = {
+        state: {
+            "X": arrays["X"][offsets[i] : offsets[i + 1]],
+            "y": arrays["y"][offsets[i] : offsets[i + 1]],
+            "scaler": scaler_for_range(*arrays["ranges"][i]),
+            "last_sequence_scaled": arrays["last_sequences"][i],
+            "fingerprint": str(arrays["fingerprints"][i]),
+        }
+        for i, state in enumerate(states)
+    }
+    return state_data, states
+
+
+def load_state_windows(
+    db_path, sequence_length, cache_dir=DATASET_CACHE_DIR, use_cache=True
+):
+    """
+    prepare_state_windows() for the database at `db_path`, served from the
+    `.npz` cache while the database's data version is unchanged.
+    """
+    path = dataset_cache_path(
+        cache_dir, db_path, data_version(db_path), sequence_length
+    )
+    if use_cache and os.path.exists(path):
+        print(f"Loading prepared windows from {path}")
+        return read_state_windows(path)
+
+    state_data, states = prepare_state_windows(
+        load_state_frame(db_path), sequence_length
+    )
+    if use_cache and states:
+        save_state_windows(path, state_data, states)
+    return state_data, states
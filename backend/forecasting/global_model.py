@@ -0,0 +1,159 @@
+"""
+One LSTM shared by every state, with a learned per-state embedding.
+
+Each state's series is still scaled with its own MinMaxScaler; the embedding
+lets the network learn per-state behaviour on top of the shared weights. The
+model is saved as `<model_dir>/global_model.keras` next to a JSON list of the
+states it was trained on (their order gives the embedding ids) and a JSON map
+of each state's scaler range, so forecasts scale inputs as training did.
+"""
+
+import json
+import os
+
+import numpy as np
+
+from . import N_FEATURES, SEQUENCE_LENGTH
+from .inference import MC_SAMPLES, compiled_rollout, interval_bounds
+
+GLOBAL_MODEL_FILE = "global_model.keras"
+GLOBAL_STATES_FILE = "global_model_states.json"
+GLOBAL_SCALER_RANGES_FILE = "global_model_scaler_ranges.json"
+EMBEDDING_DIM = 8
+
+
+def build_global_model(n_states, sequence_length, n_features):
+    from tensorflow.keras.layers import (
+        LSTM,
+        Concatenate,
+        Dense,
+        Dropout,
+        Embedding,
+        Flatten,
+        Input,
+    )
+    from tensorflow.keras.models import Model
+    from tensorflow.keras.optimizers import Adam
+
+    sequence = Input(shape=(sequence_length, n_features), name="sequence")
+    state_id = Input(shape=(1,), dtype="int32", name="state_id")
+
+    state_embedding = Flatten()(Embedding(n_states, EMBEDDING_DIM)(state_id))
+    x = LSTM(64, return_sequences=True)(sequence)
+    x = Dropout(0.2)(x)
+    x = LSTM(32)(x)
+    x = Concatenate()([x, state_embedding])
+    x = Dense(32, activation="relu")(x)
+    output = Dense(1)(x)
+
+    model = Model(inputs=[sequence, state_id], outputs=output)
+    model.compile(optimizer=Adam(learning_rate=0.0005), loss="mse", metrics=["mae"])
+    return model
+
+
+def stack_state_windows(state_data, states, test_fraction=0.2):
+    """
+    Concatenates every state's windows into one training set. The last
+    `test_fraction` of each state's windows (in time order) is held out, so
+    every state appears in both splits. Windows containing missing values are
+    dropped, since a single NaN would otherwise poison the shared weights.
+
+    Returns ((X_train, ids_train, y_train), (X_test, ids_test, y_test)).
+    """
+    train, test = ([], [], []), ([], [], [])
+    for state_id, state in enumerate(states):
+        X, y = state_data[state]["X"], state_data[state]["y"]
+        finite = np.isfinite(X).all(axis=(1, 2)) & np.isfinite(y).all(axis=1)
+        X, y = X[finite], y[finite]
+        if len(X) == 0:
+            continue
+        split = len(X) - max(1, int(round(len(X) * test_fraction)))
+        ids = np.full((len(X), 1), state_id, dtype="int32")
+        for part, rows in ((train, slice(None, split)), (test, slice(split, None))):
+            part[0].append(X[rows])
+            part[1].append(ids[rows])
+            part[2].append(y[rows])
+    return tuple(
+        tuple(np.concatenate(arrays) for arrays in part) for part in (train, test)
+    )
+
+
+def save_global_model(model, states, model_dir, scaler_ranges):
+    """`scaler_ranges` maps each state to the (min, max) its series was scaled by."""
+    model.save(os.path.join(model_dir, GLOBAL_MODEL_FILE))
+    with open(os.path.join(model_dir, GLOBAL_STATES_FILE), "w") as f:
+        json.dump(list(states), f, indent=4)
+    with open(os.path.join(model_dir, GLOBAL_SCALER_RANGES_FILE), "w") as f:
+        json.dump(
+            {
+                state: [float(value) for value in scaler_ranges[state]]
+                for state in states
+            },
+            f,
+            indent=4,
+        )
+
+
+def global_model_exists(model_dir):
+    return os.path.exists(os.path.join(model_dir, GLOBAL_MODEL_FILE))
+
+
+class GlobalForecaster:
+    """Batched forecasts for any subset of the states the global model knows."""
+
+    def __init__(self, model, states, scaler_ranges=None):
+        self.model = model
+        self.states = list(states)
+        self.state_ids = {state: i for i, state in enumerate(self.states)}
+        # State -> (min, max) it was trained on; empty for models saved before
+        # ranges were recorded
+        self.scaler_ranges = {
+            state: tuple(value) for state, value in (scaler_ranges or {}).items()
+        }
+
+    @classmethod
+    def load(cls, model_dir):
+        from tensorflow.keras.models import load_model
+
+        model = load_model(os.path.join(model_dir, GLOBAL_MODEL_FILE), compile=False)
+        with open(os.path.join(model_dir, GLOBAL_STATES_FILE)) as f:
+            states = json.load(f)
+        try:
+            with open(os.path.join(model_dir, GLOBAL_SCALER_RANGES_FILE)) as f:
+                scaler_ranges = json.load(f)
+        except FileNotFoundError:
+            scaler_ranges = {}
+        return cls(model, states, scaler_ranges)
+
+    def __contains__(self, state):
+        return state in self.state_ids
+
+    def predict_scaled(self, states, sequences, steps):
+        """
+        Rolls every state forward `steps` weeks in one forward pass per step.
+        `sequences` holds one scaled (SEQUENCE_LENGTH, N_FEATURES) window per
+        state; returns scaled predictions of shape (len(states), steps).
+        """
+        sequences = np.asarray(sequences, dtype="float32").reshape(
+            len(states), SEQUENCE_LENGTH, N_FEATURES
+        )
+        ids = np.array([[self.state_ids[state]] for state in states], dtype="int32")
+        return np.asarray(compiled_rollout(self.model, steps)(sequences, ids))
+
+    def predict_intervals_scaled(self, states, sequences, steps, samples=MC_SAMPLES):
+        """
+        Monte Carlo dropout interval for predict_scaled: `samples` stochastic
+        rollouts per state, all states in one batch. Returns scaled (lower,
+        upper), each of shape (len(states), steps).
+        """
+        sequences = np.asarray(sequences, dtype="float32").reshape(
+            len(states), SEQUENCE_LENGTH, N_FEATURES
+        )
+        ids = np.array([[self.state_ids[state]] for state in states], dtype="int32")
+        rollout = compiled_rollout(self.model, steps, training=True)
+        paths = np.asarray(
+            rollout(
+                np.repeat(sequences, samples, axis=0), np.repeat(ids, samples, axis=0)
+            )
+        )
+        return interval_bounds(paths.reshape(len(states), samples, steps))
@@ -0,0 +1,99 @@
+import weakref
+
+import numpy as np
+
+# Monte Carlo dropout: stochastic rollouts per forecast and the quantiles
+# reported as its lower / upper bounds
+MC_SAMPLES = 100
+INTERVAL_QUANTILES = (0.1, 0.9)
+
+# model -> {(steps, training): compiled rollout}; weak so evicted registry
+# models are freed. The rollouts themselves only hold a weak reference to
+# their model (see build_rollout), or the entry would keep its own key alive.
+_rollouts = weakref.WeakKeyDictionary()
+
+
+def build_rollout(model, steps, training=False):
+    """
+    Compiles an autoregressive rollout of `model` into a single TensorFlow
+    graph. The returned function maps scaled sequences of shape
+    (batch, sequence_length, n_features) to predictions of shape (batch, steps).
+    Any extra arguments (e.g. the global model's state ids) are passed to the
+    model unchanged at every step. With `training` the model's Dropout layers
+    stay active, so each row of the batch follows its own stochastic path.
+    """
+    # Deferred so importing this module does not pull in TensorFlow
+    import tensorflow as tf
+
+    model_ref = weakref.ref(model)
+
+    @tf.function(reduce_retracing=True)
+    def rollout(sequence, *context):
+        traced_model = model_ref()  # Only dereferenced while tracing
+        predictions = []
+        for _ in range(steps):  # Unrolled at trace time; steps is small
+            inputs = [sequence, *context] if context else sequence
+            prediction = traced_model(inputs, training=training)  # (batch, 1)
+            predictions.append(prediction[:, 0])
+            # Drop the oldest week and append the prediction as the newest
+            sequence = tf.concat(
+                [sequence[:, 1:, :], prediction[:, tf.newaxis, :]], axis=1
+            )
+        return tf.stack(predictions, axis=1)
+
+    return rollout
+
+
+def compiled_rollout(model, steps, training=False):
+    """The compiled rollout for (model, steps, training), built on first use."""
+    by_key = _rollouts.setdefault(model, {})
+    if (steps, training) not in by_key:
+        by_key[steps, training] = build_rollout(model, steps, training)
+    return by_key[steps, training]
+
+
+def interval_bounds(paths, quantiles=INTERVAL_QUANTILES):
+    """(lower, upper) quantiles over the sample axis (-2) of (..., samples, steps)."""
+    lower, upper = np.quantile(paths, quantiles, axis=-2)
+    return lower, upper
+
+
+def predict_future(
+    model, scaler, last_sequence, steps_ahead, sequence_length, n_features
+):
+    """
+    Predicts `steps_ahead` weeks from the scaled last sequence in one model
+    call, feeding each prediction back in as the newest week.
+    """
+    current_sequence = np.asarray(last_sequence, dtype="float32").reshape(
+        1, sequence_length, n_features
+    )
+    predictions_scaled = compiled_rollout(model, steps_ahead)(current_sequence)
+    return scaler.inverse_transform(
+        np.asarray(predictions_scaled).reshape(-1, 1)
+    ).flatten()
+
+
+def predict_intervals(
+    model,
+    scaler,
+    last_sequence,
+    steps_ahead,
+    sequence_length,
+    n_features,
+    samples=MC_SAMPLES,
+):
+    """
+    Monte Carlo dropout prediction interval for predict_future: `samples`
+    stochastic rollouts run as one batched call. Returns unscaled (lower,
+    upper) arrays of length `steps_ahead`.
+    """
+    sequence = np.asarray(last_sequence, dtype="float32").reshape(
+        1, sequence_length, n_features
+    )
+    rollout = compiled_rollout(model, steps_ahead, training=True)
+    paths = np.asarray(rollout(np.repeat(sequence, samples, axis=0)))
+    return tuple(
+        scaler.inverse_transform(bound.reshape(-1, 1)).flatten()
+        for bound in interval_bounds(paths)
+    )
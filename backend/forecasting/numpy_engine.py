@@ -0,0 +1,198 @@
+"""
+TensorFlow-free inference for the per-state models.
+
+export_model() dumps a trained Sequential LSTM / SimpleRNN / Dense stack (the
+build_improved_model and build_simple_rnn_model architectures) to plain NumPy
+arrays, saved as `.npz` next to the scaler range the model was trained with.
+The forward pass below reproduces Keras' inference outputs with nothing but
+NumPy, and runs any number of same-architecture states in one batched call by
+stacking their weights along a leading state axis.
+"""
+
+import json
+
+import numpy as np
+
+EXPORT_SUFFIX = ".npz"
+
+
+def export_model(model):
+    """Layer specs for a Keras Sequential model; Dropout is dropped (inference only)."""
+    layers = []
+    for layer in model.layers:
+        kind = type(layer).__name__
+        if kind in ("InputLayer", "Dropout"):
+            continue
+        if kind == "LSTM" or kind == "SimpleRNN":
+            kernel, recurrent_kernel, bias = layer.get_weights()
+            layers.append(
+                {
+                    "type": kind,
+                    "return_sequences": bool(layer.return_sequences),
+                    "kernel": kernel,
+                    "recurrent_kernel": recurrent_kernel,
+                    "bias": bias,
+                }
+            )
+        elif kind == "Dense":
+            kernel, bias = layer.get_weights()
+            layers.append(
+                {
+                    "type": kind,
+                    "activation": layer.activation.__name__,
+                    "kernel": kernel,
+                    "bias": bias,
+                }
+            )
+        else:
+            raise ValueError(f"Cannot export layer {layer.name} ({kind})")
+    return layers
+
+
+def save_export(path, layers, scaler_range):
+    """Writes exported layers plus the (min, max) the state's scaler was fitted on."""
+    arrays, meta = {}, []
+    for i, layer in enumerate(layers):
+        spec = {key: value for key, value in layer.items() if np.isscalar(value)}
+        meta.append(spec)
+        for key, value in layer.items():
+            if isinstance(value, np.ndarray):
+                arrays[f"{i}_{key}"] = value.astype("float32")
+    np.savez(
+        path,
+        layers=np.array(json.dumps(meta)),
+        scaler_range=np.asarray(scaler_range, dtype="float64"),
+        **arrays,
+    )
+
+
+class ExportedModel:
+    def __init__(self, layers, scaler_range):
+        self.layers = layers
+        self.scaler_range = tuple(float(value) for value in scaler_range)
+
+    @classmethod
+    def load(cls, path):
+        with np.load(path) as npz:
+            meta = json.loads(str(npz["layers"]))
+            layers = [
+                {
+                    **spec,
+                    **{
+                        key: npz[f"{i}_{key}"]
+                        for key in ("kernel", "recurrent_kernel", "bias")
+                        if f"{i}_{key}" in npz.files
+                    },
+                }
+                for i, spec in enumerate(meta)
+            ]
+            return cls(layers, npz["scaler_range"])
+
+    @property
+    def nbytes(self):
+        return sum(
+            value.nbytes
+            for layer in self.layers
+            for value in layer.values()
+            if isinstance(value, np.ndarray)
+        )
+
+    @property
+    def signature(self):
+        """Models with equal signatures can be stacked into one batched call."""
+        return tuple(
+            (layer["type"], layer["kernel"].shape, layer.get("return_sequences"))
+            for layer in self.layers
+        )
+
+
+def stack_models(models):
+    """Stacks same-architecture models' weights along a new leading state axis."""
+    signatures = {model.signature for model in models}
+    if len(signatures) != 1:
+        raise ValueError("Only models with the same architecture can be stacked")
+    return [
+        {
+            key: (
+                np.stack([model.layers[i][key] for model in models])
+                if isinstance(value, np.ndarray)
+                else value
+            )
+            for key, value in layer.items()
+        }
+        for i, layer in enumerate(models[0].layers)
+    ]
+
+
+def _sigmoid(x):
+    return 1.0 / (1.0 + np.exp(-x))
+
+
+ACTIVATIONS = {
+    "linear": lambda x: x,
+    "relu": lambda x: np.maximum(x, 0.0),
+    "tanh": np.tanh,
+    "sigmoid": _sigmoid,
+}
+
+
+def forward(layers, x):
+    """
+    Inference pass over stacked layers. `x` has shape (states, batch, time,
+    features) and the result (states, batch, outputs); weights carry a leading
+    states axis, so every state runs through its own weights in one matmul.
+    """
+    for layer in layers:
+        kernel, bias = layer["kernel"], layer["bias"][:, np.newaxis, :]
+        if layer["type"] == "Dense":
+            x = ACTIVATIONS[layer["activation"]](x @ kernel + bias)
+            continue
+
+        recurrent_kernel = layer["recurrent_kernel"]
+        states, batch, steps, _ = x.shape
+        units = recurrent_kernel.shape[1]
+        # Input projections for every timestep at once: (states, batch, time, k*units)
+        projected = x @ kernel[:, np.newaxis] + bias[:, np.newaxis]
+        h = np.zeros((states, batch, units), dtype=x.dtype)
+        c = np.zeros_like(h)
+        outputs = []
+        for t in range(steps):
+            z = projected[:, :, t] + h @ recurrent_kernel
+            if layer["type"] == "LSTM":
+                # Keras gate order: input, forget, cell, output
+                i, f, g, o = np.split(z, 4, axis=-1)
+                c = _sigmoid(f) * c + _sigmoid(i) * np.tanh(g)
+                h = _sigmoid(o) * np.tanh(c)
+            else:  # SimpleRNN
+                h = np.tanh(z)
+            outputs.append(h)
+        x = np.stack(outputs, axis=2) if layer["return_sequences"] else h
+    return x
+
+
+def rollout(layers, sequences, steps):
+    """
+    Autoregressive forecast for stacked layers. `sequences` has shape
+    (states, batch, sequence_length, n_features); returns (states, batch, steps).
+    """
+    sequences = np.asarray(sequences, dtype="float32")
+    predictions = []
+    for _ in range(steps):
+        prediction = forward(layers, sequences)  # (states, batch, 1)
+        predictions.append(prediction[..., 0])
+        sequences = np.concatenate(
+            [sequences[:, :, 1:], prediction[:, :, np.newaxis]], axis=2
+        )
+    return np.stack(predictions, axis=-1)
+
+
+def predict_future(
+    model, scaler, last_sequence, steps_ahead, sequence_length, n_features
+):
+    """forecasting.inference.predict_future for one ExportedModel."""
+    layers = stack_models([model])
+    sequence = np.asarray(last_sequence, dtype="float32").reshape(
+        1, 1, sequence_length, n_features
+    )
+    predictions_scaled = rollout(layers, sequence, steps_ahead)[0, 0]
+    return scaler.inverse_transform(predictions_scaled.reshape(-1, 1)).flatten()
@@ -0,0 +1,207 @@
+"""
+Lazily loaded, memory-bounded cache of per-state Keras models.
+
+Models are read from `<model_dir>/best_model_<state><suffix>` (Keras `.keras`
+files by default) on first use and kept resident until the registry exceeds
+`max_models` or `max_bytes`, at which point the least recently used models are
+dropped. Each resident model remembers the modification times of its files,
+so a model retrained on disk is reloaded on its next request.
+
+Training records the (min, max) each state's scaler was fitted on next to its
+Keras model, as `best_model_<state>.scaler.json`, so forecasts scale inputs
+the way the model saw them however the series has moved since.
+"""
+
+import json
+import os
+import threading
+from collections import OrderedDict
+
+MODEL_PREFIX = "best_model_"
+MODEL_SUFFIX = ".keras"
+SCALER_RANGE_SUFFIX = ".scaler.json"
+
+
+def scaler_range_path(model_path):
+    return os.path.splitext(model_path)[0] + SCALER_RANGE_SUFFIX
+
+
+def save_scaler_range(model_path, scaler_range):
+    """Records the (min, max) the model at `model_path` was trained on."""
+    with open(scaler_range_path(model_path), "w") as f:
+        json.dump([float(value) for value in scaler_range], f)
+
+
+def load_scaler_range(model_path):
+    """The range save_scaler_range() recorded, or None if none was."""
+    try:
+        with open(scaler_range_path(model_path)) as f:
+            return tuple(json.load(f))
+    except FileNotFoundError:
+        return None
+
+
+def file_version(path):
+    """The file's modification time in ns, or None if it does not exist."""
+    try:
+        return os.stat(path).st_mtime_ns
+    except FileNotFoundError:
+        return None
+
+
+def load_keras_model(path):
+    # Deferred so importing the registry does not pull in TensorFlow
+    from tensorflow.keras.models import load_model
+
+    return load_model(path, compile=False)
+
+
+def model_nbytes(model):
+    """Approximate resident size of a model: the bytes held by its weights."""
+    return sum(weight.nbytes for weight in model.get_weights())
+
+
+class ModelRegistry:
+    def __init__(
+        self,
+        model_dir,
+        max_models=16,
+        max_bytes=64 * 1024 * 1024,
+        loader=load_keras_model,
+        sizer=model_nbytes,
+        suffix=MODEL_SUFFIX,
+    ):
+        self.model_dir = model_dir
+        self.suffix = suffix
+        self.max_models = max_models
+        self.max_bytes = max_bytes
+        self.loader = loader
+        self.sizer = sizer
+
+        # state -> (model, nbytes, scaler range, files version), LRU order
+        self._models = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self._load_locks = {}
+        # (model_dir modification time, states with a model file)
+        self._available = (None, ())
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def model_path(self, state):
+        return os.path.join(self.model_dir, f"{MODEL_PREFIX}{state}{self.suffix}")
+
+    def files_version(self, state):
+        """Modification times of the state's model and scaler range files."""
+        path = self.model_path(state)
+        return file_version(path), file_version(scaler_range_path(path))
+
+    def available_states(self):
+        """States with a model file on disk (whether or not it is loaded)."""
+        # Adding or removing a file changes the directory's mtime, so the
+        # listing is only read again after that
+        dir_version = file_version(self.model_dir)
+        if dir_version is None:
+            return []
+        with self._lock:
+            if self._available[0] == dir_version:
+                return list(self._available[1])
+
+        states = sorted(
+            filename[len(MODEL_PREFIX) : -len(self.suffix)]
+            for filename in os.listdir(self.model_dir)
+            if filename.startswith(MODEL_PREFIX) and filename.endswith(self.suffix)
+        )
+        with self._lock:
+            self._available = (dir_version, tuple(states))
+        return states
+
+    def __contains__(self, state):
+        # Only names that map to an existing file, so request input can never
+        # reach the loader as an arbitrary path
+        return state in self.available_states()
+
+    def get(self, state):
+        """Returns the model for `state`, loading it on first use."""
+        return self.get_with_scaler_range(state)[0]
+
+    def get_with_scaler_range(self, state):
+        """
+        Returns (model, scaler range) for `state`, loading both on first use
+        and again whenever their files change on disk. The range is the
+        model's own `scaler_range` if it carries one (NumPy exports do), else
+        the one recorded next to it at training time; None for models saved
+        before ranges were recorded.
+        """
+        version = self.files_version(state)
+        with self._lock:
+            resident = self._resident(state, version)
+            if resident:
+                return resident
+            load_lock = self._load_locks.setdefault(state, threading.Lock())
+
+        # Load outside the registry lock so other states stay servable; the
+        # per-state lock keeps concurrent requests from loading the same file
+        try:
+            with load_lock:
+                with self._lock:
+                    resident = self._resident(state, version)
+                    if resident:
+                        return resident
+
+                if version[0] is None or state not in self:
+                    raise KeyError(f"No trained model for {state}")
+                path = self.model_path(state)
+                model = self.loader(path)
+                nbytes = self.sizer(model)
+                scaler_range = getattr(
+                    model, "scaler_range", None
+                ) or load_scaler_range(path)
+
+                with self._lock:
+                    self.misses += 1
+                    if state in self._models:  # Replaced by a retrained model
+                        self._bytes -= self._models.pop(state)[1]
+                    self._models[state] = (model, nbytes, scaler_range, version)
+                    self._bytes += nbytes
+                    self._evict()
+                return model, scaler_range
+        finally:
+            with self._lock:
+                self._load_locks.pop(state, None)
+
+    def _resident(self, state, version):
+        # (model, scaler range) if `state` is loaded from files at `version`;
+        # call with self._lock held
+        entry = self._models.get(state)
+        if entry is None or entry[3] != version:
+            return None
+        self._models.move_to_end(state)
+        self.hits += 1
+        return entry[0], entry[2]
+
+    def _evict(self):
+        # Always keep the most recently loaded model, even if it alone is over
+        # the byte budget
+        while len(self._models) > 1 and (
+            len(self._models) > self.max_models or self._bytes > self.max_bytes
+        ):
+            _, (_, nbytes, _, _) = self._models.popitem(last=False)
+            self._bytes -= nbytes
+            self.evictions += 1
+
+    def clear(self):
+        with self._lock:
+            self._models.clear()
+            self._bytes = 0
+
+    def stats(self):
+        with self._lock:
+            return {
+                "loaded": list(self._models),
+                "bytes": self._bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+            }
@@ -0,0 +1,378 @@
+import gc
+import os
+import sqlite3
+import tempfile
+import weakref
+from unittest import TestCase, mock
+
+import numpy as np
+import pandas as pd
+
+from . import N_FEATURES, SEQUENCE_LENGTH, dataset, inference, numpy_engine
+from .backtest import backtest_baseline, backtest_cases, rolling_origins, summarize
+from .baselines import DampedTrend, ExponentialSmoothing, SeasonalNaive, state_matrix
+from .registry import ModelRegistry, save_scaler_range
+from .training import build_improved_model, build_simple_rnn_model
+
+
+def small_keras_model(sequence_length=4):
+    from tensorflow import keras
+
+    return keras.Sequential(
+        [
+            keras.Input((sequence_length, 1)),
+            keras.layers.LSTM(3),
+            keras.layers.Dense(1),
+        ]
+    )
+
+
+class CompiledRolloutTests(TestCase):
+    def test_rollout_matches_stepwise_predictions(self):
+        model = small_keras_model()
+        sequence = np.random.default_rng(0).random((1, 4, 1), dtype="float32")
+
+        rolled = np.asarray(inference.compiled_rollout(model, 2)(sequence))[0]
+
+        first = model(sequence).numpy()[0, 0]
+        next_sequence = np.concatenate([sequence[:, 1:], [[[first]]]], axis=1)
+        second = model(next_sequence).numpy()[0, 0]
+        np.testing.assert_allclose(rolled, [first, second], rtol=1e-5)
+
+    def test_cached_rollout_does_not_keep_its_model_alive(self):
+        model = small_keras_model()
+        inference.compiled_rollout(model, 2)(np.zeros((1, 4, 1), dtype="float32"))
+        model_ref = weakref.ref(model)
+
+        del model
+        gc.collect()
+
+        self.assertIsNone(model_ref())
+
+
+class ModelRegistryTests(TestCase):
+    def setUp(self):
+        self.model_dir = tempfile.mkdtemp()
+        self.addCleanup(self.remove_model_dir)
+        self.loads = []
+
+    def remove_model_dir(self):
+        for filename in os.listdir(self.model_dir):
+            os.remove(os.path.join(self.model_dir, filename))
+        os.rmdir(self.model_dir)
+
+    def registry(self, **kwargs):
+        def loader(path):
+            self.loads.append(os.path.basename(path))
+            return object()
+
+        return ModelRegistry(
+            self.model_dir, loader=loader, sizer=lambda model: 10, **kwargs
+        )
+
+    def write_model(self, state, mtime_ns=None):
+        registry = ModelRegistry(self.model_dir)
+        path = registry.model_path(state)
+        with open(path, "w"):
+            pass
+        if mtime_ns is not None:
+            os.utime(path, ns=(mtime_ns, mtime_ns))
+        return path
+
+    def test_least_recently_used_model_is_evicted(self):
+        for state in ("AK", "AL", "AZ"):
+            self.write_model(state)
+        registry = self.registry(max_models=2)
+
+        registry.get("AK")
+        registry.get("AL")
+        registry.get("AK")
+        registry.get("AZ")
+
+        self.assertEqual(registry.stats()["loaded"], ["AK", "AZ"])
+        self.assertEqual(registry.evictions, 1)
+
+    def test_byte_budget_evicts_models(self):
+        for state in ("AK", "AL"):
+            self.write_model(state)
+        registry = self.registry(max_bytes=15)
+
+        registry.get("AK")
+        registry.get("AL")
+
+        self.assertEqual(registry.stats()["loaded"], ["AL"])
+
+    def test_retrained_model_is_reloaded(self):
+        path = self.write_model("AK", mtime_ns=1_000_000_000)
+        registry = self.registry()
+        first = registry.get("AK")
+        self.assertIs(registry.get("AK"), first)
+
+        os.utime(path, ns=(2_000_000_000, 2_000_000_000))
+        save_scaler_range(path, (0.0, 5.0))
+        model, scaler_range = registry.get_with_scaler_range("AK")
+
+        self.assertIsNot(model, first)
+        self.assertEqual(scaler_range, (0.0, 5.0))
+        self.assertEqual(len(self.loads), 2)
+        self.assertEqual(registry.stats()["bytes"], 10)
+
+    def test_missing_model_raises_key_error_without_leaking_its_lock(self):
+        registry = self.registry()
+
+        with self.assertRaises(KeyError):
+            registry.get("AK")
+
+        self.assertEqual(registry._load_locks, {})
+
+    def test_available_states_follow_the_model_directory(self):
+        self.write_model("AK")
+        registry = self.registry()
+        self.assertEqual(registry.available_states(), ["AK"])
+
+        self.write_model("AL")
+        os.utime(self.model_dir, ns=(3_000_000_000, 3_000_000_000))
+
+        self.assertEqual(registry.available_states(), ["AK", "AL"])
+        self.assertIn("AL", registry)
+
+
+def state_frame(series):
+    """A load_state_frame() frame from {state: {ending date: value}}."""
+    return pd.DataFrame(
+        [
+            (state, pd.Timestamp(date), value)
+            for state, values in series.items()
+            for date, value in values.items()
+        ],
+        columns=["State", "Ending_Date", "State_WVAL"],
+    )
+
+
+class BaselineTests(TestCase):
+    def test_state_matrix_aligns_states_on_dates(self):
+        states, matrix = state_matrix(
+            state_frame(
+                {
+                    "Ohio": {"2025-01-04": 1.0, "2025-01-11": 2.0},
+                    # Reports stopped a week before Ohio's, with a gap before
+                    "Texas": {"2024-12-21": 5.0, "2025-01-04": 6.0},
+                }
+            )
+        )
+
+        self.assertEqual(states, ["Ohio", "Texas"])
+        np.testing.assert_array_equal(
+            matrix,
+            [[np.nan, np.nan, 1.0, 2.0], [5.0, np.nan, 6.0, np.nan]],
+        )
+
+    def test_seasonal_naive_repeats_last_seasons_weeks(self):
+        history = np.array([[1.0, 2.0, 3.0, 4.0, 5.0], [1.0, np.nan, 3.0, 4.0, 5.0]])
+
+        forecast = SeasonalNaive(season_length=4).predict(history, 3)
+
+        # Row 2 falls back to its last value where last season's week is NaN
+        np.testing.assert_array_equal(forecast, [[2.0, 3.0, 4.0], [5.0, 3.0, 4.0]])
+
+    def test_seasonal_naive_falls_back_for_short_series(self):
+        forecast = SeasonalNaive(season_length=52).predict([[1.0, 2.0, np.nan]], 2)
+
+        np.testing.assert_array_equal(forecast, [[2.0, 2.0]])
+
+    def test_smoothing_forecasts_a_constant_series_flat(self):
+        history = np.array([[np.nan, 3.0, 3.0, 3.0, 3.0], [1.0, 1.0, 1.0, 1.0, 1.0]])
+
+        for baseline in (ExponentialSmoothing(), DampedTrend()):
+            with self.subTest(baseline=baseline.name):
+                np.testing.assert_allclose(
+                    baseline.predict(history, 2), [[3.0, 3.0], [1.0, 1.0]]
+                )
+
+    def test_damped_trend_follows_a_linear_series(self):
+        forecast = DampedTrend().predict([np.arange(1.0, 21.0)], 3)[0]
+
+        self.assertTrue(np.all(np.diff(forecast) > 0))
+        self.assertGreater(forecast[0], 20.0)
+
+
+class StateWindowsTests(TestCase):
+    def test_windows_slide_over_each_scaled_series(self):
+        state_data, states = dataset.prepare_state_windows(
+            state_frame(
+                {
+                    "Ohio": {f"2025-01-{day:02}": day for day in (4, 11, 18, 25)},
+                    # Too short for a single window
+                    "Texas": {"2025-01-04": 1.0, "2025-01-11": 2.0},
+                }
+            ),
+            sequence_length=2,
+        )
+
+        self.assertEqual(states, ["Ohio"])
+        ohio = state_data["Ohio"]
+        scaled = [0.0, 7 / 21, 14 / 21, 1.0]
+        np.testing.assert_allclose(
+            ohio["X"][..., 0], [scaled[0:2], scaled[1:3]], rtol=1e-6
+        )
+        np.testing.assert_allclose(ohio["y"], [[scaled[2]], [scaled[3]]])
+        np.testing.assert_allclose(ohio["last_sequence_scaled"][:, 0], scaled[2:])
+        self.assertEqual(dataset.scaler_range(ohio["scaler"]), (4.0, 25.0))
+
+    def test_windows_are_cached_until_the_data_version_changes(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            db_path = os.path.join(tmp, "db.sqlite")
+            cache_dir = os.path.join(tmp, "cache")
+            conn = sqlite3.connect(db_path)
+            conn.execute(
+                "CREATE TABLE state_timeseries (State, Ending_Date, State_WVAL)"
+            )
+            conn.execute(
+                'CREATE TABLE ingest_run ("Id" INTEGER PRIMARY KEY, "Source", '
+                '"Max_Ending_Date")'
+            )
+            conn.executemany(
+                "INSERT INTO state_timeseries VALUES ('Ohio', ?, ?)",
+                [(f"2025-01-{day:02}", float(day)) for day in (4, 11, 18, 25)],
+            )
+            conn.execute(
+                "INSERT INTO ingest_run VALUES (1, 'state_timeseries', '2025-01-25')"
+            )
+            conn.commit()
+
+            built, _ = dataset.load_state_windows(db_path, 2, cache_dir=cache_dir)
+            with mock.patch.object(
+                dataset, "prepare_state_windows", side_effect=AssertionError
+            ), mock.patch("builtins.print"):
+                cached, states = dataset.load_state_windows(
+                    db_path, 2, cache_dir=cache_dir
+                )
+
+            self.assertEqual(states, ["Ohio"])
+            for key in ("X", "y", "last_sequence_scaled"):
+                np.testing.assert_array_equal(cached["Ohio"][key], built["Ohio"][key])
+            self.assertEqual(
+                cached["Ohio"]["fingerprint"], built["Ohio"]["fingerprint"]
+            )
+
+            # A new ingest run changes the version, so the windows are rebuilt
+            conn.execute(
+                "INSERT INTO ingest_run VALUES (2, 'state_timeseries', '2025-01-25')"
+            )
+            conn.commit()
+            conn.close()
+            with mock.patch.object(
+                dataset, "prepare_state_windows", wraps=dataset.prepare_state_windows
+            ) as prepare:
+                dataset.load_state_windows(db_path, 2, cache_dir=cache_dir)
+            prepare.assert_called_once()
+            self.assertEqual(len(os.listdir(cache_dir)), 2)
+
+
+def backtest_result(engine, state, origin, errors, epochs=None):
+    return {
+        "engine": engine,
+        "state": state,
+        "origin": origin,
+        "errors": np.asarray(errors, dtype=float),
+        "fit_s": 1.0,
+        "epochs": epochs,
+        "predict_ms": 2.0,
+    }
+
+
+class BacktestTests(TestCase):
+    def test_rolling_origins_step_back_by_the_horizon(self):
+        self.assertEqual(rolling_origins(20, 3, horizon=4), [8, 12, 16])
+
+    def test_rolling_origins_need_a_window_before_them(self):
+        weeks = SEQUENCE_LENGTH + 5
+
+        self.assertEqual(
+            rolling_origins(weeks, 3, horizon=2), [SEQUENCE_LENGTH + 1, weeks - 2]
+        )
+
+    def test_cases_need_every_week_reported(self):
+        history = np.arange(2 * 12, dtype=float).reshape(2, 12)
+        history[1, 9] = np.nan
+
+        cases = backtest_cases(history, [6, 8], horizon=2)
+
+        self.assertEqual(cases, [(0, 6), (1, 6), (0, 8)])
+
+    def test_baseline_is_scored_against_the_reported_weeks(self):
+        history = np.array([[1.0, 2.0, 3.0, 4.0, 5.0, 6.0, 7.0]])
+
+        [result] = backtest_baseline(
+            "seasonal_naive", ["Ohio"], history, [(0, 5)], horizon=2
+        )
+
+        # Too short for a season, so both weeks forecast the last value, 5
+        self.assertEqual(result["origin"], -2)
+        np.testing.assert_array_equal(result["errors"], [1.0, 2.0])
+
+    def test_summary_only_averages_cases_every_engine_forecast(self):
+        results = [
+            backtest_result("lstm", "Ohio", -4, [1.0, 3.0], epochs=10),
+            backtest_result("lstm", "Ohio", -8, [3.0, 5.0], epochs=20),
+            backtest_result("damped_trend", "Ohio", -4, [2.0, 2.0]),
+            backtest_result("damped_trend", "Texas", -4, [100.0, 100.0]),
+        ]
+
+        lstm, damped_trend = summarize(results, ["lstm", "damped_trend"])
+
+        self.assertEqual(lstm["forecasts"], 1)
+        self.assertEqual(lstm["mae_by_horizon"], [1.0, 3.0])
+        self.assertEqual(lstm["mae"], 2.0)
+        self.assertEqual(lstm["epochs"], 15.0)
+        self.assertEqual(damped_trend["mae_by_horizon"], [2.0, 2.0])
+        self.assertIsNone(damped_trend["epochs"])
+
+
+class NumpyEngineTests(TestCase):
+    def exported(self, model, scaler_range=(0.0, 10.0)):
+        # Through the .npz file, as export_models.py writes it and serving reads it
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, "best_model_Ohio.npz")
+            numpy_engine.save_export(
+                path, numpy_engine.export_model(model), scaler_range
+            )
+            return numpy_engine.ExportedModel.load(path)
+
+    def test_rollout_matches_keras(self):
+        sequences = np.random.default_rng(0).random(
+            (3, SEQUENCE_LENGTH, N_FEATURES), dtype="float32"
+        )
+        for build in (build_improved_model, build_simple_rnn_model):
+            with self.subTest(model=build.__name__):
+                model = build(SEQUENCE_LENGTH, N_FEATURES)
+                expected = np.asarray(inference.compiled_rollout(model, 4)(sequences))
+
+                layers = numpy_engine.stack_models([self.exported(model)])
+                rolled = numpy_engine.rollout(layers, sequences[np.newaxis], 4)[0]
+
+                np.testing.assert_allclose(rolled, expected, rtol=1e-4, atol=1e-5)
+
+    def test_stacked_models_match_separate_calls(self):
+        models = [
+            self.exported(build_improved_model(SEQUENCE_LENGTH, N_FEATURES))
+            for _ in range(2)
+        ]
+        sequences = np.random.default_rng(1).random(
+            (2, 1, SEQUENCE_LENGTH, N_FEATURES), dtype="float32"
+        )
+
+        stacked = numpy_engine.rollout(numpy_engine.stack_models(models), sequences, 3)
+
+        for i, model in enumerate(models):
+            separate = numpy_engine.rollout(
+                numpy_engine.stack_models([model]), sequences[i : i + 1], 3
+            )
+            np.testing.assert_allclose(stacked[i], separate[0], rtol=1e-6)
+
+    def test_export_keeps_the_scaler_range(self):
+        model = self.exported(
+            build_simple_rnn_model(SEQUENCE_LENGTH, N_FEATURES), (2.0, 8.0)
+        )
+
+        self.assertEqual(model.scaler_range, (2.0, 8.0))
@@ -0,0 +1,264 @@
+"""
+Per-state model training, shared by the sequential and process-pool modes of
+virus_prediction.py.
+
+Everything a worker process needs lives here rather than in the training
+script, so spawned workers import this module instead of re-running the
+script. Workers only return results; the parent process is the single writer
+of the results and predictions CSVs.
+"""
+
+import json
+import os
+
+from . import N_FEATURES, PREDICT_STEPS, SEQUENCE_LENGTH
+
+EPOCHS = 200  # You might adjust this based on EarlyStopping behavior
+BATCH_SIZE = 32
+FINE_TUNE_EPOCHS = 10  # Warm starts only adapt an existing model to new weeks
+FINE_TUNE_PATIENCE = 3
+
+# Per-state fingerprint of the series each saved model was last trained on
+MANIFEST_FILE = "training_manifest.json"
+
+
+def load_manifest(model_dir):
+    try:
+        with open(os.path.join(model_dir, MANIFEST_FILE)) as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return {}
+
+
+def save_manifest(model_dir, manifest):
+    # Write then rename so an interrupted run never leaves a truncated manifest
+    path = os.path.join(model_dir, MANIFEST_FILE)
+    with open(path + ".tmp", "w") as f:
+        json.dump(manifest, f, indent=4, sort_keys=True)
+    os.replace(path + ".tmp", path)
+
+
+def plan_training(state_data, states, model_dir, manifest, full=False):
+    """
+    Splits `states` into (skip, warm, cold): unchanged series with a saved
+    model are skipped, changed series with a saved model are fine-tuned from
+    it, and the rest are trained from scratch. `full` retrains everything cold.
+    """
+    skip, warm, cold = [], [], []
+    for state in states:
+        has_model = os.path.exists(os.path.join(model_dir, f"best_model_{state}.keras"))
+        if full or not has_model:
+            cold.append(state)
+        elif manifest.get(state) == state_data[state]["fingerprint"]:
+            skip.append(state)
+        else:
+            warm.append(state)
+    return skip, warm, cold
+
+
+def worker_thread_counts(workers, cpus=None):
+    """
+    (intra_op, inter_op) TensorFlow thread counts per worker, so that
+    `workers` processes together use roughly every core once.
+    """
+    cpus = cpus or os.cpu_count() or 1
+    return max(1, cpus // workers), 1 if workers > 1 else 2
+
+
+def configure_tf_threads(intra_op, inter_op):
+    """Process-pool initializer; must run before TensorFlow executes any op."""
+    import tensorflow as tf
+
+    tf.config.threading.set_intra_op_parallelism_threads(intra_op)
+    tf.config.threading.set_inter_op_parallelism_threads(inter_op)
+
+
+def build_improved_model(sequence_length, n_features):
+    from tensorflow.keras.layers import LSTM, Dense, Dropout, Input
+    from tensorflow.keras.models import Sequential
+    from tensorflow.keras.optimizers import Adam
+
+    model = Sequential(
+        [
+            Input(shape=(sequence_length, n_features)),
+            LSTM(64, return_sequences=True),
+            Dropout(0.2),
+            LSTM(32),
+            Dense(1),
+        ]
+    )
+    model.compile(optimizer=Adam(learning_rate=0.0005), loss="mse", metrics=["mae"])
+    return model
+
+
+def train_state(
+    state,
+    data,
+    model_dir,
+    history_dir,
+    epochs=EPOCHS,
+    batch_size=BATCH_SIZE,
+    verbose=1,
+    warm_start=False,
+):
+    """
+    Trains, evaluates and forecasts one state. `data` is the state's entry in
+    the training script's `state_data`. With `warm_start` the state's saved
+    model is fine-tuned for FINE_TUNE_EPOCHS instead of training a new one.
+
+    Returns {"state", "loss", "mae", "predictions", "lower", "upper", "error"}:
+    loss/mae are -1.0 when evaluation fails, predictions is None when
+    forecasting fails, lower/upper are its Monte Carlo dropout interval (None
+    when that fails), and error describes why a state was skipped (None
+    otherwise).
+    """
+    import tensorflow as tf
+    from sklearn.model_selection import train_test_split
+    from tensorflow.keras.callbacks import EarlyStopping, ModelCheckpoint
+
+    from .dataset import scaler_range
+    from .inference import predict_future, predict_intervals
+    from .numpy_engine import EXPORT_SUFFIX, export_model, save_export
+    from .registry import save_scaler_range
+
+    result = {
+        "state": state,
+        "loss": -1.0,
+        "mae": -1.0,
+        "predictions": None,
+        "lower": None,
+        "upper": None,
+        "error": None,
+    }
+    X, y = data["X"], data["y"]
+
+    # Ensure data is sufficient for split
+    if len(X) < 2:
+        result["error"] = f"Not enough sequences ({len(X)}) for train/test split."
+        return result
+
+    # Adjust test_size dynamically if dataset is small
+    test_size = 0.2 if len(X) >= 5 else 1 / len(X)
+    try:
+        X_train, X_test, y_train, y_test = train_test_split(
+            X, y, test_size=test_size, shuffle=False  # Keep order for time series
+        )
+    except ValueError as e:
+        result["error"] = f"Error during split - {e}"
+        return result
+
+    if X_train.shape[0] == 0 or X_test.shape[0] == 0:
+        result["error"] = "Empty train or test set after split."
+        return result
+
+    model_filepath = os.path.join(model_dir, f"best_model_{state}.keras")
+    history_filepath = os.path.join(history_dir, f"history_{state}.json")
+
+    patience = 10
+    if warm_start:
+        # Continues from the saved weights and optimizer state
+        model = tf.keras.models.load_model(model_filepath)
+        epochs, patience = min(epochs, FINE_TUNE_EPOCHS), FINE_TUNE_PATIENCE
+    else:
+        model = build_improved_model(SEQUENCE_LENGTH, N_FEATURES)
+
+    callbacks = [
+        EarlyStopping(
+            monitor="val_loss",
+            patience=patience,
+            restore_best_weights=True,
+            verbose=verbose,
+        ),
+        ModelCheckpoint(
+            filepath=model_filepath, save_best_only=True, monitor="val_loss", verbose=0
+        ),
+    ]
+
+    print(f"{'Fine-tuning' if warm_start else 'Fitting'} model for {state}...")
+    history = model.fit(
+        X_train,
+        y_train,
+        epochs=epochs,
+        batch_size=batch_size,
+        validation_data=(X_test, y_test),
+        callbacks=callbacks,
+        verbose=verbose,
+    )
+
+    # The checkpoint was trained on this scaling; forecasts must reuse it
+    if os.path.exists(model_filepath):
+        save_scaler_range(model_filepath, scaler_range(data["scaler"]))
+
+    # One file per state, so concurrent workers never share a history file
+    history_dict = {
+        key: [float(val) for val in values] for key, values in history.history.items()
+    }
+    try:
+        with open(history_filepath, "w") as f:
+            json.dump(history_dict, f, indent=4)
+    except Exception as e:
+        print(f"Error saving history for {state}: {e}")
+
+    # Evaluate the best checkpoint if one was written, else the in-memory model
+    model_to_predict = model
+    try:
+        if os.path.exists(model_filepath):
+            model_to_predict = tf.keras.models.load_model(model_filepath)
+        loss, mae = model_to_predict.evaluate(X_test, y_test, verbose=0)
+        result["loss"], result["mae"] = float(loss), float(mae)
+    except Exception as e:
+        print(f"Could not evaluate the model for {state}: {e}")
+
+    forecast_args = (
+        model_to_predict,
+        data["scaler"],
+        data["last_sequence_scaled"].reshape(SEQUENCE_LENGTH, N_FEATURES),
+        PREDICT_STEPS,
+        SEQUENCE_LENGTH,
+        N_FEATURES,
+    )
+    try:
+        result["predictions"] = predict_future(*forecast_args).tolist()
+    except Exception as e:
+        print(f"Error during prediction for {state}: {e}")
+
+    try:
+        lower, upper = predict_intervals(*forecast_args)
+        result["lower"], result["upper"] = lower.tolist(), upper.tolist()
+    except Exception as e:
+        print(f"Error estimating the prediction interval for {state}: {e}")
+
+    # TensorFlow-free copy for serving (forecasting.numpy_engine)
+    try:
+        export_dir = os.path.join(model_dir, "numpy")
+        os.makedirs(export_dir, exist_ok=True)
+        save_export(
+            os.path.join(export_dir, f"best_model_{state}{EXPORT_SUFFIX}"),
+            export_model(model_to_predict),
+            scaler_range(data["scaler"]),
+        )
+    except Exception as e:
+        print(f"Error exporting the model for {state}: {e}")
+
+    # Free this state's graph before the next one in a long-lived worker
+    tf.keras.backend.clear_session()
+    return result
+
+
+def build_simple_rnn_model(sequence_length, n_features):
+    """build_improved_model with SimpleRNN layers (virus_prediction_rnn.py)."""
+    from tensorflow.keras.layers import Dense, Dropout, Input, SimpleRNN
+    from tensorflow.keras.models import Sequential
+    from tensorflow.keras.optimizers import Adam
+
+    model = Sequential(
+        [
+            Input(shape=(sequence_length, n_features)),
+            SimpleRNN(64, return_sequences=True),
+            Dropout(0.2),
+            SimpleRNN(32),
+            Dense(1),
+        ]
+    )
+    model.compile(optimizer=Adam(learning_rate=0.0005), loss="mse", metrics=["mae"])
+    return model
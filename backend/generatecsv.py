@@ -1,61 +1,72 @@
+import json
 import os
 
-import numpy as np
 import pandas as pd
-from sklearn.preprocessing import MinMaxScaler
-from tensorflow.keras.models import load_model
 
+from forecasting import N_FEATURES, PREDICT_STEPS, SEQUENCE_LENGTH
+from forecasting.dataset import load_state_windows, scaler_for_range
+from forecasting.inference import predict_future
+from forecasting.registry import ModelRegistry
 
-def predict_future(model, scaler, last_sequence, steps_ahead):
-    predictions = []
-    current_sequence = last_sequence.copy()
+DB_PATH = "db/db.sqlite"
+MODEL_DIR = "models/"
+HISTORY_DIR = "history/"
+METRICS_CSV = "lstm_model_metrics.csv"
 
-    for _ in range(steps_ahead):
-        input_data = current_sequence.reshape(1, len(last_sequence), 1)
 
-        pred_scaled = model.predict(input_data, verbose=0)[0, 0]
-        predictions.append(pred_scaled)
+def last_epoch_metrics(state):
+    """Final-epoch metrics from the training history virus_prediction.py saves."""
+    history_filepath = os.path.join(HISTORY_DIR, f"history_{state}.json")
+    if not os.path.exists(history_filepath):
+        return {}
+    with open(history_filepath) as f:
+        history = json.load(f)
+    return {
+        key: history[key][-1]
+        for key in ("loss", "mae", "val_loss", "val_mae")
+        if history.get(key)
+    }
 
-        current_sequence = np.roll(current_sequence, -1)
-        current_sequence[-1] = pred_scaled
-
-    return scaler.inverse_transform(np.array(predictions).reshape(-1, 1)).flatten()
 
+state_data, _ = load_state_windows(DB_PATH, SEQUENCE_LENGTH)
+# Each model is loaded once and dropped again once it falls out of the LRU
+registry = ModelRegistry(MODEL_DIR, max_models=4)
 
 results = []
-
-model_dir = "lstmodels/"
-for filename in os.listdir(model_dir):
-    if filename.endswith(".keras"):
-        state = filename.replace("best_model_", "").replace(".keras", "").strip("'")
-
-        try:
-            model = load_model(os.path.join(model_dir, filename))
-
-            history = model.history.history
-
-            last_epoch = {
-                "State": state,
-                "loss": history["loss"][-1],
-                "mae": history["mae"][-1],
-                "val_loss": history["val_loss"][-1],
-                "val_mae": history["val_mae"][-1],
-            }
-
-            scaler = state_data[state]["scaler"]
-            last_sequence = state_data[state]["X"][-1]
-            future_preds = predict_future(model, scaler, last_sequence, steps_ahead=4)
-
-            # Add predictions to results
-            for i, pred in enumerate(future_preds, 1):
-                last_epoch[f"week{i}"] = pred
-
-            results.append(last_epoch)
-
-        except Exception as e:
-            print(f"Error processing {state}: {str(e)}")
-            continue
+for state in registry.available_states():
+    if state not in state_data:
+        print(f"Skipping {state}: not enough data")
+        continue
+
+    try:
+        model, trained_range = registry.get_with_scaler_range(state)
+        scaler = state_data[state]["scaler"]
+        sequence = state_data[state]["last_sequence_scaled"]
+        if trained_range is not None:
+            # Scale the latest weeks with the range the model was trained on,
+            # as /api/forecast does; older models fall back to the current one
+            values = scaler.inverse_transform(sequence)
+            scaler = scaler_for_range(*trained_range)
+            sequence = scaler.transform(values)
+
+        future_preds = predict_future(
+            model,
+            scaler,
+            sequence,
+            PREDICT_STEPS,
+            SEQUENCE_LENGTH,
+            N_FEATURES,
+        )
+
+        last_epoch = {"State": state, **last_epoch_metrics(state)}
+        for i, pred in enumerate(future_preds, 1):
+            last_epoch[f"week{i}"] = pred
+        results.append(last_epoch)
+
+    except Exception as e:
+        print(f"Error processing {state}: {str(e)}")
+        continue
 
 results_df = pd.DataFrame(results)
-results_df.to_csv("lstm_model_metrics.csv", index=False)
+results_df.to_csv(METRICS_CSV, index=False)
 print("CSV saved successfully!")
@@ -89,6 +89,11 @@ CSRF_TRUSTED_ORIGINS = ['http://localhost:5173']
 
 CORS_ALLOW_ALL_ORIGINS = True
 
+# Keyset pagination cursor for the history endpoints (api/history.py)
+CORS_EXPOSE_HEADERS = [
+    'X-Next-Cursor',
+]
+
 CORS_ALLOW_METHODS = [
     'GET',
     'POST',
@@ -108,6 +113,57 @@ DATABASES = {
 }
 
 
+# Seconds clients may reuse an API response before revalidating it with the
+# ETag / Last-Modified validators (see api/data_version.py)
+API_CACHE_MAX_AGE = 300
+
+
+# Cache
+# https://docs.djangoproject.com/en/5.2/topics/cache/
+
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'lahacks-api',
+    },
+    'file': {
+        'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+        # A directory of its own: culling and cache.clear() sweep LOCATION,
+        # and cache/ also holds populate_db.py's raw CSVs and the dataset cache
+        'LOCATION': os.path.join(BASE_DIR, 'cache', 'responses'),
+    },
+}
+
+# Cache alias used for rendered API responses (api/response_cache.py). Use
+# 'file' to share entries between worker processes on the same machine.
+API_RESPONSE_CACHE = os.getenv("API_RESPONSE_CACHE", default="default")
+API_RESPONSE_CACHE_TIMEOUT = 60 * 60 * 24 * 7
+
+
+# On-demand forecasts (api/forecast.py). Per-state Keras models are loaded from
+# FORECAST_MODEL_DIR on first use and kept resident up to these limits, least
+# recently used first out.
+FORECAST_MODEL_DIR = os.getenv(
+    "FORECAST_MODEL_DIR", default=os.path.join(BASE_DIR, 'models')
+)
+FORECAST_REGISTRY_MAX_MODELS = int(
+    os.getenv("FORECAST_REGISTRY_MAX_MODELS", default=16)
+)
+FORECAST_REGISTRY_MAX_BYTES = int(
+    os.getenv("FORECAST_REGISTRY_MAX_BYTES", default=64 * 1024 * 1024)
+)
+# "per_state" serves best_model_<state>.keras through the registry; "numpy"
+# serves their TensorFlow-free exports from FORECAST_MODEL_DIR/numpy (see
+# export_models.py); "global" serves every state from the single model
+# `virus_prediction.py --global` saves
+FORECAST_MODEL_KIND = os.getenv("FORECAST_MODEL_KIND", default="per_state")
+# Baseline (forecasting/baselines.py) used for states without a usable model;
+# empty disables the fallback
+FORECAST_FALLBACK_BASELINE = os.getenv(
+    "FORECAST_FALLBACK_BASELINE", default="damped_trend"
+)
+
+
 # Password validation
 # https://docs.djangoproject.com/en/5.2/ref/settings/#auth-password-validators
 
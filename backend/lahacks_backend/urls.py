@@ -18,6 +18,7 @@ from django.contrib import admin
 from django.urls import include, path
 
 urlpatterns = [
+    path('api/async/', include("api.async_urls")),
     path('api/', include("api.urls")),
     path('admin/', admin.site.urls),
 ]
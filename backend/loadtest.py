@@ -0,0 +1,112 @@
+"""
+Small concurrent load generator for comparing the sync (WSGI) and async (ASGI)
+read endpoints.
+
+Start the server under test, for example
+
+    gunicorn lahacks_backend.wsgi -w 1 -b 127.0.0.1:8000          # sync views
+    uvicorn lahacks_backend.asgi:application --port 8001           # async views
+
+and point the script at it:
+
+    python loadtest.py http://127.0.0.1:8000/api -c 32 -n 2000
+    python loadtest.py http://127.0.0.1:8001/api/async -c 32 -n 2000
+
+--bust-cache adds a unique query parameter to every request so each one
+misses the response cache and exercises the database path.
+
+The async ORM still runs each query on a thread, so the database-bound paths
+are no faster under ASGI. The async route pays off while requests wait on
+slow I/O: --slow-io <ms> mixes in requests to /io_wait (routed when DEBUG is
+on), which waits that long the way a slow SMTP send or upstream call would.
+A sync worker is held for the whole wait; the async view only parks a
+coroutine, so the other requests keep being served.
+"""
+
+import argparse
+import statistics
+import time
+from concurrent.futures import ThreadPoolExecutor
+from itertools import cycle, islice
+
+import requests
+
+DEFAULT_PATHS = [
+    "/state?state=Ohio",
+    "/state?state=Texas&history=true&since=2025-01-01",
+    "/state/all",
+    "/county?state=California",
+    "/region?region=W&history=true",
+    "/nation",
+    "/predictions",
+]
+
+
+def run(base_url, paths, concurrency, total, bust_cache):
+    session = requests.Session()
+    session.mount(
+        "http://",
+        requests.adapters.HTTPAdapter(
+            pool_connections=concurrency, pool_maxsize=concurrency
+        ),
+    )
+
+    def fetch(args):
+        i, path = args
+        url = base_url + path
+        if bust_cache:
+            url += ("&" if "?" in url else "?") + f"_bust={i}"
+        start = time.perf_counter()
+        response = session.get(url, timeout=60)
+        return time.perf_counter() - start, response.status_code
+
+    work = enumerate(islice(cycle(paths), total))
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        results = list(pool.map(fetch, work))
+    elapsed = time.perf_counter() - start
+
+    latencies = sorted(latency for latency, _ in results)
+    errors = sum(1 for _, status in results if status >= 400)
+    quantiles = statistics.quantiles(latencies, n=100)
+
+    print(f"{base_url}  concurrency={concurrency} requests={total}")
+    print(f"  throughput: {total / elapsed:8.1f} req/s  ({elapsed:.2f}s total)")
+    print(
+        f"  latency ms: p50={quantiles[49] * 1000:.1f} "
+        f"p95={quantiles[94] * 1000:.1f} p99={quantiles[98] * 1000:.1f} "
+        f"max={latencies[-1] * 1000:.1f}"
+    )
+    print(f"  errors: {errors}")
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Load test the API read endpoints.")
+    parser.add_argument("base_url", help="e.g. http://127.0.0.1:8000/api")
+    parser.add_argument("-c", "--concurrency", type=int, default=32)
+    parser.add_argument("-n", "--requests", type=int, default=1000)
+    parser.add_argument(
+        "-p", "--path", action="append", help="Path to request (repeatable)"
+    )
+    parser.add_argument("--bust-cache", action="store_true")
+    parser.add_argument(
+        "--slow-io",
+        type=int,
+        metavar="MS",
+        help="Also request /io_wait, which waits MS milliseconds like slow I/O",
+    )
+    return parser.parse_args()
+
+
+if __name__ == "__main__":
+    args = parse_args()
+    paths = args.path or DEFAULT_PATHS
+    if args.slow_io is not None:
+        paths = paths + [f"/io_wait?ms={args.slow_io}"]
+    run(
+        args.base_url.rstrip("/"),
+        paths,
+        args.concurrency,
+        args.requests,
+        args.bust_cache,
+    )
@@ -1,36 +1,338 @@
+import argparse
+import hashlib
+import json
 import logging
+import os
 import pdb
 import sqlite3
+import sys
+import tempfile
+import time
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
 from datetime import datetime
-from io import StringIO
+from functools import partial
 
 import pandas as pd
 import requests
 
+from api.regions import STATE_REGIONS
+from api.schema import NATURAL_KEYS, ensure_schema, record_ingest_run
+from api.wval import WVAL_CATEGORY_MAPPING, closest_wval_category
+
 COUNTY_URL = (
     "https://www.cdc.gov/wcms/vizdata/ncezid_didri/nwsssc2sitemappointsnocoordscsv.csv"
 )
 STATE_URL = "https://www.cdc.gov/wcms/vizdata/ncezid_didri/SC2StateLevelDownloadCSV.csv"
-DB_FILE = "db/dbTest.sqlite"
+# The database the API reads (settings.DATABASES), wherever this is run from,
+# so every ingest_run recorded here changes the data version the API serves
+DB_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "db", "db.sqlite")
 COUNTY_TABLE = "county_current"
 STATE_TABLE = "state_timeseries"
+SEWERSHED_COUNTY_TABLE = "sewershed_county"
+COUNTY_AGGREGATE_TABLE = "county_aggregate"
+REGION_SERIES_TABLE = "region_series"
+NATIONAL_SERIES_TABLE = "national_series"
+CHUNK_ROWS = 10_000  # CSV rows parsed and upserted at a time
+
+# Downloaded CSVs, stored by content hash, plus each source's HTTP validators
+RAW_CACHE_DIR = os.path.join("cache", "raw")
+RAW_MANIFEST_FILE = "sources.json"
+# --exit-code status when no source had new data, for chaining retraining
+NOTHING_CHANGED_EXIT_CODE = 3
+
+# Seconds to connect and to wait for each read (not for the whole body),
+# unless a source sets its own
+FETCH_TIMEOUT = 30
+FETCH_DEADLINE = 300  # Seconds a source's download may take in all, retries included
+FETCH_RETRIES = 3  # Attempts after the first for connection errors and 429/5xx
+FETCH_BACKOFF = 1.0  # Seconds before the first retry, doubled for each one after
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+
+# A feed to load: its CSV (URL or local path), the loader that parses it into
+# the database as process(path, conn), its per-read download timeout, and
+# whether to fetch and load it even if unchanged since the last run
+Source = namedtuple(
+    "Source", ["name", "url", "process", "timeout", "force"], defaults=[False]
+)
+
+# CDC CSV column -> table column
+COUNTY_COLUMNS = {
+    "State/Territory": "State",
+    "Sewershed_ID": "Sewershed_ID",
+    "Counties_Served": "Counties_Served",
+    "Population_Served": "Population_Served",
+    "WVAL_Category": "WVAL_Category",
+    "Reporting_Week": "Reporting_Week",
+}
+STATE_COLUMNS = {
+    "State/Territory": "State",
+    "Week_Ending_Date": "Ending_Date",
+    "Data_Collection_Period": "Data_Collection_Period",
+    "State/Territory_WVAL": "State_WVAL",
+    "National_WVAL": "National_WVAL",
+    "Regional_WVAL": "Regional_WVAL",
+    "WVAL_Category": "WVAL_Category",
+    "Coverage": "Coverage",
+}
+
+STAGING_PREFIX = "staging_"
+# Staged rows matching any of these conditions fail validation and are not
+# merged: (problem, SQL condition)
+STAGING_CHECKS = {
+    STATE_TABLE: [
+        (
+            "Ending_Date is not YYYY-MM-DD",
+            '"Ending_Date" NOT GLOB ' "'[0-9][0-9][0-9][0-9]-[0-9][0-9]-[0-9][0-9]'",
+        ),
+        ("State_WVAL is negative", '"State_WVAL" < 0'),
+    ],
+    COUNTY_TABLE: [
+        ("Population_Served is negative", '"Population_Served" < 0'),
+    ],
+}
 
 logging.basicConfig(
     level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s"
 )
 
 
-def download_csv(url):
-    """Downloads a CSV file from the given URL."""
-    logging.info(f"Downloading CSV from {url}...")
+@contextmanager
+def open_csv(path):
+    """
+    Opens a local CSV (a feed fetch_source() has downloaded) as a binary
+    stream, so it is parsed in chunks instead of being read into memory first.
+    """
+    logging.info(f"Reading CSV from {path}...")
+    with open(path, "rb") as f:
+        yield f
+
+
+def read_csv_chunks(stream, column_mapping):
+    """
+    Parses the mapped columns of a CSV stream in CHUNK_ROWS-row DataFrames,
+    renamed to their table columns. Every value is read as a string: type
+    inference can differ between chunks (an ID column read as numbers in one
+    and text in the next), so numeric columns are converted explicitly.
+    """
+    for chunk in pd.read_csv(
+        stream, usecols=list(column_mapping), dtype=str, chunksize=CHUNK_ROWS
+    ):
+        yield chunk.rename(columns=column_mapping)[list(column_mapping.values())]
+
+
+def is_url(source):
+    return source.startswith(("http://", "https://"))
+
+
+def load_raw_manifest(cache_dir):
     try:
-        response = requests.get(url, timeout=30)
+        with open(os.path.join(cache_dir, RAW_MANIFEST_FILE)) as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return {}
+
+
+def save_raw_manifest(cache_dir, manifest):
+    # Write then rename so an interrupted run never leaves a truncated manifest
+    path = os.path.join(cache_dir, RAW_MANIFEST_FILE)
+    os.makedirs(cache_dir, exist_ok=True)
+    with open(path + ".tmp", "w") as f:
+        json.dump(manifest, f, indent=4, sort_keys=True)
+    os.replace(path + ".tmp", path)
+
+
+def fetch_raw_csv(
+    source, previous, cache_dir=RAW_CACHE_DIR, timeout=FETCH_TIMEOUT, deadline=None
+):
+    """
+    Brings `source` (URL or local path) up to date in the raw cache. URLs are
+    requested conditionally with the ETag / Last-Modified from `previous`,
+    this source's manifest entry; a 200 is streamed to disk and hashed.
+    `timeout` bounds each read; `deadline`, a time.monotonic() value, bounds
+    the whole download.
+
+    Returns (path, entry, changed): the local CSV to parse, the manifest entry
+    to record once it has been loaded, and whether its content differs from
+    the last one loaded.
+    """
+    if not is_url(source):
+        digest = hashlib.sha256()
+        with open(source, "rb") as f:
+            for block in iter(lambda: f.read(1 << 20), b""):
+                digest.update(block)
+        entry = {"sha256": digest.hexdigest(), "path": source}
+        return source, entry, entry["sha256"] != previous.get("sha256")
+
+    headers = {}
+    if previous.get("etag"):
+        headers["If-None-Match"] = previous["etag"]
+    if previous.get("last_modified"):
+        headers["If-Modified-Since"] = previous["last_modified"]
+
+    os.makedirs(cache_dir, exist_ok=True)
+    digest = hashlib.sha256()
+    logging.info(f"Downloading CSV from {source}...")
+    with requests.get(
+        source, headers=headers, stream=True, timeout=timeout
+    ) as response:
+        if response.status_code == 304:
+            logging.info(f"{source} not modified since the last download.")
+            return previous.get("path"), previous, False
         response.raise_for_status()
-        logging.info("Download successful.")
-        return response.text
-    except requests.exceptions.RequestException as e:
-        logging.error(f"Error downloading {url}: {e}")
+        # Sources download concurrently, so each gets its own temporary file
+        with tempfile.NamedTemporaryFile(
+            dir=cache_dir, suffix=".tmp", delete=False
+        ) as f:
+            tmp_path = f.name
+            try:
+                for block in response.iter_content(1 << 20):
+                    if deadline is not None and time.monotonic() > deadline:
+                        raise requests.exceptions.Timeout(
+                            f"Download of {source} passed its deadline"
+                        )
+                    digest.update(block)
+                    f.write(block)
+            except BaseException:
+                f.close()
+                os.remove(tmp_path)
+                raise
+
+    entry = {
+        "etag": response.headers.get("ETag"),
+        "last_modified": response.headers.get("Last-Modified"),
+        "sha256": digest.hexdigest(),
+        "path": os.path.join(cache_dir, f"{digest.hexdigest()}.csv"),
+    }
+    os.replace(tmp_path, entry["path"])
+    changed = entry["sha256"] != previous.get("sha256")
+    if not changed:
+        logging.info(f"{source} was downloaded again but its content is unchanged.")
+    return entry["path"], entry, changed
+
+
+def is_transient(error):
+    """Whether a failed download is worth retrying."""
+    if isinstance(error, requests.exceptions.HTTPError):
+        return getattr(error.response, "status_code", None) in RETRY_STATUSES
+    # ChunkedEncodingError is a connection dropped partway through the body
+    return isinstance(
+        error,
+        (
+            requests.exceptions.ConnectionError,
+            requests.exceptions.Timeout,
+            requests.exceptions.ChunkedEncodingError,
+        ),
+    )
+
+
+def fetch_with_retries(
+    source,
+    previous,
+    retries=FETCH_RETRIES,
+    backoff=FETCH_BACKOFF,
+    deadline=FETCH_DEADLINE,
+):
+    """
+    fetch_raw_csv for a Source, retrying connection errors, timeouts and
+    429/5xx responses with exponential backoff. Other errors raise at once,
+    as does a retry that would run past `deadline` seconds from the start.
+    """
+    ends_at = time.monotonic() + deadline
+    for attempt in range(retries + 1):
+        try:
+            return fetch_raw_csv(
+                source.url,
+                previous,
+                timeout=min(source.timeout, ends_at - time.monotonic()),
+                deadline=ends_at,
+            )
+        except requests.exceptions.RequestException as e:
+            delay = backoff * 2**attempt
+            if (
+                attempt == retries
+                or not is_transient(e)
+                or time.monotonic() + delay >= ends_at
+            ):
+                raise
+            logging.warning(
+                f"Downloading {source.name} failed ({e}); "
+                f"retry {attempt + 1}/{retries} in {delay:.1f}s..."
+            )
+            time.sleep(delay)
+
+
+def manifest_entry(manifest, source, db_file):
+    """
+    The source's manifest entry if it was last loaded into `db_file`, else
+    an empty one, so the source counts as changed. Forced sources always get
+    an empty one.
+    """
+    entry = manifest.get(source.url, {})
+    # Entries recorded before they named a database were loaded into DB_FILE
+    if source.force or entry.get("db", DB_FILE) != db_file:
+        return {}
+    return entry
+
+
+def fetch_sources(sources, manifest, db_file):
+    """
+    Fetches every source concurrently, one thread each, so total wall time is
+    that of the slowest source rather than the sum. Returns {name: (path,
+    entry, changed)}, with None for sources that could not be fetched.
+    Sources are compared with what was last loaded into `db_file` (see
+    manifest_entry()).
+    """
+    with ThreadPoolExecutor(max_workers=max(1, len(sources))) as executor:
+        futures = {
+            source.name: executor.submit(
+                fetch_with_retries, source, manifest_entry(manifest, source, db_file)
+            )
+            for source in sources
+        }
+    fetched = {}
+    for source in sources:
+        try:
+            fetched[source.name] = futures[source.name].result()
+        except (requests.exceptions.RequestException, OSError) as e:
+            logging.error(f"Error downloading {source.name} from {source.url}: {e}")
+            fetched[source.name] = None
+    return fetched
+
+
+def load_source(source, fetched, conn):
+    """
+    Runs the source's loader on its fetched CSV if the content changed, which
+    stages its rows for publish(). Returns rows staged (0 when the source is
+    unchanged, None on error).
+    """
+    if fetched is None:
         return None
+    path, entry, changed = fetched
+
+    if not changed:
+        logging.info(f"Skipping {source.name}: unchanged since the last load.")
+        return 0
+    return source.process(path, conn)
+
+
+def record_source(source, fetched, manifest, db_file):
+    """
+    Records a loaded source's manifest entry, with the database it was loaded
+    into. Called only once its rows are published, so a failed load is
+    retried on the next run.
+    """
+    path, entry, changed = fetched
+    previous = manifest.get(source.url, {})
+    manifest[source.url] = {**entry, "db": db_file}
+    save_raw_manifest(RAW_CACHE_DIR, manifest)
+    # Bodies are stored by content hash, so the previous one is garbage once
+    # no source refers to it
+    old_path = previous.get("path")
+    in_use = {source_entry.get("path") for source_entry in manifest.values()}
+    if is_url(source.url) and old_path not in in_use and os.path.exists(old_path or ""):
+        os.remove(old_path)
 
 
 def connect_db(db_file):
@@ -44,44 +346,251 @@ def connect_db(db_file):
     return conn
 
 
-def process_county_data(csv_content, conn):
-    """Processes the county-level CSV and appends all data to the county_current table."""
-    if not csv_content or not conn:
-        logging.warning("Skipping county data processing due to previous errors.")
-        return
+def quote_columns(names):
+    return ", ".join(f'"{name}"' for name in names)
 
-    logging.info(f"Processing county data for table '{COUNTY_TABLE}'...")
+
+def upsert_sql(table, key, columns, schema="main", source=None):
+    """
+    INSERT ... ON CONFLICT statement that upserts `columns` into `table` on
+    its natural `key`: one row of parameters, or every row of the `source`
+    table. Rows identical to the stored ones are left untouched, so loading
+    the same data twice writes nothing.
+    """
+    values = [column for column in columns if column not in key]
+    if source:
+        # "WHERE true" keeps SQLite from parsing ON CONFLICT as a join clause
+        rows = f"SELECT {quote_columns(columns)} FROM {source} WHERE true"
+    else:
+        rows = f'VALUES ({", ".join("?" for _ in columns)})'
+    return (
+        f'INSERT INTO {schema}."{table}" ({quote_columns(columns)}) {rows} '
+        f"ON CONFLICT ({quote_columns(key)}) DO UPDATE SET "
+        + ", ".join(f'"{column}" = excluded."{column}"' for column in values)
+        + " WHERE "
+        + " OR ".join(
+            f'"{table}"."{column}" IS NOT excluded."{column}"' for column in values
+        )
+    )
+
+
+def staging_table(table):
+    return f"{STAGING_PREFIX}{table}"
+
+
+def create_staging_table(conn, table):
+    """
+    Creates an empty TEMP copy of `table` (unique on its natural key, for raw
+    tables) for a load to fill before publish() moves it into `table`. TEMP
+    tables are private to this connection and live outside the database
+    file, so a long load takes no lock that API readers could wait on.
+    """
+    staging = staging_table(table)
+    drop_staging_table(conn, table)
+    conn.execute(
+        f'CREATE TEMP TABLE "{staging}" AS SELECT * FROM main."{table}" WHERE 0'
+    )
+    if table in NATURAL_KEYS:
+        conn.execute(
+            f'CREATE UNIQUE INDEX temp."{staging}_key_idx" '
+            f'ON "{staging}" ({quote_columns(NATURAL_KEYS[table])})'
+        )
+
+
+def drop_staging_table(conn, table):
+    conn.execute(f'DROP TABLE IF EXISTS temp."{staging_table(table)}"')
+
+
+def staged_tables(conn):
+    """Live tables that currently have a staging table on this connection."""
+    return [
+        row[0][len(STAGING_PREFIX) :]
+        for row in conn.execute(
+            "SELECT name FROM temp.sqlite_master WHERE type = 'table' AND name LIKE ?",
+            (f"{STAGING_PREFIX}%",),
+        )
+    ]
+
+
+@contextmanager
+def staging(conn, table):
+    """
+    Creates `table`'s staging table for the block to fill. If the block
+    raises, the staged rows are dropped, so publish() leaves `table` alone.
+    """
+    create_staging_table(conn, table)
     try:
-        csv_file = StringIO(csv_content)
-        df = pd.read_csv(csv_file)
-
-        column_mapping = {
-            "State/Territory": "State",
-            "Sewershed_ID": "Sewershed_ID",
-            "Counties_Served": "Counties_Served",
-            "Population_Served": "Population_Served",
-            "WVAL_Category": "WVAL_Category",
-            "Reporting_Week": "Reporting_Week",
-        }
+        yield
+    except BaseException:
+        conn.rollback()
+        drop_staging_table(conn, table)
+        raise
+
+
+def stage_rows(conn, table, df):
+    """
+    Upserts `df` into `table`'s staging table, so a key repeated in the
+    CSV keeps its last row. Rows without a full natural key are dropped.
+    """
+    key = NATURAL_KEYS[table]
+    df = df.dropna(subset=list(key))  # Rows without a full key can't be matched
+    conn.executemany(
+        upsert_sql(staging_table(table), key, list(df.columns), schema="temp"),
+        df.astype(object).where(df.notna(), None).values.tolist(),
+    )
+
+
+def stage_derived(conn, table, df):
+    """Stages the full new contents of a derived table for replace_from_staging()."""
+    create_staging_table(conn, table)
+    conn.executemany(
+        f'INSERT INTO temp."{staging_table(table)}" ({quote_columns(df.columns)}) '
+        f'VALUES ({", ".join("?" for _ in df.columns)})',
+        df.astype(object).where(df.notna(), None).values.tolist(),
+    )
+
+
+def validate_staging(conn, table):
+    """Reasons the staged rows must not replace live data; empty if they may."""
+    staging = staging_table(table)
+    if not conn.execute(f'SELECT COUNT(*) FROM temp."{staging}"').fetchone()[0]:
+        return ["no valid rows were loaded"]
+    problems = []
+    for problem, condition in STAGING_CHECKS.get(table, []):
+        count = conn.execute(
+            f'SELECT COUNT(*) FROM temp."{staging}" WHERE {condition}'
+        ).fetchone()[0]
+        if count:
+            problems.append(f"{count} rows where {problem}")
+    return problems
+
+
+def check_staging(conn, table):
+    """
+    Validates `table`'s staged rows and keeps them for publish() if they may
+    replace live data. Otherwise logs why, drops them and returns False.
+    """
+    problems = validate_staging(conn, table)
+    if problems:
+        logging.error(f"Not merging {table}: {'; '.join(problems)}.")
+        conn.rollback()
+        drop_staging_table(conn, table)
+        return False
+    # Staged rows only touch temp; committing keeps a later source's
+    # rollback from discarding them
+    conn.commit()
+    return True
+
 
-        df_to_insert = df[list(column_mapping.keys())].rename(columns=column_mapping)
-        df_to_insert["Population_Served"] = pd.to_numeric(
-            df_to_insert["Population_Served"], errors="coerce"
+def merge_staging(conn, table):
+    """
+    Upserts `table`'s staged rows into the live raw table and drops the
+    staging table. Runs inside publish()'s transaction. Returns rows
+    inserted or changed.
+    """
+    columns = [row[1] for row in conn.execute(f'PRAGMA main.table_info("{table}")')]
+    before = conn.total_changes
+    conn.execute(
+        upsert_sql(
+            table,
+            NATURAL_KEYS[table],
+            columns,
+            source=f'temp."{staging_table(table)}"',
         )
-        cursor = conn.cursor()
+    )
+    changed = conn.total_changes - before
+    drop_staging_table(conn, table)
+    logging.info(f"Merged {table}: {changed} rows inserted or changed.")
+    return changed
+
+
+def replace_from_staging(conn, table):
+    """
+    Replaces every row of derived `table` with its staged rows and drops the
+    staging table. Runs inside publish()'s transaction.
+    """
+    conn.execute(f'DELETE FROM main."{table}"')
+    conn.execute(
+        f'INSERT INTO main."{table}" SELECT * FROM temp."{staging_table(table)}"'
+    )
+    drop_staging_table(conn, table)
 
-        logging.info(f"Appending {len(df_to_insert)} rows to {COUNTY_TABLE}...")
-        df_to_insert.to_sql(COUNTY_TABLE, conn, if_exists="append", index=False)
 
+def publish(conn, rebuild=False):
+    """
+    Makes everything staged live in one IMMEDIATE transaction: merges the
+    staged raw tables, rebuilds the derived tables from the result and
+    records the ingest run. In WAL mode API readers keep reading the previous
+    data until it commits, and a failure anywhere rolls all of it back. The
+    derived tables and data version are left alone when no raw row changed,
+    unless `rebuild`. Returns rows inserted or changed, or None on error.
+    """
+    tables = staged_tables(conn)
+    if not tables and not rebuild:
+        logging.info("Nothing staged; skipping derived tables.")
+        return 0
+
+    conn.commit()  # Ends the staging transaction, which only touched temp
+    conn.execute("BEGIN IMMEDIATE")
+    try:
+        changed = sum(merge_staging(conn, table) for table in tables)
+        # A rerun over unchanged data leaves the derived tables and the data
+        # version (and so every cached API response) as they are
+        if changed or rebuild:
+            refresh_derived_tables(conn)
+            record_ingest_run(conn, "populate_db")
+        else:
+            logging.info("No rows changed; skipping derived tables.")
         conn.commit()
-        logging.info("County data successfully appended.")
+        return changed
 
+    except Exception as e:
+        logging.error(f"Could not publish the load, so nothing was changed: {e}")
+        conn.rollback()
+        for table in staged_tables(conn):
+            drop_staging_table(conn, table)
+        return None
+
+
+def process_county_data(source, conn):
+    """
+    Streams the county-level CSV at the local path `source` in chunks into a
+    staging table, which publish() merges into the county_current table,
+    upserting on Sewershed_ID and Reporting_Week. Returns the number of rows
+    read (None on error or failed validation).
+    """
+    if not source or not conn:
+        logging.warning("Skipping county data processing due to previous errors.")
+        return None
+
+    logging.info(f"Processing county data for table '{COUNTY_TABLE}'...")
+    try:
+        rows = 0
+        with staging(conn, COUNTY_TABLE), open_csv(source) as stream:
+            for df_to_insert in read_csv_chunks(stream, COUNTY_COLUMNS):
+                df_to_insert["Population_Served"] = pd.to_numeric(
+                    df_to_insert["Population_Served"], errors="coerce"
+                )
+                stage_rows(conn, COUNTY_TABLE, df_to_insert)
+                rows += len(df_to_insert)
+
+        # The live table only changes in publish(), so a failed download or
+        # invalid file leaves it as it was
+        if not check_staging(conn, COUNTY_TABLE):
+            return None
+        logging.info(f"County data staged: {rows} rows read.")
+        return rows
+
+    except OSError as e:
+        logging.error(f"Error reading {source}: {e}")
+        conn.rollback()
     except pd.errors.EmptyDataError:
         logging.error("County CSV file is empty.")
-    except KeyError as e:
+    except ValueError as e:
         logging.error(
-            f"Column mapping error for county data: Missing column {e}. Check CSV structure and column_mapping."
+            f"Could not parse county data: {e}. Check CSV structure and COUNTY_COLUMNS."
         )
+        conn.rollback()
     except sqlite3.Error as e:
         logging.error(f"Database error during county data insertion: {e}")
         conn.rollback()  # Rollback changes on error
@@ -93,111 +602,349 @@ def process_county_data(csv_content, conn):
             conn.rollback()
 
 
-def process_state_data(csv_content, conn):
+def prepare_state_chunk(df):
+    """Drops rows with invalid dates and normalizes dates and numbers for upserting."""
+    ending_date = pd.to_datetime(df["Ending_Date"], errors="coerce")
+    df = df[ending_date.notna()].copy()
+    # One date format, so reruns match the stored natural keys
+    df["Ending_Date"] = ending_date[ending_date.notna()].dt.strftime("%Y-%m-%d")
+    for col in ["State_WVAL", "National_WVAL", "Regional_WVAL"]:
+        df[col] = pd.to_numeric(df[col], errors="coerce")
+    return df
+
+
+def latest_week_rows(df):
+    """Every row (one per collection period) of each state's most recent week."""
+    return df[df["Ending_Date"] == df.groupby("State")["Ending_Date"].transform("max")]
+
+
+def process_state_data(source, conn, backfill=False):
     """
-    Processes the state-level CSV, finds the most recent entry for each state,
-    and appends only that data to the state_timeseries table.
+    Streams the state-level CSV at the local path `source` in chunks and
+    stages each state's most recent week (every collection period), which
+    publish() upserts into the state_timeseries table, keyed on State,
+    Ending_Date and Data_Collection_Period. With `backfill` every week in the
+    CSV is staged chunk by chunk, restoring any history earlier runs missed.
+    Returns the number of rows read (None on error or failed validation).
     """
-    if not csv_content or not conn:
+    if not source or not conn:
         logging.warning("Skipping state data processing due to previous errors.")
-        return
+        return None
 
     logging.info(f"Processing state data for table '{STATE_TABLE}'...")
     try:
-        csv_file = StringIO(csv_content)
-        df = pd.read_csv(csv_file)
-        logging.debug(
-            f"Original state CSV columns: {df.columns.tolist()}"
-        )  # Log original columns
-
-        column_mapping = {
-            "State/Territory": "State",
-            "Week_Ending_Date": "Ending_Date",  # Source column for date
-            "Data_Collection_Period": "Data_Collection_Period",
-            "State/Territory_WVAL": "State_WVAL",
-            "National_WVAL": "National_WVAL",
-            "Regional_WVAL": "Regional_WVAL",
-            "WVAL_Category": "WVAL_Category",
-            "Coverage": "Coverage",
-        }
+        rows = 0
+        latest = None  # Latest week per state seen so far; bounded by the state count
+        with staging(conn, STATE_TABLE):
+            with open_csv(source) as stream:
+                for chunk in read_csv_chunks(stream, STATE_COLUMNS):
+                    df_to_insert = prepare_state_chunk(chunk)
+                    rows += len(df_to_insert)
+                    if backfill:
+                        stage_rows(conn, STATE_TABLE, df_to_insert)
+                    else:
+                        latest = latest_week_rows(pd.concat([latest, df_to_insert]))
+
+            if latest is not None:
+                logging.info(f"Staging {len(latest)} latest state rows...")
+                stage_rows(conn, STATE_TABLE, latest)
+
+        if not check_staging(conn, STATE_TABLE):
+            return None
+        logging.info(f"State data staged: {rows} rows read.")
+        return rows
+
+    except OSError as e:
+        logging.error(f"Error reading {source}: {e}")
+        conn.rollback()
+    except pd.errors.EmptyDataError:
+        logging.error("State CSV file is empty.")
+    except ValueError as e:
+        logging.error(
+            f"Could not parse state data: {e}. Check CSV structure and STATE_COLUMNS keys."
+        )
+        conn.rollback()
+    except sqlite3.Error as e:
+        logging.error(f"Database error during state data insertion: {e}")
+        conn.rollback()
+    except Exception as e:
+        logging.error(f"An unexpected error occurred during state data processing: {e}")
+        if conn:
+            conn.rollback()
 
-        missing_cols = [col for col in column_mapping.keys() if col not in df.columns]
-        if missing_cols:
-            logging.error(f"Missing expected columns in state CSV: {missing_cols}")
-            return  # Stop processing if columns are missing
 
-        date_col_csv = "Week_Ending_Date"  # The actual date column in the CSV
-        df["Ending_Date_dt"] = pd.to_datetime(df[date_col_csv], errors="coerce")
-        df.dropna(subset=["Ending_Date_dt"], inplace=True)
-        if df.empty:
-            logging.warning(
-                "State data is empty after removing rows with invalid dates."
-            )
-            return
+def reporting_week_end(weeks):
+    """Parses "April 13, 2025 - April 19, 2025" week ranges to their end date."""
+    return pd.to_datetime(
+        weeks.str.split(" - ").str[-1].str.strip(), format="%B %d, %Y", errors="coerce"
+    )
+
+
+def latest_snapshot_rows(df):
+    """
+    Rows for the newest Reporting_Week in county_current, the week of the
+    latest CDC snapshot. A sewershed that has dropped out of the snapshot no
+    longer counts towards its counties.
+    """
+    week_end = reporting_week_end(df["Reporting_Week"])
+    # Rows whose week can't be parsed are kept as they are
+    return df[(week_end == week_end.max()) | week_end.isna()].assign(Week_End=week_end)
 
-        state_col_csv = "State/Territory"  # The actual state column in the CSV
-        latest_idx = df.groupby(state_col_csv)["Ending_Date_dt"].idxmax()
-        df_latest = df.loc[latest_idx]
-        logging.debug(
-            f"Columns in df_latest (before rename): {df_latest.columns.tolist()}"
-        )
 
-        df_to_insert = df_latest[list(column_mapping.keys())].rename(
-            columns=column_mapping
+def process_county_aggregates(conn):
+    """
+    Stages the sewershed-to-county bridge and per-county aggregate tables,
+    built from the latest snapshot's week in county_current, so the county
+    endpoint never splits Counties_Served.
+    """
+    logging.info(
+        f"Rebuilding '{SEWERSHED_COUNTY_TABLE}' and '{COUNTY_AGGREGATE_TABLE}'..."
+    )
+    try:
+        df = pd.read_sql(
+            f"""SELECT DISTINCT "State", "Sewershed_ID", "Counties_Served",
+                "Population_Served", "WVAL_Category", "Reporting_Week"
+                FROM {COUNTY_TABLE}""",
+            conn,
         )
-        logging.debug(
-            f"Columns in df_to_insert (after rename): {df_to_insert.columns.tolist()}"
+        # county_current keeps every week it has been sent; aggregate only
+        # the current one, oldest first so "last" below is the newest week
+        df = latest_snapshot_rows(df).sort_values("Week_End", na_position="first")
+
+        bridge = df.assign(County=df["Counties_Served"].str.split(",")).explode(
+            "County"
         )
+        bridge["County"] = bridge["County"].str.strip()
+        bridge = bridge[bridge["County"].notna() & (bridge["County"] != "")]
+        bridge = bridge.drop_duplicates(subset=["Sewershed_ID", "County"])
 
-        numeric_cols_db = ["State_WVAL", "National_WVAL", "Regional_WVAL"]
-        for col in numeric_cols_db:
-            if col in df_to_insert.columns:
-                df_to_insert[col] = pd.to_numeric(df_to_insert[col], errors="coerce")
-            else:
-                # This case shouldn't happen if mapping is correct, but good to check
-                logging.warning(
-                    f"Column '{col}' not found in df_to_insert for numeric conversion."
-                )
+        bridge["Level"] = bridge["WVAL_Category"].map(WVAL_CATEGORY_MAPPING)
+        weights = bridge["Population_Served"].where(
+            bridge["Level"].notna() & (bridge["Population_Served"] > 0)
+        )
+        bridge["Weighted_Level"] = bridge["Level"] * weights
+        bridge["Weight"] = weights
+
+        grouped = bridge.groupby(["State", "County"], sort=False)
+        aggregates = grouped.agg(
+            Level=("Level", "mean"),
+            Weighted_Level=("Weighted_Level", "sum"),
+            Weight=("Weight", "sum"),
+            Sewershed_Count=("Sewershed_ID", "nunique"),
+            Population_Served=("Population_Served", "sum"),
+            Reporting_Week=("Reporting_Week", "last"),
+        ).reset_index()
+
+        aggregates["WVAL_Category"] = aggregates["Level"].map(closest_wval_category)
+        # Counties whose sewersheds report no population fall back to the plain mean
+        weighted_level = (aggregates["Weighted_Level"] / aggregates["Weight"]).where(
+            aggregates["Weight"] > 0, aggregates["Level"]
+        )
+        aggregates["Weighted_WVAL_Category"] = weighted_level.map(
+            closest_wval_category
+        )
 
-        cursor = conn.cursor()
+        bridge_rows = bridge[
+            ["State", "Sewershed_ID", "County", "Population_Served", "WVAL_Category"]
+        ]
+        aggregate_rows = aggregates[
+            [
+                "State",
+                "County",
+                "WVAL_Category",
+                "Weighted_WVAL_Category",
+                "Sewershed_Count",
+                "Population_Served",
+                "Reporting_Week",
+            ]
+        ]
+
+        stage_derived(conn, SEWERSHED_COUNTY_TABLE, bridge_rows)
+        stage_derived(conn, COUNTY_AGGREGATE_TABLE, aggregate_rows)
         logging.info(
-            f"Appending {len(df_to_insert)} latest state rows to {STATE_TABLE}..."
+            f"Staged {len(bridge_rows)} sewershed-county links and "
+            f"{len(aggregate_rows)} county aggregates."
         )
 
-        df_to_insert.to_sql(STATE_TABLE, conn, if_exists="append", index=False)
+    except sqlite3.Error as e:
+        logging.error(f"Database error during county aggregation: {e}")
+        raise
+    except Exception as e:
+        logging.error(f"An unexpected error occurred during county aggregation: {e}")
+        raise
 
-        conn.commit()
-        logging.info("Latest state data successfully appended.")
 
-    except pd.errors.EmptyDataError:
-        logging.error("State CSV file is empty.")
-    except KeyError as e:
-        logging.error(
-            f"Column mapping error for state data: Missing column {e}. Check CSV structure and column_mapping keys."
+def process_region_national_series(conn):
+    """
+    Stages the deduplicated regional and national WVAL series, built from
+    state_timeseries, one row per region/week and per week respectively.
+    """
+    logging.info(
+        f"Rebuilding '{REGION_SERIES_TABLE}' and '{NATIONAL_SERIES_TABLE}'..."
+    )
+    try:
+        df = pd.read_sql(
+            f"""SELECT "State", "Ending_Date", "Regional_WVAL", "National_WVAL"
+                FROM {STATE_TABLE}""",
+            conn,
         )
-        logging.error(
-            f"Available columns in DataFrame: {df.columns.tolist()}"
-        )  # Log available columns
+        df["Region"] = df["State"].map(STATE_REGIONS)
+
+        unmapped = sorted(df.loc[df["Region"].isna(), "State"].unique())
+        if unmapped:
+            logging.warning(f"States without a region mapping: {unmapped}")
+
+        # Every state in a region (and the nation) reports the same value for a
+        # week, so the first non-null value per group is the series value
+        region_rows = (
+            df.dropna(subset=["Region"])
+            .groupby(["Region", "Ending_Date"], sort=True)["Regional_WVAL"]
+            .first()
+            .reset_index()
+        )
+        national_rows = (
+            df.groupby("Ending_Date", sort=True)["National_WVAL"].first().reset_index()
+        )
+
+        stage_derived(conn, REGION_SERIES_TABLE, region_rows)
+        stage_derived(conn, NATIONAL_SERIES_TABLE, national_rows)
+        logging.info(
+            f"Staged {len(region_rows)} regional and {len(national_rows)} national rows."
+        )
+
     except sqlite3.Error as e:
-        logging.error(f"Database error during state data insertion: {e}")
-        conn.rollback()
+        logging.error(f"Database error during region/national series build: {e}")
+        raise
     except Exception as e:
-        logging.error(f"An unexpected error occurred during state data processing: {e}")
-        if conn:
-            conn.rollback()
+        logging.error(
+            f"An unexpected error occurred during region/national series build: {e}"
+        )
+        raise
+
+
+# Every feed populate_db.py loads. They download concurrently, so another
+# feed only adds to ingest wall time if it is the slowest download
+SOURCES = [
+    Source("county", COUNTY_URL, process_county_data, FETCH_TIMEOUT),
+    Source("state", STATE_URL, process_state_data, FETCH_TIMEOUT),
+]
+
+
+def configured_sources(args):
+    """SOURCES with the command line's URL overrides and loader options applied."""
+    urls = {"county": args.county_csv, "state": args.state_csv}
+    sources = []
+    for source in SOURCES:
+        source = source._replace(
+            url=urls.get(source.name) or source.url, force=args.force
+        )
+        # The manifest only records that the latest weeks were loaded, so a
+        # backfill must load the file even if it is unchanged since then
+        if source.process is process_state_data and args.backfill:
+            source = source._replace(
+                process=partial(process_state_data, backfill=True), force=True
+            )
+        sources.append(source)
+    return sources
+
+
+# Tables rebuilt in full from the raw county/state tables on every change
+DERIVED_TABLES = [
+    SEWERSHED_COUNTY_TABLE,
+    COUNTY_AGGREGATE_TABLE,
+    REGION_SERIES_TABLE,
+    NATIONAL_SERIES_TABLE,
+]
+
+
+def refresh_derived_tables(conn):
+    """
+    Rebuilds every table derived from the raw county/state tables: each is
+    staged first, then they all replace the live tables. Runs inside
+    publish()'s transaction, which commits them together with the raw rows.
+    """
+    process_county_aggregates(conn)
+    process_region_national_series(conn)
+    for table in DERIVED_TABLES:
+        replace_from_staging(conn, table)
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Load CDC wastewater data.")
+    parser.add_argument(
+        "--db",
+        default=DB_FILE,
+        help=f"SQLite database to load into (default: {DB_FILE}).",
+    )
+    parser.add_argument(
+        "--derived-only",
+        action="store_true",
+        help="Only rebuild derived tables from data already in the database.",
+    )
+    parser.add_argument(
+        "--county-csv",
+        help="County CSV to load, as a URL or local path (default: the CDC download).",
+    )
+    parser.add_argument(
+        "--state-csv",
+        help="State CSV to load, as a URL or local path (default: the CDC download).",
+    )
+    parser.add_argument(
+        "--backfill",
+        action="store_true",
+        help="Upsert every week in the state CSV instead of only each state's latest.",
+    )
+    parser.add_argument(
+        "--force",
+        action="store_true",
+        help="Download and load both CSVs even if they are unchanged since the last run.",
+    )
+    parser.add_argument(
+        "--exit-code",
+        action="store_true",
+        help=f"Exit with status {NOTHING_CHANGED_EXIT_CODE} when no new data was loaded.",
+    )
+    return parser.parse_args()
 
 
 if __name__ == "__main__":
+    args = parse_args()
+
     logging.info("Starting batch processing script...")
 
-    connection = connect_db(DB_FILE)
+    changed = False
+    failed = []
+    db_file = os.path.abspath(args.db)
+    connection = connect_db(db_file)
 
     if connection:
-        county_csv_data = download_csv(COUNTY_URL)
-        process_county_data(county_csv_data, connection)
-
-        state_csv_data = download_csv(STATE_URL)
-        process_state_data(state_csv_data, connection)
+        ensure_schema(connection)
+
+        sources, staged = [], {}
+        if not args.derived_only:
+            # Sources whose content is unchanged since the last load are
+            # neither parsed nor written
+            sources = configured_sources(args)
+            manifest = load_raw_manifest(RAW_CACHE_DIR)
+            fetched = fetch_sources(sources, manifest, db_file)
+            # Loaders share the one connection, so they run one at a time,
+            # and only stage their rows
+            staged = {
+                source.name: load_source(source, fetched[source.name], connection)
+                for source in sources
+            }
+            failed = [name for name, rows in staged.items() if rows is None]
+
+        # Every staged source goes live at once, with the derived tables and
+        # the ingest run that changes the data version
+        changed_rows = publish(connection, rebuild=args.derived_only)
+        if changed_rows is None:
+            failed = [source.name for source in sources] or ["derived tables"]
+        else:
+            changed = args.derived_only or changed_rows > 0
+            for source in sources:
+                if staged[source.name] is not None:
+                    record_source(source, fetched[source.name], manifest, db_file)
 
         connection.close()
         logging.info("Database connection closed.")
@@ -205,3 +952,8 @@ if __name__ == "__main__":
         logging.error("Could not establish database connection. Exiting.")
 
     logging.info("Batch processing script finished.")
+    if failed:
+        logging.error(f"Failed to load: {', '.join(failed)}")
+        sys.exit(1)
+    if args.exit_code and not changed:
+        sys.exit(NOTHING_CHANGED_EXIT_CODE)
@@ -1,26 +1,36 @@
+import argparse
 import os
 import json # Import the json library for saving history
 import csv # Import csv for saving results
-
-import tensorflow as tf
-
-print("Num GPUs Available: ", len(tf.config.list_physical_devices("GPU")))
-# print(tf.test.gpu_device_name()) # This might cause issues if no GPU is configured
-
-# Rest of your imports...
+import multiprocessing
 import sqlite3
+from concurrent.futures import ProcessPoolExecutor, as_completed
 
-import matplotlib.pyplot as plt
 import numpy as np
 import pandas as pd
-from sklearn.metrics import mean_absolute_error # Corrected import name if needed
-from sklearn.model_selection import train_test_split
-from sklearn.preprocessing import MinMaxScaler
-from tensorflow.keras.callbacks import EarlyStopping, ModelCheckpoint
-from tensorflow.keras.layers import LSTM, Dense, Dropout, Input
-from tensorflow.keras.models import Sequential
-from tensorflow.keras.optimizers import Adam
-# from tensorflow.keras.saving import save_model # Not explicitly used here
+
+from api.schema import ensure_schema, record_ingest_run
+from forecasting.baselines import BASELINES, DEFAULT_BASELINE, state_matrix
+from forecasting.dataset import (
+    PREDICTION_RUN_SOURCE,
+    load_state_frame,
+    load_state_windows,
+    scaler_range,
+)
+from forecasting.global_model import (
+    GlobalForecaster,
+    build_global_model,
+    save_global_model,
+    stack_state_windows,
+)
+from forecasting.training import (
+    configure_tf_threads,
+    load_manifest,
+    plan_training,
+    save_manifest,
+    train_state,
+    worker_thread_counts,
+)
 
 # --- Configuration ---
 DB_PATH = "db/db.sqlite"
@@ -33,274 +43,321 @@ N_FEATURES = 1
 EPOCHS = 200 # You might adjust this based on EarlyStopping behavior
 BATCH_SIZE = 32
 PREDICT_STEPS = 4 # Number of future weeks to predict
-
-# --- Configure GPU ---
-gpus = tf.config.list_physical_devices("GPU")
-if gpus:
+GLOBAL_BATCH_SIZE = 128 # The global model sees every state's windows per epoch
+FALLBACK_BASELINE = DEFAULT_BASELINE # For states without a usable model forecast
+PREDICTION_COLUMNS = [f'Week_{i+1}_Prediction' for i in range(PREDICT_STEPS)]
+# Monte Carlo dropout interval per week; empty for baseline forecasts
+INTERVAL_COLUMNS = [f'Week_{i+1}_{bound}' for i in range(PREDICT_STEPS) for bound in ('Lower', 'Upper')]
+
+
+# --- Data Loading and Preprocessing ---
+def load_state_data(use_cache=True):
+    # One deduplicated series per state, windowed and scaled per state; cached
+    # on disk until the next ingest changes the data version
+    print("Loading data...")
     try:
-        for gpu in gpus:
-            tf.config.experimental.set_memory_growth(gpu, True)
-        logical_gpus = tf.config.list_logical_devices("GPU")
-        print(len(gpus), "Physical GPUs,", len(logical_gpus), "Logical GPUs")
-    except RuntimeError as e:
-        print(f"GPU Memory Growth Error: {e}")
-else:
-    print("No GPU detected. Running on CPU.")
-
-# --- Create directories if they don't exist ---
-os.makedirs(MODEL_DIR, exist_ok=True)
-os.makedirs(HISTORY_DIR, exist_ok=True)
-print("-" * 30)
-
-# --- Data Loading ---
-print("Loading data...")
-conn = sqlite3.connect(DB_PATH) # Ensure db path is correct
-query = "SELECT State, Ending_Date, State_WVAL FROM state_timeseries ORDER BY State, Ending_Date"
-try:
-    df = pd.read_sql(query, conn)
-except Exception as e:
-    print(f"Error loading data from {DB_PATH}: {e}")
-    exit() # Exit if data cannot be loaded
-finally:
-    conn.close()
-
-df["Ending_Date"] = pd.to_datetime(df["Ending_Date"])
-df = df.sort_values(["State", "Ending_Date"])
-
-print("Missing values per column:")
-print(df.isnull().sum())
-# Optional: Handle missing values if needed
-# df.dropna(inplace=True)
-print("-" * 30)
-
-# --- Sequence Creation Function ---
-def create_sequences(data, sequence_length):
-    X, y = [], []
-    if len(data) <= sequence_length:
-        return np.array(X), np.array(y) # Return empty arrays if not enough data
-    for i in range(len(data) - sequence_length):
-        X.append(data[i : i + sequence_length])
-        y.append(data[i + sequence_length])
-    return np.array(X), np.array(y)
-
-# --- Prediction Function ---
-def predict_future(model, scaler, last_sequence, steps_ahead, sequence_length, n_features):
-     predictions_scaled = []
-     current_sequence = last_sequence.copy().reshape(1, sequence_length, n_features)
-     for _ in range(steps_ahead):
-          # Ensure the input shape is correct for model.predict
-          pred_scaled = model.predict(current_sequence, verbose=0)[0, 0]
-          predictions_scaled.append(pred_scaled)
-          # Prepare the next input sequence
-          next_step_scaled = np.array([[pred_scaled]]).reshape(1, 1, n_features)
-          # Roll the sequence and append the prediction
-          current_sequence = np.roll(current_sequence, -1, axis=1) # Shift elements left
-          current_sequence[0, -1, :] = next_step_scaled # Add prediction at the end
-     # Inverse transform the scaled predictions
-     return scaler.inverse_transform(np.array(predictions_scaled).reshape(-1, 1)).flatten()
-
-# --- Data Preprocessing ---
-states = df["State"].unique()
-state_data = {}
-processed_states = [] # Keep track of states with enough data
-
-print(f"Processing data for {len(states)} states...")
-for state in states:
-    state_df = df[df["State"] == state].copy()
-    values = state_df["State_WVAL"].values.reshape(-1, 1)
-
-    if len(values) <= SEQUENCE_LENGTH:
-        # print(f"Skipping {state}: Not enough data ({len(values)})") # Optional log
-        continue
-
-    scaler = MinMaxScaler()
-    try:
-        scaled_values = scaler.fit_transform(values)
-    except ValueError as e:
-        # print(f"Skipping {state}: Scaling error - {e}") # Optional log
-        continue
-
-    X, y = create_sequences(scaled_values, SEQUENCE_LENGTH)
-
-    if X.shape[0] == 0:
-         # print(f"Skipping {state}: No sequences created.") # Optional log
-         continue
-
-    # Store the last sequence needed for prediction *before* splitting
-    last_sequence_scaled = scaled_values[-SEQUENCE_LENGTH:]
-    state_data[state] = {"X": X, "y": y, "scaler": scaler, "last_sequence_scaled": last_sequence_scaled}
-    processed_states.append(state)
-
-print(f"Successfully processed data for {len(processed_states)} states.")
-print("-" * 30)
-
-
-# --- Model Building Function ---
-def build_improved_model(sequence_length, n_features):
-    model = Sequential(
-        [
-            Input(shape=(sequence_length, n_features)),
-            LSTM(64, return_sequences=True),
-            Dropout(0.2),
-            LSTM(32),
-            Dense(1),
-        ]
-    )
-    model.compile(optimizer=Adam(learning_rate=0.0005), loss="mse", metrics=["mae"]) # Use 'mae' for Mean Absolute Error
-    return model
+        state_data, processed_states = load_state_windows(DB_PATH, SEQUENCE_LENGTH, use_cache=use_cache)
+    except Exception as e:
+        print(f"Error loading data from {DB_PATH}: {e}")
+        exit() # Exit if data cannot be loaded
 
-# --- Initialize CSV files ---
-# Write header for training results CSV if it doesn't exist
-if not os.path.exists(RESULTS_CSV):
-    with open(RESULTS_CSV, 'w', newline='') as f:
-        writer = csv.writer(f)
-        writer.writerow(['State', 'Test_Loss_MSE', 'Test_MAE'])
+    print(f"Successfully processed data for {len(processed_states)} states.")
+    print("-" * 30)
+    return state_data, processed_states
 
-# Write header for predictions CSV if it doesn't exist
-if not os.path.exists(PREDICTIONS_CSV):
-    with open(PREDICTIONS_CSV, 'w', newline='') as f:
-        writer = csv.writer(f)
-        headers = ['State'] + [f'Week_{i+1}_Prediction' for i in range(PREDICT_STEPS)]
-        writer.writerow(headers)
+
+# --- Initialize CSV files ---
+def init_csv_files():
+    # Write header for training results CSV if it doesn't exist
+    if not os.path.exists(RESULTS_CSV):
+        with open(RESULTS_CSV, 'w', newline='') as f:
+            writer = csv.writer(f)
+            writer.writerow(['State', 'Test_Loss_MSE', 'Test_MAE'])
+
+    # Write header for predictions CSV if it doesn't exist, and add the
+    # interval columns to one written before they existed
+    headers = ['State'] + PREDICTION_COLUMNS + INTERVAL_COLUMNS
+    if not os.path.exists(PREDICTIONS_CSV):
+        with open(PREDICTIONS_CSV, 'w', newline='') as f:
+            csv.writer(f).writerow(headers)
+    elif list(pd.read_csv(PREDICTIONS_CSV, nrows=0).columns) != headers:
+        pd.read_csv(PREDICTIONS_CSV).reindex(columns=headers).to_csv(PREDICTIONS_CSV, index=False)
+
+
+def interval_row(lower, upper):
+    # Interleaves per-week bounds in INTERVAL_COLUMNS order
+    if lower is None or upper is None:
+        return [None] * len(INTERVAL_COLUMNS)
+    return [float(bound) for pair in zip(lower, upper) for bound in pair]
+
+
+def record_result(result, fingerprint, manifest):
+    """
+    Appends one state's train_state() result to the CSVs and, if it produced
+    a forecast, records the fingerprint its model was trained on (parent
+    process only). A failed run leaves the old fingerprint, so the next run
+    trains the state again instead of skipping it as up to date.
+    """
+    state = result["state"]
+    if result["error"]:
+        print(f"Skipping training for {state}: {result['error']}")
+        return
+
+    print(f"{state}: Test Loss (MSE) {result['loss']:.4f}, Test MAE {result['mae']:.4f}")
+    with open(RESULTS_CSV, 'a', newline='') as f:
+        csv.writer(f).writerow([state, result["loss"], result["mae"]])
+
+    if result["predictions"] is None:
+        return
+
+    print(f"Predicted 'State_WVAL' for {state} for next {PREDICT_STEPS} steps: {result['predictions']}")
+    with open(PREDICTIONS_CSV, 'a', newline='') as f:
+        csv.writer(f).writerow([state] + result["predictions"] + interval_row(result["lower"], result["upper"]))
+
+    manifest[state] = fingerprint
+    save_manifest(MODEL_DIR, manifest)
 
 
 # --- Training Loop ---
-if not processed_states:
-    print("No states have sufficient data for training. Exiting.")
-else:
+def train_sequential(state_data, processed_states, warm_states, manifest):
     print(f"Starting training for {len(processed_states)} states...")
     for state in processed_states:
         print(f"\n--- Training model for {state} ---")
-        if state not in state_data:
-             print(f"Error: Data for state {state} not found in state_data. Skipping.")
-             continue
+        result = train_state(
+            state,
+            state_data[state],
+            MODEL_DIR,
+            HISTORY_DIR,
+            EPOCHS,
+            BATCH_SIZE,
+            warm_start=state in warm_states,
+        )
+        record_result(result, state_data[state]["fingerprint"], manifest)
 
-        X = state_data[state]["X"]
-        y = state_data[state]["y"]
-        scaler = state_data[state]["scaler"]
-        last_sequence_scaled = state_data[state]["last_sequence_scaled"] # Get the last sequence for prediction
 
-        # Ensure data is sufficient for split
-        if len(X) < 2:
-             print(f"Skipping training for {state}: Not enough sequences ({len(X)}) for train/test split.")
-             continue
+def train_parallel(state_data, processed_states, warm_states, manifest, workers):
+    intra_op, inter_op = worker_thread_counts(workers)
+    print(
+        f"Starting training for {len(processed_states)} states on {workers} workers "
+        f"({intra_op} intra-op / {inter_op} inter-op TF threads each)..."
+    )
+    # Spawned (not forked) workers each start their own TensorFlow runtime
+    with ProcessPoolExecutor(
+        max_workers=workers,
+        mp_context=multiprocessing.get_context("spawn"),
+        initializer=configure_tf_threads,
+        initargs=(intra_op, inter_op),
+    ) as executor:
+        futures = {
+            executor.submit(
+                train_state,
+                state,
+                state_data[state],
+                MODEL_DIR,
+                HISTORY_DIR,
+                EPOCHS,
+                BATCH_SIZE,
+                0, # Per-epoch progress bars from many workers would interleave
+                state in warm_states,
+            ): state
+            for state in processed_states
+        }
+        # Results are written here as they finish, so only this process
+        # ever touches the CSVs
+        for future in as_completed(futures):
+            state = futures[future]
+            try:
+                record_result(future.result(), state_data[state]["fingerprint"], manifest)
+            except Exception as e:
+                print(f"Training failed for {state}: {e}")
+
+
+def train_global(state_data, processed_states):
+    from tensorflow.keras.callbacks import EarlyStopping
+
+    print(f"\n--- Training global model across {len(processed_states)} states ---")
+    (X_train, ids_train, y_train), (X_test, ids_test, y_test) = stack_state_windows(
+        state_data, processed_states
+    )
+    model = build_global_model(len(processed_states), SEQUENCE_LENGTH, N_FEATURES)
+    history = model.fit(
+        [X_train, ids_train],
+        y_train,
+        epochs=EPOCHS,
+        batch_size=GLOBAL_BATCH_SIZE,
+        validation_data=([X_test, ids_test], y_test),
+        callbacks=[EarlyStopping(monitor='val_loss', patience=10, restore_best_weights=True, verbose=1)],
+        verbose=1,
+    )
+    scaler_ranges = {state: scaler_range(state_data[state]["scaler"]) for state in processed_states}
+    save_global_model(model, processed_states, MODEL_DIR, scaler_ranges)
+
+    history_filepath = os.path.join(HISTORY_DIR, "history_global.json")
+    print(f"Saving training history to {history_filepath}")
+    with open(history_filepath, 'w') as f:
+        json.dump({key: [float(val) for val in values] for key, values in history.history.items()}, f, indent=4)
+
+    # Per-state test metrics from one batched prediction over the test windows
+    print(f"Appending per-state results to {RESULTS_CSV}")
+    test_pred = model.predict([X_test, ids_test], batch_size=GLOBAL_BATCH_SIZE, verbose=0)[:, 0]
+    test_error = test_pred - y_test.reshape(-1)
+    with open(RESULTS_CSV, 'a', newline='') as f:
+        writer = csv.writer(f)
+        for state_id, state in enumerate(processed_states):
+            state_error = test_error[ids_test[:, 0] == state_id]
+            writer.writerow([state, float(np.mean(state_error ** 2)), float(np.mean(np.abs(state_error)))])
+
+    # Every state's forecast, and its Monte Carlo dropout interval, in one
+    # batched rollout each
+    print(f"Predicting next {PREDICT_STEPS} weeks for all states...")
+    forecaster = GlobalForecaster(model, processed_states)
+    last_sequences = [state_data[state]["last_sequence_scaled"] for state in processed_states]
+    predictions_scaled = forecaster.predict_scaled(processed_states, last_sequences, PREDICT_STEPS)
+    lower_scaled, upper_scaled = forecaster.predict_intervals_scaled(processed_states, last_sequences, PREDICT_STEPS)
+    with open(PREDICTIONS_CSV, 'a', newline='') as f:
+        writer = csv.writer(f)
+        for state, *scaled in zip(processed_states, predictions_scaled, lower_scaled, upper_scaled):
+            scaler = state_data[state]["scaler"]
+            future_predictions, lower, upper = (scaler.inverse_transform(values.reshape(-1, 1)).flatten() for values in scaled)
+            writer.writerow([state] + future_predictions.tolist() + interval_row(lower, upper))
+
+
+# --- Baseline fallback ---
+def fill_baseline_predictions(state_data):
+    # States skipped for short series, whose latest weeks have gaps (the model
+    # input is then meaningless) or whose model forecast is NaN get a
+    # statistical baseline forecast instead
+    predictions_df = pd.read_csv(PREDICTIONS_CSV).drop_duplicates(subset="State", keep="last")
+    covered = {
+        state
+        for state in predictions_df.dropna(subset=PREDICTION_COLUMNS)["State"]
+        if state in state_data and not np.isnan(state_data[state]["last_sequence_scaled"]).any()
+    }
+    states, history = state_matrix(load_state_frame(DB_PATH))
+    missing = [i for i, state in enumerate(states) if state not in covered]
+    if not missing:
+        return
+
+    forecasts = BASELINES[FALLBACK_BASELINE].predict(history[missing], PREDICT_STEPS)
+    with open(PREDICTIONS_CSV, 'a', newline='') as f:
+        writer = csv.writer(f)
+        for i, forecast in zip(missing, forecasts):
+            if not np.isnan(forecast).all():
+                writer.writerow([states[i]] + forecast.tolist() + interval_row(None, None))
+    print(f"Used the {FALLBACK_BASELINE} baseline for: {', '.join(states[i] for i in missing)}")
 
-        # Adjust test_size dynamically if dataset is small
-        test_size = 0.2 if len(X) >= 5 else 1/len(X) # Ensure at least one test sample
 
-        try:
-            X_train, X_test, y_train, y_test = train_test_split(
-                X, y, test_size=test_size, shuffle=False # Keep shuffle=False for time series
-            )
-        except ValueError as e:
-            print(f"Skipping training for {state}: Error during split - {e}")
-            continue
-
-        if X_train.shape[0] == 0 or X_test.shape[0] == 0:
-            print(f"Skipping training for {state}: Empty train or test set after split.")
-            continue
-
-        # Build model
-        model = build_improved_model(SEQUENCE_LENGTH, N_FEATURES)
-
-        # Define file paths
-        model_filepath = os.path.join(MODEL_DIR, f"best_model_{state}.keras")
-        history_filepath = os.path.join(HISTORY_DIR, f"history_{state}.json") # History file path
-
-        # Callbacks
-        callbacks = [
-            EarlyStopping(monitor='val_loss', patience=10, restore_best_weights=True, verbose=1),
-            ModelCheckpoint(
-                filepath=model_filepath,
-                save_best_only=True,
-                monitor='val_loss',
-                verbose=0
-            ),
-        ]
-
-        # Train the model
-        print(f"Fitting model for {state}...")
-        history = model.fit(
-            X_train,
-            y_train,
-            epochs=EPOCHS,
-            batch_size=BATCH_SIZE,
-            validation_data=(X_test, y_test),
-            callbacks=callbacks,
-            verbose=1, # Set to 1 or 2 for progress
+# --- Publish predictions ---
+def publish_predictions():
+    # Serve the latest prediction per state from the database and record the run so
+    # the API's data version changes and cached responses are invalidated
+    print(f"\nPublishing predictions from {PREDICTIONS_CSV} to {DB_PATH}...")
+    try:
+        predictions_df = pd.read_csv(PREDICTIONS_CSV).drop_duplicates(
+            subset="State", keep="last"
         )
-
-        # Save the training history
-        print(f"Saving training history to {history_filepath}")
-        history_dict = {key: [float(val) for val in values] for key, values in history.history.items()}
-        try:
-            with open(history_filepath, 'w') as f:
-                json.dump(history_dict, f, indent=4)
-            print(f"Successfully saved history for {state}.")
-        except Exception as e:
-            print(f"Error saving history for {state}: {e}")
-
-        # Evaluate the final (best) model
-        print(f"Evaluating final (best) model for {state} on test data...")
-        loss = -1.0 # Default values in case evaluation fails
-        mae = -1.0
-        try:
-            # Ensure the best model is loaded (restore_best_weights=True should do this,
-            # but loading explicitly is safer if checkpoint exists)
-            if os.path.exists(model_filepath):
-                 best_model = tf.keras.models.load_model(model_filepath)
-                 loss, mae = best_model.evaluate(X_test, y_test, verbose=0)
-                 print(f"Test Loss (MSE) for {state}: {loss:.4f}")
-                 print(f"Test MAE for {state}: {mae:.4f}") # Ensure metric name matches compile()
-            else:
-                 print(f"Warning: Best model file not found at {model_filepath}. Using the model from the end of training.")
-                 # Evaluate the model currently in memory (last epoch if early stopping didn't restore)
-                 loss, mae = model.evaluate(X_test, y_test, verbose=0)
-                 print(f"Test Loss (MSE) for {state} (end of training): {loss:.4f}")
-                 print(f"Test MAE for {state} (end of training): {mae:.4f}") # Ensure metric name matches compile()
-
-        except Exception as e:
-             print(f"Could not evaluate the model for {state}: {e}")
-
-        print(f"Appending results to {RESULTS_CSV}")
+        conn = sqlite3.connect(DB_PATH)
+        ensure_schema(conn)
+        conn.execute("DELETE FROM future_predictions")
+        predictions_df.to_sql("future_predictions", conn, if_exists="append", index=False)
+        record_ingest_run(conn, PREDICTION_RUN_SOURCE)
+        conn.commit()
+        conn.close()
+        print(f"Published predictions for {len(predictions_df)} states.")
+    except Exception as e:
+        print(f"Error publishing predictions: {e}")
+
+
+def configure_gpus():
+    import tensorflow as tf
+
+    gpus = tf.config.list_physical_devices("GPU")
+    if gpus:
         try:
-            with open(RESULTS_CSV, 'a', newline='') as f:
-                writer = csv.writer(f)
-                writer.writerow([state, loss, mae])
-        except Exception as e:
-            print(f"Error appending results to {RESULTS_CSV} for {state}: {e}")
-
-
-        print(f"Predicting next {PREDICT_STEPS} weeks for {state}...")
-        try:
-            # Use the evaluated best_model if available, otherwise the model in memory
-            model_to_predict = best_model if 'best_model' in locals() and os.path.exists(model_filepath) else model
-
-            # Reshape last_sequence_scaled correctly for predict_future
-            last_sequence_input = last_sequence_scaled.reshape(SEQUENCE_LENGTH, N_FEATURES)
-
-            future_predictions = predict_future(
-                model_to_predict,
-                scaler,
-                last_sequence_input, # Use the correctly shaped last sequence
-                steps_ahead=PREDICT_STEPS,
-                sequence_length=SEQUENCE_LENGTH,
-                n_features=N_FEATURES
-            )
-            print(f"Predicted 'State_WVAL' for {state} for next {PREDICT_STEPS} steps: {future_predictions}")
-
-            # Append predictions to CSV
-            print(f"Appending predictions to {PREDICTIONS_CSV}")
-            with open(PREDICTIONS_CSV, 'a', newline='') as f:
-                writer = csv.writer(f)
-                writer.writerow([state] + future_predictions.tolist()) # Convert numpy array to list
-
-        except Exception as e:
-            print(f"Error during prediction or saving predictions for {state}: {e}")
-
-        # Clean up best_model variable to avoid using the wrong one in the next loop iteration if loading failed
-        if 'best_model' in locals():
-            del best_model
-
-
-print("\nTraining and prediction script finished.")
+            for gpu in gpus:
+                tf.config.experimental.set_memory_growth(gpu, True)
+            logical_gpus = tf.config.list_logical_devices("GPU")
+            print(len(gpus), "Physical GPUs,", len(logical_gpus), "Logical GPUs")
+        except RuntimeError as e:
+            print(f"GPU Memory Growth Error: {e}")
+    else:
+        print("No GPU detected. Running on CPU.")
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Train the WVAL forecasting models.")
+    mode = parser.add_mutually_exclusive_group()
+    mode.add_argument(
+        "--global",
+        dest="global_model",
+        action="store_true",
+        help="Train one model across all states (with a state embedding) instead of one model per state.",
+    )
+    parser.add_argument(
+        "--full",
+        action="store_true",
+        help="Retrain every state from scratch, even if its data is unchanged.",
+    )
+    parser.add_argument(
+        "--no-dataset-cache",
+        action="store_true",
+        help="Rebuild the training windows instead of reading them from the on-disk cache.",
+    )
+    mode.add_argument(
+        "--workers",
+        type=int,
+        default=1,
+        help="Train per-state models in this many worker processes (default: 1, in-process).",
+    )
+    return parser.parse_args()
+
+
+def main():
+    args = parse_args()
+
+    # Workers configure their own TensorFlow; the parent only needs it for
+    # in-process training
+    if args.workers <= 1:
+        configure_gpus()
+
+    # --- Create directories if they don't exist ---
+    os.makedirs(MODEL_DIR, exist_ok=True)
+    os.makedirs(HISTORY_DIR, exist_ok=True)
+    print("-" * 30)
+
+    state_data, processed_states = load_state_data(not args.no_dataset_cache)
+    init_csv_files()
+
+    if not processed_states:
+        print("No states have sufficient data for training. Exiting.")
+        return
+    if args.global_model:
+        train_global(state_data, processed_states)
+        fill_baseline_predictions(state_data)
+        publish_predictions()
+        print("\nTraining and prediction script finished.")
+        return
+
+    # Skip states whose series is unchanged since their model was trained and
+    # fine-tune the ones that changed; --full retrains everything
+    manifest = load_manifest(MODEL_DIR)
+    skip, warm, cold = plan_training(state_data, processed_states, MODEL_DIR, manifest, args.full)
+    print(f"{len(skip)} unchanged (skipped), {len(warm)} changed (fine-tuned), {len(cold)} new (trained from scratch)")
+    to_train = warm + cold
+    if not to_train:
+        print("No state's data has changed; keeping the published predictions.")
+        return
+
+    if args.workers > 1:
+        train_parallel(state_data, to_train, set(warm), manifest, args.workers)
+    else:
+        train_sequential(state_data, to_train, set(warm), manifest)
+
+    # Skipped states keep their earlier rows in PREDICTIONS_CSV
+    fill_baseline_predictions(state_data)
+    publish_predictions()
+    print("\nTraining and prediction script finished.")
+
+
+if __name__ == "__main__":
+    main()
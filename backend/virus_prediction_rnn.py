@@ -1,105 +1,35 @@
 import os
 
 os.environ["CUDA_VISIBLE_DEVICES"] = "-1"  # Force CPU mode if GPU issues persist
-import sqlite3
 
 import matplotlib.pyplot as plt
-import numpy as np
-import pandas as pd
 from sklearn.metrics import mean_absolute_error
 from sklearn.model_selection import train_test_split
-from sklearn.preprocessing import MinMaxScaler
 from tensorflow.keras.callbacks import EarlyStopping, ModelCheckpoint
-from tensorflow.keras.layers import (
-    Dense,  # Changed LSTM to SimpleRNN
-    Dropout,
-    Input,
-    SimpleRNN,
-)
-from tensorflow.keras.models import Sequential
-from tensorflow.keras.optimizers import Adam
 from tensorflow.keras.saving import (
     save_model,
 )  # Note: save_model might not be needed if using ModelCheckpoint with .keras
 
-conn = sqlite3.connect("db/db.sqlite")
-query = "SELECT State, Ending_Date, State_WVAL FROM state_timeseries ORDER BY State, Ending_Date"
-df = pd.read_sql(query, conn)
-conn.close()
-
-df["Ending_Date"] = pd.to_datetime(df["Ending_Date"])
-df = df.sort_values(["State", "Ending_Date"])
-
-print("Missing values per column:")
-print(df.isnull().sum())
-
-
-def create_sequences(data, sequence_length):
-    X, y = [], []
-    if len(data) <= sequence_length:
-        return np.array(X), np.array(y)  # Return empty arrays if not enough data
-    for i in range(len(data) - sequence_length):
-        X.append(data[i : i + sequence_length])
-        y.append(data[i + sequence_length])
-    return np.array(X), np.array(y)
-
+from forecasting.dataset import load_state_windows, scaler_range
+from forecasting.inference import predict_future
+from forecasting.registry import save_scaler_range
+from forecasting.training import build_simple_rnn_model
 
 sequence_length = 4
 n_features = 1
-states = df["State"].unique()
-state_data = {}
-processed_states = []  # Keep track of states with enough data
-
-print(f"\nProcessing data for {len(states)} states...")
-for state in states:
-    state_df = df[
-        df["State"] == state
-    ].copy()  # Use .copy() to avoid SettingWithCopyWarning
-    values = state_df["State_WVAL"].values.reshape(-1, 1)
-    if len(values) <= sequence_length:
-        print(
-            f"Skipping state {state}: Not enough data points ({len(values)}) for sequence length {sequence_length}"
-        )
-        continue
-
-    scaler = MinMaxScaler()
-    try:
-        scaled_values = scaler.fit_transform(values)
-    except ValueError as e:
-        print(f"Skipping state {state}: Scaling error - {e}")
-        continue
-
-    X, y = create_sequences(scaled_values, sequence_length)
-
-    # Ensure sequences were actually created
-    if X.shape[0] == 0:
-        print(f"Skipping state {state}: No sequences created after processing.")
-        continue
 
-    state_data[state] = {"X": X, "y": y, "scaler": scaler}
-    processed_states.append(
-        state
-    )  # Add state to the list of successfully processed states
+# Kept apart from models/, which the API serves and virus_prediction.py tracks
+# in its training manifest and NumPy exports. Point FORECAST_MODEL_DIR here to
+# serve these models instead.
+model_dir = os.path.join("models", "rnn")
 
+# Shared with virus_prediction.py: one deduplicated series per state, windowed
+# and scaled per state, cached on disk until the data version changes
+print("\nProcessing data...")
+state_data, processed_states = load_state_windows("db/db.sqlite", sequence_length)
 print(f"\nSuccessfully processed data for {len(processed_states)} states.")
 
 
-def build_simple_rnn_model(sequence_length, n_features):  # Renamed function for clarity
-    model = Sequential(
-        [
-            Input(shape=(sequence_length, n_features)),
-            SimpleRNN(
-                64, return_sequences=True
-            ),  # Keep return_sequences=True for stacking RNNs
-            Dropout(0.2),
-            SimpleRNN(32),  # Default return_sequences=False is correct here
-            Dense(1),
-        ]
-    )
-    model.compile(optimizer=Adam(learning_rate=0.0005), loss="mse", metrics=["mae"])
-    return model
-
-
 epochs = 10
 batch_size = 32
 trained_models = {}
@@ -140,15 +70,15 @@ else:
 
         model = build_simple_rnn_model(sequence_length, n_features)
 
-        if not os.path.exists("models"):
-            os.makedirs("models")
+        os.makedirs(model_dir, exist_ok=True)
+        model_path = os.path.join(model_dir, f"best_model_{state}.keras")
 
         callbacks = [
             EarlyStopping(
                 monitor="val_loss", patience=10, restore_best_weights=True
             ),  # Monitor val_loss
             ModelCheckpoint(
-                f"models/best_model_{state}.keras",
+                model_path,
                 save_best_only=True,
                 monitor="val_loss",  # Monitor val_loss
             ),
@@ -163,6 +93,10 @@ else:
             verbose=1,  # Set to 1 or 2 for progress, 0 for silent
         )
 
+        # Served forecasts rescale inputs with the range the model was trained on
+        if os.path.exists(model_path):
+            save_scaler_range(model_path, scaler_range(state_data[state]["scaler"]))
+
         trained_models[state] = model  # Store the trained model directly
         histories[state] = history  # Store history
 
@@ -178,38 +112,6 @@ else:
             print(f"Could not evaluate {state} in original scale: {e}")
 
 
-def predict_future(
-    model, scaler, last_sequence, steps_ahead, sequence_length, n_features
-):
-    predictions_scaled = []
-    current_sequence = last_sequence.copy().reshape(
-        1, sequence_length, n_features
-    )  # Reshape for prediction
-
-    for _ in range(steps_ahead):
-        pred_scaled = model.predict(current_sequence)[0, 0]
-        predictions_scaled.append(pred_scaled)
-
-        next_step_scaled = np.array([[pred_scaled]])  # Shape (1, 1)
-        new_sequence_step = next_step_scaled.reshape(
-            1, 1, n_features
-        )  # Shape (1, 1, n_features)
-
-        current_sequence = np.roll(
-            current_sequence, -1, axis=1
-        )  # Roll along the time axis
-        current_sequence[0, -1, :] = new_sequence_step  # Update the last time step
-
-    try:
-        future_predictions = scaler.inverse_transform(
-            np.array(predictions_scaled).reshape(-1, 1)
-        ).flatten()
-        return future_predictions
-    except ValueError as e:
-        print(f"Error during inverse transform for future predictions: {e}")
-        return np.array([])  # Return empty array on error
-
-
 if trained_models:  # Check if any models were trained
     last_trained_state = processed_states[-1] if processed_states else None
 
@@ -290,9 +290,24 @@ function StateMap() {
     const loadHistoricalData = async () => {
       try {
         const response = await fetch(
-          "http://localhost:8000/api/state/all?history=true",
+          "http://localhost:8000/api/state/all?history=true&format=columnar",
         );
-        const metrics = await response.json();
+        const { dates, states } = await response.json();
+
+        // Expand the columnar payload back into per-state lists of records
+        const metrics = {};
+        for (const state in states) {
+          const columns = states[state];
+          metrics[state] = [];
+          dates.forEach((ending_date, i) => {
+            if (columns.wval_category[i] === null) return;
+            const record = { state_territory: state, ending_date };
+            for (const field in columns) {
+              record[field] = columns[field][i];
+            }
+            metrics[state].push(record);
+          });
+        }
         setAllStateMetrics(metrics);
       } catch (error) {
         console.error("Error loading historical data:", error);